@@ -0,0 +1,81 @@
+"""
+Alert scheduler benchmark for !subscribe.
+
+Spreads a few thousand subscriptions over a few hundred channels, pairs and
+both strategies, then runs one candle close against the stubbed exchange from
+bench_scan. Reports the exchange requests, wall time and CPU time of the
+batched run (one fetch and one indicator frame per pair) and compares them
+with evaluating every subscription on its own, the way hand-polled commands
+would.
+
+    python -m benchmarks.bench_alerts
+"""
+import asyncio
+import os
+import random
+import time
+import warnings
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+os.environ.setdefault("SUBSCRIPTIONS_PATH", "")
+
+from benchmarks.bench_scan import StubExchange
+from services import market_data
+from services.alerts import STRATEGIES, AlertScheduler, SubscriptionStore, evaluate_group
+
+PAIRS = 200
+CHANNELS = 300
+SUBSCRIPTIONS_PER_CHANNEL = 15
+INTERVAL, STEP_MS = "15m", 900_000
+NAIVE_SAMPLE = 60
+
+
+async def main():
+    warnings.filterwarnings("ignore")
+    exchange = StubExchange(PAIRS)
+    market_data.async_exchange = exchange
+    market_data.candle_cache.max_bytes = 512 * 1024 * 1024
+
+    rng = random.Random(3)
+    store = SubscriptionStore()
+    symbols = sorted(exchange.candles)
+    for channel_id in range(CHANNELS):
+        for symbol in rng.sample(symbols, SUBSCRIPTIONS_PER_CHANNEL):
+            store.add(channel_id, symbol, INTERVAL, rng.choice(list(STRATEGIES)))
+    stats = store.stats()
+
+    delivered = []
+
+    async def send(channel_id, message):
+        delivered.append(channel_id)
+
+    scheduler = AlertScheduler(store)
+    scheduler._send = send
+    # The stub's newest candle is the open one, so its open time is the boundary that just passed
+    boundary = next(iter(exchange.candles.values()))[-1][0]
+    cpu, start = time.process_time(), time.perf_counter()
+    await scheduler.run_close(boundary, {INTERVAL})
+    batched_wall, batched_cpu = time.perf_counter() - start, time.process_time() - cpu
+    print(f"batched close: {stats['subscriptions']} subscriptions on {stats['groups']} pairs -> "
+          f"{exchange.requests} exchange requests, {batched_wall:.2f}s wall, {batched_cpu:.2f}s CPU, "
+          f"{len(delivered)} alerts delivered")
+
+    # Every subscription on its own: its own fetch and its own indicator frame
+    sample = [(symbol, strategy) for (symbol, _), members in store.groups().items()
+              for _, strategy in members][:NAIVE_SAMPLE]
+    requests = exchange.requests
+    cpu, start = time.process_time(), time.perf_counter()
+    for symbol, strategy in sample:
+        ohlcv = await exchange.fetch_ohlcv(symbol, INTERVAL, limit=1000)
+        evaluate_group(symbol, [row for row in ohlcv if row[0] < boundary], [strategy])
+    scale = stats['subscriptions'] / len(sample)
+    naive_wall, naive_cpu = (time.perf_counter() - start) * scale, (time.process_time() - cpu) * scale
+    print(f"one at a time: {(exchange.requests - requests) * scale:.0f} exchange requests, "
+          f"~{naive_wall:.0f}s wall, ~{naive_cpu:.0f}s CPU (extrapolated from {len(sample)})")
+    print(f"batching: {naive_wall / batched_wall:.0f}x less wall time, {naive_cpu / batched_cpu:.0f}x less CPU, "
+          f"{stats['subscriptions'] / stats['groups']:.0f}x fewer requests")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+"""
+Backtester benchmark for the !trendsignal multi-filter strategy.
+
+Checks that the vectorised entry rules match analyze_trading_conditions on
+every bar, and that a sample of bars has the same strategy columns and
+signal as the live path, compute_advanced_technical_analysis on the
+candles up to that bar only. A column that peeks at later candles (like a
+higher timeframe value filled back from its final close) fails that check.
+Then checks the trade simulation against a plain per-bar loop and times a
+full backtest over three years of 15m candles against calling
+analyze_trading_conditions bar by bar.
+
+    python -m benchmarks.bench_backtest
+"""
+import os
+import time
+import warnings
+
+import numpy as np
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from benchmarks.synthetic import synthetic_ohlcv
+from services.backtest import run_backtest, simulate_trades, strategy_frame, strategy_signals
+from services.indicator_frame import IndicatorFrame
+from services.supertrend import analyze_trading_conditions, compute_advanced_technical_analysis, strategy_columns
+
+PARITY_BARS = 3000
+# Every POINT_IN_TIME_STEP-th bar is recomputed from its truncated history, plus these bars
+POINT_IN_TIME_STEP = 11
+POINT_IN_TIME_BARS = (2003,)
+YEARS_OF_15M = 3 * 365 * 96
+LOOP_SAMPLE = 2000
+
+
+def reference_signal(df, i, rsi_long_threshold=55, rsi_short_threshold=45, r_multiple=2.0):
+    current, previous = df.iloc[i], df.iloc[i - 1]
+    prev2 = df.iloc[i - 2] if i > 1 else previous
+    return analyze_trading_conditions(df, current, previous, prev2,
+                                      rsi_long_threshold, rsi_short_threshold, r_multiple)
+
+
+def reference_trades(df, signals, r_multiple=2.0):
+    """The trade simulation as a straightforward per-bar loop"""
+    trades = []
+    position = None
+    for i in range(len(df)):
+        row = df.iloc[i]
+        if position is not None:
+            direction, entry, stop, target, risk, start = position
+            stop_hit = row['low'] <= stop if direction > 0 else row['high'] >= stop
+            target_hit = row['high'] >= target if direction > 0 else row['low'] <= target
+            if stop_hit or target_hit:
+                if stop_hit:
+                    price = min(row['open'], stop) if direction > 0 else max(row['open'], stop)
+                else:
+                    price = max(row['open'], target) if direction > 0 else min(row['open'], target)
+                trades.append((start, i, price))
+                position = None
+        if position is None and (signals['buy'][i] or signals['sell'][i]):
+            direction = 1 if signals['buy'][i] else -1
+            entry, stop = row['close'], row['supertrend']
+            risk = (entry - stop) * direction
+            if risk > 0:
+                position = (direction, entry, stop, entry + direction * row['atr'] * r_multiple, risk, i)
+    return trades
+
+
+def signal_at(signals, i):
+    return 'Buy' if signals['buy'][i] else 'Sell' if signals['sell'][i] else 'No Signal'
+
+
+def check_point_in_time(ohlcv, df, signals, rsi_params, params):
+    """Bars of the whole-history frame against the live path run on the candles up to each bar"""
+    names = list(strategy_columns(IndicatorFrame(ohlcv[:3]), **params))
+    bars = sorted(set(range(2, len(ohlcv), POINT_IN_TIME_STEP)) | set(POINT_IN_TIME_BARS))
+    for t in bars:
+        live_df, analysis = compute_advanced_technical_analysis(IndicatorFrame(ohlcv[:t + 1]), **rsi_params, **params)
+        live, row = live_df[names].iloc[-1].to_numpy(), df[names].iloc[t].to_numpy()
+        assert np.allclose(row, live, rtol=1e-12, atol=0, equal_nan=True), \
+            (t, [name for name, a, b in zip(names, row, live) if not np.isclose(a, b, rtol=1e-12, equal_nan=True)])
+        assert signal_at(signals, t) == analysis['signal'], (t, signal_at(signals, t), analysis['signal'])
+        assert signals['confidence'][t] == analysis['confidence'], t
+    return len(bars)
+
+
+def check_parity():
+    checked = signals_seen = point_in_time = 0
+    for seed, params in ((1, {}), (2, {}), (3, dict(fast_ema=9, slow_ema=30, supertrend_period=7,
+                                                   rsi_long_threshold=52, rsi_short_threshold=48)), (7, {})):
+        rsi_params = {k: params.pop(k) for k in ('rsi_long_threshold', 'rsi_short_threshold') if k in params}
+        ohlcv = synthetic_ohlcv(PARITY_BARS, seed=seed)
+        df = strategy_frame(IndicatorFrame(ohlcv), **params)
+        signals = strategy_signals(df, **rsi_params)
+        for i in range(1, len(df)):
+            expected = reference_signal(df, i, **rsi_params)
+            got = signal_at(signals, i)
+            assert got == expected['signal'], (seed, i, got, expected['signal'])
+            assert signals['confidence'][i] == expected['confidence'], (seed, i)
+            checked += 1
+            signals_seen += got != 'No Signal'
+
+        point_in_time += check_point_in_time(ohlcv, df, signals, rsi_params, params)
+
+        trades, _, _ = simulate_trades(df, signals)
+        expected_trades = reference_trades(df, signals)
+        got_trades = [(df.index.get_loc(t['entry_time']), df.index.get_loc(t['exit_time']), t['exit_price'])
+                      for t in trades]
+        assert got_trades == expected_trades, (seed, got_trades[:3], expected_trades[:3])
+    print(f"parity OK: {checked} bars ({signals_seen} signals) match analyze_trading_conditions, "
+          f"{point_in_time} sampled bars match the live path on their truncated history, "
+          f"trade simulation matches the per-bar loop")
+
+
+def main():
+    warnings.filterwarnings("ignore")
+    check_parity()
+
+    ohlcv = synthetic_ohlcv(YEARS_OF_15M, seed=7)
+    start = time.perf_counter()
+    result = run_backtest(ohlcv)
+    vectorised = time.perf_counter() - start
+    print(f"vectorised backtest: {len(ohlcv):,} bars in {vectorised:.3f}s "
+          f"({result['trades']} trades, win rate {result['win_rate']:.1f}%, "
+          f"expectancy {result['expectancy_r']:+.2f}R, max drawdown {result['max_drawdown_pct']:.1f}%)")
+
+    df = strategy_frame(IndicatorFrame(ohlcv[:LOOP_SAMPLE + 1]))
+    start = time.perf_counter()
+    for i in range(1, LOOP_SAMPLE + 1):
+        reference_signal(df, i)
+    per_bar = (time.perf_counter() - start) / LOOP_SAMPLE
+    print(f"analyze_trading_conditions per bar: {per_bar * 1e6:.0f}us -> "
+          f"{per_bar * len(ohlcv):.1f}s for the same history (signals only, no exits)")
+
+
+if __name__ == "__main__":
+    main()
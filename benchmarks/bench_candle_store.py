@@ -0,0 +1,91 @@
+"""
+Candle store benchmark.
+
+Writes a long synthetic history to a CandleStore, checks that reading it back
+gives the same candles and the same IndicatorFrame, then compares the ways
+the offline tools and the bot can get a frame over that history: a CSV file
+(tools.candles), a list of ccxt rows, and the memory-mapped store with
+IndicatorFrame.from_columns. Also times a one-week range query and appending
+one candle.
+
+    python -m benchmarks.bench_candle_store
+"""
+import os
+import tempfile
+import time
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_ohlcv
+from services.candle_store import CandleStore
+from services.indicator_frame import IndicatorFrame
+from tools.candles import load_candles, save_candles
+
+BARS = 3 * 365 * 96
+WEEK_MS = 7 * 24 * 3600 * 1000
+REPEATS = 5
+
+
+def best_of(fn, repeats=REPEATS):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    ohlcv = synthetic_ohlcv(BARS + 1, seed=5)
+    rows, extra = ohlcv[:-1], ohlcv[-1:]
+    with tempfile.TemporaryDirectory() as root:
+        store = CandleStore(root)
+        start = time.perf_counter()
+        store.write("binance", "BTC/USDT", "15m", rows)
+        written = time.perf_counter() - start
+        csv_path = os.path.join(root, "btc_15m.csv")
+        save_candles(csv_path, rows)
+
+        # A fresh store object reads what the first one wrote, like after a restart
+        series = CandleStore(root).series("binance", "BTC/USDT", "15m")
+        assert series.tail(BARS) == rows
+        expected = IndicatorFrame(rows)
+        stored = IndicatorFrame.from_columns(series.columns())
+        assert stored.candles.equals(expected.candles)
+        assert np.shares_memory(stored.candles['close'].to_numpy(), series.columns()['close'])
+        assert stored.ema(21).equals(expected.ema(21))
+        print(f"parity OK: {BARS:,} stored candles read back unchanged, frame shares the mapped memory")
+        print(f"initial write: {BARS:,} candles in {written * 1000:.0f}ms "
+              f"({_disk_bytes(series.path) / 1e6:.1f} MB on disk)")
+
+        csv_time, _ = best_of(lambda: IndicatorFrame.from_columns(
+            dict(zip(['timestamp', 'open', 'high', 'low', 'close', 'volume'],
+                     _csv_columns(load_candles(csv_path))))))
+        rows_time, _ = best_of(lambda: IndicatorFrame(rows))
+        store_time, _ = best_of(lambda: IndicatorFrame.from_columns(
+            CandleStore(root).series("binance", "BTC/USDT", "15m").columns()))
+        print(f"frame over {BARS:,} candles: CSV {csv_time * 1000:.0f}ms, "
+              f"row list {rows_time * 1000:.0f}ms, memory-mapped store {store_time * 1000:.1f}ms")
+
+        start_ms = rows[BARS // 2][0]
+        range_time, week = best_of(lambda: series.columns(start_ms, start_ms + WEEK_MS), repeats=1000)
+        print(f"one-week range query: {len(week['close'])} candles in {range_time * 1e6:.0f}us")
+
+        start = time.perf_counter()
+        store.write("binance", "BTC/USDT", "15m", extra)
+        print(f"append one candle: {(time.perf_counter() - start) * 1e6:.0f}us")
+
+
+def _disk_bytes(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path))
+
+
+def _csv_columns(candles):
+    return [candles[:, 0].astype(np.int64)] + [candles[:, i] for i in range(1, 6)]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Streaming indicator benchmark.
+
+Feeds synthetic candles through IndicatorStateStore one candle at a time,
+checks every value against the ta-based frame from get_technical_analysis,
+and checks that previewing the open candle (snapshot) gives the values of
+committing it without changing the state. Then compares the cost of a
+per-candle update with a full 500-bar rebuild, and times the preview with
+the default and a 100x longer Bollinger window.
+
+    python -m benchmarks.bench_indicators
+"""
+import copy
+import math
+import os
+import time
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from benchmarks.synthetic import synthetic_ohlcv
+from services.analytic import build_technical_indicators
+from services.indicator_frame import IndicatorFrame
+from services.streaming_indicators import IndicatorState, IndicatorStateStore, StreamingATR, StreamingBollinger
+from ta.volatility import AverageTrueRange
+
+COLUMNS = ['RSI', 'MACD', 'MACD_signal', 'MACD_histogram', 'BB_upper', 'BB_middle', 'BB_lower', 'MA20', 'MA50', 'MA200']
+TOLERANCE = 1e-9
+
+
+def check_parity(n=2000):
+    rows = synthetic_ohlcv(n, seed=3)
+    frame = build_technical_indicators(IndicatorFrame(rows), bars=n)
+    store = IndicatorStateStore()
+    worst = 0.0
+    for end in range(2, n + 1):
+        snapshot = store.latest("SYN/USDT", "15m", rows[:end])
+        expected = frame.iloc[end - 1]
+        for column in COLUMNS:
+            got, want = snapshot[column], expected[column]
+            if math.isnan(want):
+                assert math.isnan(got), f"{column} should still be warming up at bar {end}"
+                continue
+            error = abs(got - want) / max(1.0, abs(want))
+            assert error < TOLERANCE, f"{column} diverges at bar {end}: {got} vs {want}"
+            worst = max(worst, error)
+
+    atr = StreamingATR(14)
+    streamed = [atr.update(r[2], r[3], r[4]) for r in rows]
+    reference = AverageTrueRange(frame['high'], frame['low'], frame['close'], window=14).average_true_range()
+    assert all(abs(a - b) < TOLERANCE for a, b in zip(streamed, reference)), "ATR diverges"
+
+    print(f"parity OK over {n} bars, worst relative error {worst:.2e}")
+
+
+def check_snapshot(n=500):
+    rows = synthetic_ohlcv(n, seed=4)
+    state = IndicatorState()
+    for end, row in enumerate(rows):
+        before = state_values(state)
+        got = state.snapshot(row)
+        assert state_values(state) == before, f"snapshot changed the state at bar {end}"
+        committed = copy.deepcopy(state)
+        committed.update(row)
+        for column in COLUMNS:
+            a, b = got[column], committed_value(committed, column)
+            assert (math.isnan(a) and math.isnan(b)) or abs(a - b) <= TOLERANCE * max(1.0, abs(b)), \
+                f"snapshot {column} differs from committing bar {end}: {a} vs {b}"
+        state.update(row)
+    print(f"snapshot OK over {n} bars: same values as committing the candle, state unchanged")
+
+
+def state_values(state):
+    parts = (state.rsi, state.macd.fast, state.macd.slow, state.macd.signal, state.bollinger,
+             state.ma20, state.ma50, state.ma200)
+    return repr([vars(part) for part in parts])
+
+
+def committed_value(state, column):
+    macd, signal, hist = state.macd.value
+    upper, middle, lower = state.bollinger.value
+    return {'RSI': state.rsi.value, 'MACD': macd, 'MACD_signal': signal, 'MACD_histogram': hist,
+            'BB_upper': upper, 'BB_middle': middle, 'BB_lower': lower,
+            'MA20': state.ma20.value, 'MA50': state.ma50.value, 'MA200': state.ma200.value}[column]
+
+
+def snapshot_us(state, row, calls=20000):
+    start = time.perf_counter()
+    for _ in range(calls):
+        state.snapshot(row)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    check_parity()
+    check_snapshot()
+
+    rows = synthetic_ohlcv(5000)
+    store = IndicatorStateStore()
+    store.latest("SYN/USDT", "15m", rows[:500])
+    start = time.perf_counter()
+    for end in range(501, 5001):
+        store.latest("SYN/USDT", "15m", rows[end - 500:end])
+    streaming = (time.perf_counter() - start) / 4500
+
+    start = time.perf_counter()
+    for _ in range(50):
+        build_technical_indicators(IndicatorFrame(rows[:500]))
+    rebuild = (time.perf_counter() - start) / 50
+
+    state = IndicatorState()
+    wide = IndicatorState()
+    wide.bollinger = StreamingBollinger(2000, 2)
+    for row in rows[:-1]:
+        state.update(row)
+        wide.update(row)
+    preview, wide_preview = snapshot_us(state, rows[-1]), snapshot_us(wide, rows[-1])
+
+    print(f"streaming update: {streaming * 1e6:10.1f} us per candle")
+    print(f"full rebuild:     {rebuild * 1e6:10.1f} us per call (500 bars)")
+    print(f"snapshot:         {preview:10.1f} us per call (Bollinger window 20), "
+          f"{wide_preview:.1f} us with a 2000-value window")
+
+
+if __name__ == "__main__":
+    main()
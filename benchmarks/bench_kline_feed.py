@@ -0,0 +1,155 @@
+"""
+Kline feed benchmark.
+
+Replays a synthetic kline recording from the local WebSocket stand-in in
+tools.kline_replay, with a stubbed REST endpoint that knows every candle the
+stand-in has sent so far. Checks that the feed's live candles end up equal to
+the REST candles, once over a steady connection and once with the stand-in
+dropping the connection every few messages (so the feed has to reconnect and
+resync what it missed), then compares the read latency of fetch_ohlcv_async
+served by the feed with a REST round trip.
+
+    python -m benchmarks.bench_kline_feed
+"""
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from aiohttp import web
+
+from benchmarks.synthetic import synthetic_ohlcv
+from services import market_data
+from services.candle_sync import CandleBuffer
+from services.kline_feed import KlineFeed, kline_row
+from tools.kline_replay import kline_message, replay_app
+
+SYMBOL, INTERVAL, STEP_MS = "BTC/USDT", "1m", 60_000
+HISTORY = 1000
+LIVE_CANDLES = 40
+UPDATES_PER_CANDLE = 5
+MESSAGE_SPACING_S = 0.01
+STUB_LATENCY_S = 0.08
+READS = 200
+
+
+def recording(history):
+    """
+    Intra-candle updates for the last history candle and LIVE_CANDLES more, the
+    last update of each closing it. The replayed candles end at the current one,
+    so the feed only serves them once it has caught up.
+    """
+    rows = synthetic_ohlcv(HISTORY + LIVE_CANDLES, seed=11, interval_ms=STEP_MS, start_ms=history[0][0])
+    entries = []
+    for timestamp, open_, high, low, close, volume in rows[HISTORY - 1:]:
+        for update in range(1, UPDATES_PER_CANDLE + 1):
+            closed = update == UPDATES_PER_CANDLE
+            # The candle builds up: close walks from open to its final value
+            price = open_ + (close - open_) * update / UPDATES_PER_CANDLE
+            partial = [timestamp, open_, high if closed else max(open_, price), low if closed else min(open_, price),
+                       price, volume * update / UPDATES_PER_CANDLE]
+            entries.append({"at": len(entries) * MESSAGE_SPACING_S,
+                            "message": kline_message(SYMBOL, INTERVAL, partial, closed=closed)})
+    return entries
+
+
+class StubRest:
+    """REST klines as of the stand-in's timeline, with a round-trip latency"""
+
+    def __init__(self, history, entries, app):
+        self.history = history
+        self.entries = entries
+        self.app = app
+        self.requests = 0
+
+    def rows(self):
+        buffer = CandleBuffer(HISTORY + LIVE_CANDLES + 1)
+        buffer.merge(self.history)
+        started = self.app['started']
+        if started is not None:
+            elapsed = time.monotonic() - started
+            buffer.merge([kline_row(e['message']['data']['k']) for e in self.entries if e['at'] <= elapsed])
+        return buffer.tail(len(buffer))
+
+    async def fetch(self, symbol, interval, since=None, limit=500):
+        self.requests += 1
+        await asyncio.sleep(STUB_LATENCY_S)
+        rows = self.rows()
+        if since is not None:
+            rows = [row for row in rows if row[0] >= since]
+        return rows[-limit:]
+
+
+async def serve(app):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"ws://127.0.0.1:{port}/stream"
+
+
+async def replay(drop_after=None, measure=False):
+    now_ms = int(time.time() * 1000) // STEP_MS * STEP_MS
+    history = synthetic_ohlcv(HISTORY, seed=11, interval_ms=STEP_MS,
+                              start_ms=now_ms - (HISTORY + LIVE_CANDLES - 1) * STEP_MS)
+    entries = recording(history)
+    app = replay_app(entries, drop_after=drop_after)
+    rest = StubRest(history, entries, app)
+    runner, url = await serve(app)
+    feed = KlineFeed(url, lambda s, i, since, limit: rest.fetch(s, i, since, limit),
+                     capacity=HISTORY, reconnect_delay=0.05)
+    try:
+        start = time.perf_counter()
+        assert feed.candles(SYMBOL, INTERVAL, HISTORY) is None
+        while not feed.stats()['live']:
+            await asyncio.sleep(0.005)
+        first_live = time.perf_counter() - start
+        await asyncio.sleep(entries[-1]['at'] + 0.5)
+        while feed.candles(SYMBOL, INTERVAL, HISTORY) is None:
+            await asyncio.sleep(0.005)
+        expected = rest.rows()[-HISTORY:]
+        assert feed.candles(SYMBOL, INTERVAL, HISTORY) == expected
+        stats, requests = feed.stats(), rest.requests
+        latency = await read_latency(feed, rest, expected) if measure else None
+        return stats, requests, first_live, latency
+    finally:
+        await feed.close()
+        await runner.cleanup()
+
+
+async def read_latency(feed, rest, expected):
+    """Median fetch_ohlcv_async time served by the live feed, and of a REST fetch"""
+    market_data.kline_feed = feed
+    try:
+        times = []
+        for _ in range(READS):
+            start = time.perf_counter()
+            rows = await market_data.fetch_ohlcv_async(SYMBOL, INTERVAL, limit=HISTORY)
+            times.append(time.perf_counter() - start)
+        assert rows == expected
+    finally:
+        market_data.kline_feed = None
+    start = time.perf_counter()
+    await rest.fetch(SYMBOL, INTERVAL, limit=HISTORY)
+    return statistics.median(times), time.perf_counter() - start
+
+
+async def main():
+    stats, requests, first_live, (feed_read, rest_read) = await replay(measure=True)
+    print(f"steady: live after {first_live * 1000:.0f}ms (one REST seed), {stats['messages']} updates applied, "
+          f"{requests} REST fetches, candles match REST")
+
+    stats, requests, _, _ = await replay(drop_after=25)
+    print(f"dropping every 25 messages: {stats['reconnects']} reconnects, {stats['resyncs']} resyncs "
+          f"({stats['gaps']} from skipped candles), {requests} REST fetches, candles match REST")
+
+    print(f"fetch_ohlcv_async of {HISTORY} candles: {feed_read * 1e6:.0f}us from the feed vs "
+          f"{rest_read * 1000:.0f}ms for a REST round trip")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
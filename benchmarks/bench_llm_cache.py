@@ -0,0 +1,129 @@
+"""
+Streamed AI answers through the LLM response cache, against a stubbed
+OpenRouter stream.
+
+Checks that concurrent streamed requests for the same prompt on the same
+candle share one OpenRouter stream: every caller, including one that joins
+mid-stream, gets every text from the first delta. Checks that an error
+reaches every caller, and that the finished answer is cached once. Checks
+that the llm_call stage only times the upstream stream, not what callers
+do with each text (the throttled Discord edits). Then counts the paid
+OpenRouter streams a burst of identical streamed commands makes.
+
+    python -m benchmarks.bench_llm_cache
+"""
+import asyncio
+import os
+import time
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from benchmarks.synthetic import synthetic_ohlcv
+from services import llm_cache
+from services.indicator_frame import IndicatorFrame
+from services.metrics import command_scope, stage_seconds
+
+ANSWER = "BTC holds the 4H EMA; long above 64,200, target 66,000, stop 63,400."
+CHUNKS = 8
+LATENCY_S = 0.2
+CALLERS = 20
+
+
+class StubStream:
+    """stream_chat_completion yielding ANSWER in CHUNKS deltas over `latency` seconds, counting calls"""
+
+    def __init__(self, latency=LATENCY_S, fail_after=None):
+        self.latency = latency
+        self.fail_after = fail_after
+        self.calls = 0
+
+    async def __call__(self, model, system_prompt, user_prompt, **kwargs):
+        self.calls += 1
+        size = -(-len(ANSWER) // CHUNKS)
+        for n, i in enumerate(range(0, len(ANSWER), size)):
+            if n == self.fail_after:
+                raise RuntimeError("stub stream broke")
+            await asyncio.sleep(self.latency / CHUNKS)
+            yield ANSWER[i:i + size]
+
+
+def candles(seed):
+    # Ending on the current candle, so cached answers haven't expired yet
+    interval_ms = 900_000
+    start_ms = (int(time.time() * 1000) // interval_ms - 99) * interval_ms
+    return IndicatorFrame(synthetic_ohlcv(100, seed=seed, interval_ms=interval_ms, start_ms=start_ms)).candles
+
+
+async def read(prompt, frame, per_text_s=0.0):
+    """Every text the stream yields, sleeping `per_text_s` on each like a Discord edit"""
+    texts = []
+    async for text in llm_cache.stream_cached_chat_completion("bench", "BTC/USDT", "15m", frame,
+                                                              "stub/model", "system", prompt):
+        texts.append(text)
+        await asyncio.sleep(per_text_s)
+    return texts
+
+
+def llm_call_seconds(command):
+    series = stage_seconds._series.get(('llm_call', command))
+    return (series[1], series[2]) if series else (0.0, 0)
+
+
+async def check_sharing():
+    stub = llm_cache.stream_chat_completion = StubStream()
+    frame = candles(1)
+
+    async def late():
+        await asyncio.sleep(LATENCY_S / 2)
+        return await read("shared", frame)
+    results = await asyncio.gather(read("shared", frame), read("shared", frame), late())
+    assert stub.calls == 1, stub.calls
+    for texts in results:
+        assert texts[-1] == ANSWER and len(texts) == CHUNKS, texts
+        assert all(ANSWER.startswith(text) for text in texts)
+    # The finished answer was cached: a repeat is one full text without a stream
+    assert await read("shared", frame) == [ANSWER] and stub.calls == 1
+
+    stub = llm_cache.stream_chat_completion = StubStream(fail_after=3)
+    outcomes = await asyncio.gather(read("broken", frame), read("broken", frame), return_exceptions=True)
+    assert stub.calls == 1 and all(isinstance(o, RuntimeError) for o in outcomes), outcomes
+    assert llm_cache.llm_cache.stats()["entries"] == 1
+    assert llm_cache.async_llm_flights.stats()["in_flight"] == 0
+
+
+async def check_timing():
+    llm_cache.stream_chat_completion = StubStream()
+    edit_s = 0.05
+    with command_scope('bench_timing'):
+        await read("timed", candles(2), per_text_s=edit_s)
+    total, count = llm_call_seconds('bench_timing')
+    assert count == 1 and total < LATENCY_S + edit_s, (total, LATENCY_S, CHUNKS * edit_s)
+    return total
+
+
+async def burst():
+    stub = llm_cache.stream_chat_completion = StubStream()
+    start = time.perf_counter()
+    await asyncio.gather(*(read("burst", candles(3)) for _ in range(CALLERS)))
+    return stub.calls, time.perf_counter() - start
+
+
+async def main():
+    original = llm_cache.stream_chat_completion
+    try:
+        await check_sharing()
+        print("sharing OK: concurrent identical streams (one joining mid-stream) make one upstream call "
+              "and each get every text; errors reach every caller; the answer is cached once")
+        total = await check_timing()
+        print(f"timing OK: llm_call recorded {total * 1000:.0f}ms for a {LATENCY_S * 1000:.0f}ms upstream stream "
+              f"read by a caller spending {CHUNKS * 50}ms on its texts")
+        calls, elapsed = await burst()
+        print(f"{CALLERS} identical streamed commands at once: {calls} OpenRouter stream "
+              f"(was {CALLERS}, one per command), all answered in {elapsed:.2f}s")
+    finally:
+        llm_cache.stream_chat_completion = original
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+"""
+Candle memory benchmark.
+
+Measures how much memory one (symbol, interval) keeps alive with 1,000
+candles, in the layouts the bot can hold them in, and projects it to 300
+pairs on 3 intervals:
+
+- the candle cache entry, as a deque of ccxt row lists (its layout before
+  CandleColumns) and as a CandleBuffer in float64 and float32
+- the candles plus the 10 !analytic indicator columns, as the DataFrame
+  build_technical_indicators returns and as CandleColumns in float64 and
+  float32
+
+Checks that the float64 columns give back the same DataFrame and rows, that
+slices and DataFrames share the column arrays, and reports the float32
+rounding error.
+
+    python -m benchmarks.bench_memory
+"""
+import gc
+import os
+import time
+import tracemalloc
+import warnings
+from collections import deque
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_ohlcv
+from services.analytic import build_technical_indicators
+from services.candle_columns import OHLCV, CandleColumns
+from services.candle_sync import CandleBuffer
+from services.indicator_frame import FRAME_LIMIT, IndicatorFrame
+
+PAIRS = 300
+INTERVALS = 3
+SAMPLE = 60
+
+
+def retained_kb(build):
+    """Memory kept alive per entry, over SAMPLE entries built with build(seed)"""
+    gc.collect()
+    tracemalloc.start()
+    kept = [build(seed) for seed in range(SAMPLE)]
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return retained / SAMPLE / 1024
+
+
+def indicator_frame(seed):
+    return build_technical_indicators(IndicatorFrame(synthetic_ohlcv(FRAME_LIMIT, seed=seed)), bars=FRAME_LIMIT)
+
+
+def indicator_columns(seed, dtype):
+    df = indicator_frame(seed)
+    columns = CandleColumns.from_rows(synthetic_ohlcv(FRAME_LIMIT, seed=seed), dtype)
+    for name in df.columns.drop(list(OHLCV)):
+        columns.add(name, df[name])
+    return columns
+
+
+def cache_buffer(seed, dtype):
+    buffer = CandleBuffer(FRAME_LIMIT, dtype)
+    buffer.merge(synthetic_ohlcv(FRAME_LIMIT, seed=seed))
+    return buffer
+
+
+def check():
+    rows = synthetic_ohlcv(FRAME_LIMIT, seed=1)
+    df = indicator_frame(1)
+    columns = indicator_columns(1, np.float64)
+    pd.testing.assert_frame_equal(columns.frame(), df)
+    assert columns.rows() == rows and cache_buffer(1, np.float64).tail(FRAME_LIMIT) == rows
+    frame = columns.frame()
+    assert np.shares_memory(frame['close'].to_numpy(), columns['close'])
+    assert np.shares_memory(columns.tail(100)['RSI'], columns['RSI'])
+    assert np.shares_memory(IndicatorFrame(columns).candles['close'].to_numpy(), columns['close'])
+    narrow = indicator_columns(1, np.float32).frame()
+    values = df.to_numpy()
+    error = np.nanmax(np.abs(narrow.to_numpy(np.float64) - values) / np.maximum(np.abs(values), 1e-9))
+    return error
+
+
+def main():
+    warnings.filterwarnings("ignore")
+    error = check()
+    print(f"parity OK: float64 columns give back the same DataFrame and rows, slices and DataFrames share "
+          f"the arrays; float32 worst relative error {error:.1e}")
+
+    entries = PAIRS * INTERVALS
+    print(f"memory kept per (symbol, interval) with {FRAME_LIMIT} candles, and for {PAIRS} pairs x {INTERVALS} intervals")
+    groups = [
+        ("candle cache entry", [
+            ("deque of rows", lambda seed: deque(synthetic_ohlcv(FRAME_LIMIT, seed=seed), maxlen=FRAME_LIMIT)),
+            ("CandleBuffer float64", lambda seed: cache_buffer(seed, np.float64)),
+            ("CandleBuffer float32", lambda seed: cache_buffer(seed, np.float32)),
+        ]),
+        ("candles + 10 indicator columns", [
+            ("DataFrame", indicator_frame),
+            ("CandleColumns float64", lambda seed: indicator_columns(seed, np.float64)),
+            ("CandleColumns float32", lambda seed: indicator_columns(seed, np.float32)),
+        ]),
+    ]
+    for group, cases in groups:
+        print(f"\n{group}")
+        baseline = None
+        for name, build in cases:
+            kb = retained_kb(build)
+            baseline = baseline or kb
+            print(f"  {name:<22} {kb:>7.1f} KB {kb * entries / 1024:>7.1f} MB  {baseline / kb:.1f}x smaller")
+
+    columns = indicator_columns(1, np.float64)
+    start = time.perf_counter()
+    for _ in range(100):
+        columns.frame()
+    print(f"\nDataFrame over the columns when a command needs one: {(time.perf_counter() - start) * 10:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Multi-timeframe engine benchmark for !mtf.
+
+Builds the 1h/4h/1d candles of a 20,000-bar 15m series with the engine and
+checks them against pandas' resample (resample_to_higher_timeframe). Then
+replays the series the way the bot sees it, a few candles at a time with the
+forming candle rewritten on every update, and checks that the incremental
+result matches a full rebuild. Times one live update against resampling the
+whole series for every timeframe.
+
+    python -m benchmarks.bench_mtf
+"""
+import os
+import time
+import warnings
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_ohlcv
+from services.indicator_frame import IndicatorFrame
+from services.multi_timeframe import HIGHER_TIMEFRAMES, MultiTimeframeSeries
+from services.supertrend import resample_to_higher_timeframe
+
+BARS = 20_000
+STEP_MS = 900_000
+UPDATES = 200
+
+
+def forming(row):
+    # The open candle as an earlier fetch saw it: same open, narrower range, less volume
+    return [row[0], row[1], max(row[1], row[4]), min(row[1], row[4]), row[4], row[5] / 3]
+
+
+def main():
+    warnings.filterwarnings("ignore")
+    # Start mid-day so the first merge has to drop a partial day
+    rows = synthetic_ohlcv(BARS + 40, seed=11, interval_ms=STEP_MS, start_ms=1_700_000_000_000 // STEP_MS * STEP_MS)
+
+    full = MultiTimeframeSeries('15m', capacity=BARS)
+    start = time.perf_counter()
+    full.merge(rows)
+    build_s = time.perf_counter() - start
+    base = IndicatorFrame.from_columns(full.candles('15m').columns).candles
+    for interval in HIGHER_TIMEFRAMES:
+        expected = resample_to_higher_timeframe(base, interval.replace('d', 'D'))
+        candles = full.candles(interval).columns
+        assert np.array_equal(expected.index.asi8 // 10 ** 6, candles['timestamp']), interval
+        for name in ('open', 'high', 'low', 'close', 'volume'):
+            assert np.allclose(expected[name].to_numpy(), candles[name]), (interval, name)
+    print(f"full build of {len(full)} 15m candles (+{', '.join(HIGHER_TIMEFRAMES)}): {build_s * 1000:.1f}ms, "
+          f"matches pandas resample")
+
+    # Live updates: the last 3 candles again plus up to 2 new ones, the newest still forming
+    series = MultiTimeframeSeries('15m', capacity=BARS)
+    series.merge(rows[:-UPDATES])
+    times = []
+    for i in range(len(rows) - UPDATES, len(rows)):
+        update = rows[i - 3:i] + [forming(rows[i])]
+        start = time.perf_counter()
+        series.merge(update)
+        times.append(time.perf_counter() - start)
+    series.merge(rows[-3:])
+    for interval in ('15m', *HIGHER_TIMEFRAMES):
+        a, b = series.candles(interval).columns, full.candles(interval).columns
+        assert all(np.allclose(a[name], b[name]) for name in a), interval
+
+    start = time.perf_counter()
+    for interval in HIGHER_TIMEFRAMES:
+        resample_to_higher_timeframe(base, interval.replace('d', 'D'))
+    resample_s = time.perf_counter() - start
+    update_s = float(np.median(times))
+    print(f"incremental update: {update_s * 1000:.3f}ms median over {UPDATES} updates, matches a full rebuild")
+    print(f"pandas resample of every timeframe: {resample_s * 1000:.1f}ms ({resample_s / update_s:.0f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
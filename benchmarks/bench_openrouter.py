@@ -0,0 +1,173 @@
+"""
+OpenRouter client benchmark against the local stand-in in tools.openrouter_stub.
+
+Checks the blocking, async and streamed (SSE) calls through retries on
+429/503, the read timeout, a stream cut after its first deltas, and the
+circuit breaker. One call whose retries all fail counts as one breaker
+failure, so the next call still goes through, and only failure_threshold
+failed calls open the circuit. A stream counts as a success only once read
+to its end, so one cut after its 200 status (even a half-open trial) counts
+only as a failure. Then times sequential calls over the pooled
+keep-alive session against a bare requests.post per call (what the signal
+functions did before the client).
+
+    python -m benchmarks.bench_openrouter
+"""
+import asyncio
+import os
+import time
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+import requests
+
+from services.openrouter import CircuitBreaker, CircuitOpenError, OpenRouterClient, OpenRouterError
+from tools.openrouter_stub import ANSWER, running, stub_app
+
+MODEL = "stub/model"
+CALLS = 200
+RESET_TIMEOUT_S = 0.3
+
+
+def client(base_url, **kwargs):
+    options = dict(base_url=base_url, api_key="benchmark", backoff_base=0.001, read_timeout=0.5,
+                   breaker=CircuitBreaker(failure_threshold=5, reset_timeout=RESET_TIMEOUT_S))
+    options.update(kwargs)
+    return OpenRouterClient(**options)
+
+
+def content(response):
+    return response["choices"][0]["message"]["content"]
+
+
+async def stream_text(c):
+    return "".join([delta async for delta in c.stream_chat_completion(MODEL, "system", "user")])
+
+
+def check_calls(app, base_url):
+    script = app['script']
+
+    # Blocking: two retryable errors, then the answer
+    c = client(base_url)
+    script.extend([429, 503, 200])
+    assert content(c.chat_completion(MODEL, "system", "user")) == ANSWER
+    assert (c.requests, c.retries, c.failures, c.breaker.state) == (3, 2, 0, "closed"), c.stats()
+
+    async def async_calls():
+        script.extend([503, 429, 200])
+        assert content(await c.chat_completion_async(MODEL, "system", "user")) == ANSWER
+        script.extend([503, 200])
+        assert await stream_text(c) == ANSWER
+        # Once text is out a broken stream is an error, not a retry
+        script.append("cut")
+        try:
+            await stream_text(c)
+            raise AssertionError("a cut stream should raise")
+        except OpenRouterError as e:
+            assert "interrupted" in str(e), e
+        await c.close()
+    asyncio.run(async_calls())
+    assert c.failures == 1 and c.breaker.state == "closed", c.stats()
+
+    # A request that never answers ends at the read timeout
+    hung = client(base_url, read_timeout=0.2, max_retries=0)
+    script.append("hang")
+    start = time.perf_counter()
+    try:
+        hung.chat_completion(MODEL, "system", "user")
+        raise AssertionError("a hung request should time out")
+    except OpenRouterError:
+        assert time.perf_counter() - start < 1.0
+
+
+def check_breaker(app, base_url):
+    script = app['script']
+    c = client(base_url)
+    # Every attempt of one call fails: one breaker failure, and the next call isn't refused
+    script.extend([503] * (c.max_retries + 1))
+    assert "error" in c.chat_completion(MODEL, "system", "user")
+    assert c.breaker.failures == 1 and c.breaker.state == "closed", c.stats()
+    assert content(c.chat_completion(MODEL, "system", "user")) == ANSWER
+
+    # failure_threshold failed calls open it; then calls fail fast without a request
+    for _ in range(c.breaker.failure_threshold):
+        script.extend([503] * (c.max_retries + 1))
+        c.chat_completion(MODEL, "system", "user")
+    assert c.breaker.state == "open", c.stats()
+    sent = app['stats']['requests']
+    try:
+        c.chat_completion(MODEL, "system", "user")
+        raise AssertionError("an open circuit should refuse the call")
+    except CircuitOpenError:
+        assert app['stats']['requests'] == sent
+
+    # After reset_timeout one trial goes through and closes it again
+    time.sleep(RESET_TIMEOUT_S)
+    assert content(c.chat_completion(MODEL, "system", "user")) == ANSWER
+    assert c.breaker.state == "closed", c.stats()
+
+
+async def cut_stream(c, script):
+    script.append("cut")
+    try:
+        await stream_text(c)
+        raise AssertionError("a cut stream should raise")
+    except OpenRouterError:
+        pass
+
+
+def check_stream_breaker(app, base_url):
+    """A stream counts as a success only once read to the end, so a cut one is only a failure"""
+    script = app['script']
+
+    async def calls():
+        c = client(base_url, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=RESET_TIMEOUT_S))
+        script.extend([503] * (c.max_retries + 1))
+        await c.chat_completion_async(MODEL, "system", "user")
+        # The 200 status before the cut must not reset the earlier failure
+        await cut_stream(c, script)
+        assert c.breaker.failures == 2 and c.breaker.state == "open", c.stats()
+
+        # A half-open trial whose stream breaks opens the circuit again
+        await asyncio.sleep(RESET_TIMEOUT_S)
+        await cut_stream(c, script)
+        assert c.breaker.state == "open", c.stats()
+        await asyncio.sleep(RESET_TIMEOUT_S)
+        assert await stream_text(c) == ANSWER
+        assert c.breaker.state == "closed" and c.breaker.failures == 0, c.stats()
+        await c.close()
+    asyncio.run(calls())
+
+
+def per_call_ms(call):
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        call()
+    return (time.perf_counter() - start) / CALLS * 1000
+
+
+def main():
+    app = stub_app()
+    with running(app) as base_url:
+        check_calls(app, base_url)
+        print("calls OK: blocking, async and streamed answers through 429/503 retries, read timeout, cut stream")
+        check_breaker(app, base_url)
+        print("breaker OK: a call that fails every retry counts once, the circuit opens after 5 failed calls, "
+              "refuses calls without a request, and closes after a successful trial")
+        check_stream_breaker(app, base_url)
+        print("stream breaker OK: a stream cut after its 200 status counts only as a failure, "
+              "and a cut half-open trial opens the circuit again")
+
+        pooled = client(base_url)
+        url = base_url + "/chat/completions"
+        body = {"model": MODEL, "messages": [{"role": "user", "content": "user"}]}
+        pooled_ms = per_call_ms(lambda: pooled.chat_completion(MODEL, "system", "user"))
+        bare_ms = per_call_ms(lambda: requests.post(url, json=body, headers={"Connection": "close"}))
+        print(f"{CALLS} sequential calls to the local stub: {pooled_ms:.2f}ms per call pooled, "
+              f"{bare_ms:.2f}ms with a new connection each (no TLS here; against openrouter.ai every "
+              f"new connection also pays a TLS handshake)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Prompt size benchmark for the !asignal / !smcsignal data block.
+
+Compares three ways of putting the 500-bar indicator table into a prompt:
+pandas' repr (what the prompts used to embed; it elides most rows and
+columns), the full table as CSV (the lossless alternative), and
+encode_market_data at a few token budgets. A stubbed LLM whose latency grows
+with prompt size gives the time-to-response for each.
+
+    python -m benchmarks.bench_prompt
+"""
+import os
+import time
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from benchmarks.synthetic import synthetic_ohlcv
+from services.analytic import build_technical_indicators
+from services.indicator_frame import IndicatorFrame
+from utils.prompt_encoder import count_tokens, encode_market_data
+
+# Stub LLM: fixed overhead plus prompt prefill at this many tokens per second
+STUB_OVERHEAD_S = 0.05
+STUB_PREFILL_TOKENS_PER_S = 20_000
+
+
+def stub_llm(prompt):
+    time.sleep(STUB_OVERHEAD_S + count_tokens(prompt) / STUB_PREFILL_TOKENS_PER_S)
+    return "Neutral"
+
+
+def measure(name, encode):
+    start = time.perf_counter()
+    text = encode()
+    encode_s = time.perf_counter() - start
+    start = time.perf_counter()
+    stub_llm(text)
+    llm_s = time.perf_counter() - start
+    print(f"{name:<22} {count_tokens(text):>8} {len(text):>8} {encode_s * 1000:>10.2f} {llm_s * 1000:>10.1f}")
+
+
+def main():
+    indicators = build_technical_indicators(IndicatorFrame(synthetic_ohlcv(1000)))
+    print(f"indicator table: {indicators.shape[0]} rows x {indicators.shape[1]} columns")
+    print(f"{'encoding':<22} {'tokens':>8} {'chars':>8} {'encode ms':>10} {'stub ms':>10}")
+    measure("pandas repr (lossy)", lambda: str(indicators))
+    measure("full CSV", lambda: indicators.to_csv())
+    for budget in (1000, 2000, 4000):
+        measure(f"encoder budget={budget}", lambda: encode_market_data(indicators, token_budget=budget))
+
+
+if __name__ == "__main__":
+    main()
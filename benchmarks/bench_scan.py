@@ -0,0 +1,96 @@
+"""
+Market scan benchmark for !scan.
+
+Runs the multi-filter strategy over a few hundred synthetic pairs through a
+stubbed exchange that adds per-request latency and spaces request starts the
+way ccxt's rate limiter does for Binance klines. Compares one pair at a time
+(fetch, then analyse, like calling the single-symbol path in a loop) with
+scan_market_async, cold and with the candle cache warm.
+
+    python -m benchmarks.bench_scan
+"""
+import asyncio
+import os
+import time
+import warnings
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from benchmarks.synthetic import synthetic_ohlcv
+from services import market_data
+from services.indicator_frame import IndicatorFrame
+from services.scanner import scan_market_async
+from services.supertrend import compute_advanced_technical_analysis
+
+PAIRS = 400
+SEQUENTIAL_SAMPLE = 40
+
+# Stub exchange: round trip latency, and request starts spaced like ccxt's limiter (cost 0.4 x 50ms)
+STUB_LATENCY_S = 0.08
+STUB_SPACING_S = 0.02
+
+
+class StubExchange:
+    timeframes = {'15m': '15m'}
+
+    def __init__(self, pairs):
+        # Candles end "now" so the candle cache treats them as current
+        interval_ms = 900_000
+        start_ms = (int(time.time() * 1000) // interval_ms) * interval_ms - interval_ms * 999
+        self.candles = {f"COIN{i}/USDT": synthetic_ohlcv(1000, seed=i, start_ms=start_ms) for i in range(pairs)}
+        self.requests = 0
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def load_markets(self):
+        return {symbol: {'spot': True, 'active': True, 'quote': 'USDT'} for symbol in self.candles}
+
+    async def fetch_ohlcv(self, symbol, interval, since=None, limit=500):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_start - now
+            self._next_start = max(now, self._next_start) + STUB_SPACING_S
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self.requests += 1
+        await asyncio.sleep(STUB_LATENCY_S)
+        rows = self.candles[symbol]
+        if since is not None:
+            rows = [row for row in rows if row[0] >= since]
+        return rows[-limit:]
+
+    async def close(self):
+        pass
+
+
+async def sequential(exchange, symbols):
+    for symbol in symbols:
+        ohlcv = await exchange.fetch_ohlcv(symbol, '15m', limit=1000)
+        compute_advanced_technical_analysis(IndicatorFrame(ohlcv))
+
+
+async def main():
+    warnings.filterwarnings("ignore")
+    exchange = StubExchange(PAIRS)
+    market_data.async_exchange = exchange
+    # Room for every pair, so the warm run measures cache reuse rather than eviction
+    market_data.candle_cache.max_bytes = 512 * 1024 * 1024
+
+    symbols = sorted(exchange.candles)[:SEQUENTIAL_SAMPLE]
+    start = time.perf_counter()
+    await sequential(exchange, symbols)
+    per_pair = (time.perf_counter() - start) / SEQUENTIAL_SAMPLE
+    print(f"{PAIRS} pairs, {STUB_LATENCY_S * 1000:.0f}ms latency, {STUB_SPACING_S * 1000:.0f}ms request spacing")
+    print(f"{'one pair at a time':<22} {per_pair * PAIRS:>8.2f}s  (extrapolated from {SEQUENTIAL_SAMPLE} pairs)")
+
+    for label in ("scan (cold cache)", "scan (warm cache)"):
+        exchange.requests = 0
+        start = time.perf_counter()
+        scan = await scan_market_async('15m', 'USDT')
+        elapsed = time.perf_counter() - start
+        print(f"{label:<22} {elapsed:>8.2f}s  {exchange.requests} requests, {len(scan['results'])} signals")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
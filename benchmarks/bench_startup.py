@@ -0,0 +1,94 @@
+"""
+Cold start benchmark.
+
+Times how long a fresh process takes before the bot can start logging in to
+Discord: importing main.py with lazy service imports (FAST_STARTUP) versus
+importing every service up front, each in a new interpreter. Then sends the
+first !analytic after a restart through the command pipeline of
+benchmarks.loadtest, against a fake exchange that, like ccxt, loads the
+market list inside the first candle request. Compares it with the same
+command after the on_ready preload.
+
+    python -m benchmarks.bench_startup
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import warnings
+from types import SimpleNamespace
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+RUNS = 3
+MARKETS_LATENCY_S = 1.5
+REQUEST_LATENCY_S = 0.08
+
+IMPORT_LAZY = "import main"
+IMPORT_EAGER = "import main; from services.startup import import_services; import_services()"
+
+
+def import_seconds(code):
+    """Best wall time of `code` in a new interpreter, over RUNS runs"""
+    timed = f"import time; start = time.perf_counter(); {code}; print(time.perf_counter() - start)"
+    return min(float(subprocess.run([sys.executable, "-c", timed], capture_output=True, text=True,
+                                    check=True, env=os.environ).stdout.split()[-1]) for _ in range(RUNS))
+
+
+async def first_commands():
+    """Latency of the first !analytic with nothing loaded, and after the preload (plus how long that took)"""
+    import main as bot_main
+    from benchmarks.loadtest import FakeExchange, run_command
+    from services import analytic, market_data
+    from services.indicator_frame import indicator_frames
+    from services.startup import import_services, preload
+
+    class MarketsOnFirstUse(FakeExchange):
+        # ccxt loads exchangeInfo (several MB) inside the first request if nobody did before
+        async def load_markets(self):
+            await asyncio.sleep(MARKETS_LATENCY_S)
+            return await super().load_markets()
+
+        async def fetch_ohlcv(self, symbol, interval, since=None, limit=500):
+            if self.markets is None:
+                await self.load_markets()
+            return await super().fetch_ohlcv(symbol, interval, since, limit)
+
+    def restart():
+        market_data.async_exchange = MarketsOnFirstUse(["BTC/USDT", "ETH/USDT"], REQUEST_LATENCY_S, 60)
+        market_data.candle_cache.clear()
+        indicator_frames._frames.clear()
+        analytic.indicator_states._states.clear()
+
+    import_services()
+    market_data.kline_feed = None
+    market_data.candle_store = None
+    results = []
+    async with bot_main.bot:
+        bot_main.bot._connection.user = SimpleNamespace(id=0)
+        channel = SimpleNamespace(id=1)
+        restart()
+        await run_command("!analytic BTC/USDT 15m", channel, time.perf_counter(), results)
+        restart()
+        start = time.perf_counter()
+        await preload(["BTC/USDT", "ETH/USDT"], ["15m"])
+        preload_s = time.perf_counter() - start
+        await run_command("!analytic BTC/USDT 15m", channel, time.perf_counter(), results)
+    return results[0][1], results[1][1], preload_s
+
+
+def main():
+    warnings.filterwarnings("ignore")
+    lazy, eager = import_seconds(IMPORT_LAZY), import_seconds(IMPORT_EAGER)
+    print(f"process start -> Discord login: {eager:.2f}s importing every service first, "
+          f"{lazy:.2f}s with FAST_STARTUP ({eager - lazy:.2f}s of imports moved to a background thread)")
+
+    cold, warm, preload_s = asyncio.run(first_commands())
+    print(f"first !analytic after a restart: {cold * 1000:.0f}ms cold (markets load {MARKETS_LATENCY_S * 1000:.0f}ms "
+          f"+ candle fetch), {warm * 1000:.0f}ms after the {preload_s:.2f}s on_ready preload")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Supertrend micro-benchmark.
+
+Checks the array kernel against the original per-bar pandas loop, then
+reports bars/sec at 1k, 100k and 1M bars.
+
+    python -m benchmarks.bench_supertrend
+"""
+import os
+import time
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+import numpy as np
+import pandas as pd
+from ta.volatility import AverageTrueRange
+
+from benchmarks.synthetic import synthetic_frame
+from services.supertrend import calculate_supertrend, calculate_supertrend_arrays
+
+
+def reference_supertrend(df, period=10, multiplier=3.0):
+    """The original iloc loop, kept here as the parity reference"""
+    atr = AverageTrueRange(high=df['high'], low=df['low'], close=df['close'], window=period).average_true_range()
+
+    hl2 = (df['high'] + df['low']) / 2
+    upper_band = hl2 + (multiplier * atr)
+    lower_band = hl2 - (multiplier * atr)
+
+    supertrend = pd.Series(index=df.index, dtype=float)
+    direction = pd.Series(index=df.index, dtype=int)
+
+    for i in range(len(df)):
+        if i == 0:
+            supertrend.iloc[i] = upper_band.iloc[i]
+            direction.iloc[i] = 1
+        else:
+            if upper_band.iloc[i] < supertrend.iloc[i-1] or df['close'].iloc[i-1] > supertrend.iloc[i-1]:
+                upper_band.iloc[i] = upper_band.iloc[i]
+            else:
+                upper_band.iloc[i] = supertrend.iloc[i-1]
+
+            if lower_band.iloc[i] > supertrend.iloc[i-1] or df['close'].iloc[i-1] < supertrend.iloc[i-1]:
+                lower_band.iloc[i] = lower_band.iloc[i]
+            else:
+                lower_band.iloc[i] = supertrend.iloc[i-1]
+
+            if df['close'].iloc[i] <= lower_band.iloc[i]:
+                supertrend.iloc[i] = lower_band.iloc[i]
+                direction.iloc[i] = -1
+            elif df['close'].iloc[i] >= upper_band.iloc[i]:
+                supertrend.iloc[i] = upper_band.iloc[i]
+                direction.iloc[i] = 1
+            else:
+                supertrend.iloc[i] = supertrend.iloc[i-1]
+                direction.iloc[i] = direction.iloc[i-1]
+
+    return supertrend, direction
+
+
+def check_parity(n=3000, period=10, multiplier=3.0):
+    df = synthetic_frame(n, seed=7)
+    ref_st, ref_dir = reference_supertrend(df, period, multiplier)
+    st, direction = calculate_supertrend(df, period, multiplier)
+    assert np.allclose(st.to_numpy(), ref_st.to_numpy(), rtol=1e-9, atol=1e-9), "supertrend bands diverge"
+    assert np.array_equal(direction.to_numpy(), ref_dir.to_numpy()), "supertrend directions diverge"
+    print(f"parity OK over {n} bars (period={period}, multiplier={multiplier})")
+
+
+def bars_per_sec(fn, n, repeat=3):
+    df = synthetic_frame(n)
+    high, low, close = df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df, high, low, close)
+        best = min(best, time.perf_counter() - start)
+    return n / best, best
+
+
+def main():
+    check_parity()
+    check_parity(n=1500, period=7, multiplier=2.0)
+
+    print(f"{'bars':>10} {'impl':>10} {'seconds':>10} {'bars/sec':>14}")
+    rate, secs = bars_per_sec(lambda df, h, l, c: reference_supertrend(df), 1_000, repeat=1)
+    print(f"{1_000:>10} {'iloc loop':>10} {secs:>10.4f} {rate:>14,.0f}")
+    for n in (1_000, 100_000, 1_000_000):
+        rate, secs = bars_per_sec(lambda df, h, l, c: calculate_supertrend_arrays(h, l, c), n)
+        print(f"{n:>10} {'arrays':>10} {secs:>10.4f} {rate:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
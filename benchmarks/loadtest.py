@@ -0,0 +1,259 @@
+"""
+Load test of the Discord command handlers.
+
+Sends a stream of commands (`!analytic`, `!signal`, `!smcsignal`,
+`!trendsignal`, ...) through the bot's real command pipeline:
+get_context, the before/after invoke hooks, argument parsing and the
+handlers in main.py. There is no Discord connection. Replies and edits go
+to a fake channel, the exchange is an in-memory fake and OpenRouter is a
+canned answer, each with a configurable latency. Commands arrive at random
+(Poisson) times at --rate per second, are spread over --pairs pairs, and
+don't wait for each other, so a slow command or a blocked event loop delays
+the ones behind it the way a busy channel would.
+
+Reports throughput, p50/p95/p99 latency per command and overall, measured
+from each command's arrival to its last reply, and the event-loop lag
+sampled every 50ms. The candle, indicator and LLM caches work as in
+production, so repeated commands on the same pair and candle are cheap.
+Use more --pairs for mostly cache misses.
+
+    python -m benchmarks.loadtest
+    python -m benchmarks.loadtest --rate 20 --duration 60 --mix analytic=2,signal=1,trendsignal=1
+    python -m benchmarks.loadtest --llm-latency 4 --no-stream --pairs 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import warnings
+import zlib
+from types import SimpleNamespace
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from discord.ext import commands
+
+import main as bot_main
+from benchmarks.synthetic import synthetic_ohlcv
+from services import llm_cache, market_data
+from services.candle_cache import timeframe_ms
+from services.indicator_frame import FRAME_LIMIT
+
+DEFAULT_MIX = "analytic=4,signal=2,smcsignal=1,trendsignal=2,aitrendsignal=1"
+LAG_INTERVAL_S = 0.05
+STREAM_CHUNKS = 8
+ANSWER = (
+    "🔹 Signal Type: Buy\n🔹 Entry: 30120.5\n🔹 Stop Loss: 29780.0\n🔹 Take Profit: 30850.0\n"
+    "🔹 Confidence: 62%\n🔹 Reasoning: Price reclaimed the 50 EMA with rising volume, "
+    "RSI recovered from 38 to 54 and MACD crossed above its signal line. "
+    "Bollinger bands are widening after a squeeze, which favours continuation. "
+    "A close back below the mid band invalidates the setup."
+)
+
+
+class FakeExchange:
+    """Async ccxt stand-in: synthetic candles per pair, up to the current open candle, after `latency` seconds"""
+    id = "binance"
+    timeframes = {tf: tf for tf in ("1m", "5m", "15m", "30m", "1h", "4h", "1d")}
+
+    def __init__(self, symbols, latency, horizon_s):
+        self.symbols = symbols
+        self.latency = latency
+        self.horizon_s = horizon_s
+        self.markets = None
+        self._series = {}
+
+    def milliseconds(self):
+        return int(time.time() * 1000)
+
+    def _rows(self, symbol, interval):
+        key = (symbol, interval)
+        if key not in self._series:
+            # Enough candles to keep opening new ones until the run ends
+            step = timeframe_ms(interval)
+            current = self.milliseconds() // step * step
+            extra = int(self.horizon_s * 1000 // step) + 2
+            self._series[key] = synthetic_ohlcv(FRAME_LIMIT + extra, seed=zlib.crc32(symbol.encode()),
+                                                interval_ms=step, start_ms=current - step * (FRAME_LIMIT - 1))
+        return self._series[key]
+
+    async def fetch_ohlcv(self, symbol, interval, since=None, limit=500):
+        await asyncio.sleep(self.latency)
+        now = self.milliseconds()
+        rows = [row for row in self._rows(symbol, interval)
+                if row[0] <= now and (since is None or row[0] >= since)]
+        # Like Binance: the first `limit` candles from `since`, or the newest ones without it
+        return rows[:limit] if since is not None else rows[-limit:]
+
+    async def load_markets(self):
+        await asyncio.sleep(self.latency)
+        self.markets = {symbol: {"symbol": symbol, "active": True} for symbol in self.symbols}
+        return self.markets
+
+    async def close(self):
+        pass
+
+
+def fake_openrouter(latency):
+    """chat_completion, chat_completion_async and stream_chat_completion answering ANSWER after `latency` seconds"""
+    def chat_completion(model, system_prompt, user_prompt, **kwargs):
+        time.sleep(latency)
+        return {"choices": [{"message": {"role": "assistant", "content": ANSWER}}]}
+
+    async def chat_completion_async(model, system_prompt, user_prompt, **kwargs):
+        await asyncio.sleep(latency)
+        return {"choices": [{"message": {"role": "assistant", "content": ANSWER}}]}
+
+    async def stream_chat_completion(model, system_prompt, user_prompt, **kwargs):
+        size = -(-len(ANSWER) // STREAM_CHUNKS)
+        for i in range(0, len(ANSWER), size):
+            await asyncio.sleep(latency / STREAM_CHUNKS)
+            yield ANSWER[i:i + size]
+
+    return chat_completion, chat_completion_async, stream_chat_completion
+
+
+class FakeMessage:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def edit(self, content=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self
+
+
+class FakeDiscordContext(commands.Context):
+    """Replies go nowhere after `discord_latency` seconds instead of through Discord's HTTP API"""
+    discord_latency = 0.0
+    failed = False
+
+    async def send(self, content=None, **kwargs):
+        if isinstance(content, str) and content.lstrip().startswith("❌"):
+            self.failed = True
+        await asyncio.sleep(self.discord_latency)
+        return FakeMessage(self.discord_latency)
+
+
+class LoadContext(bot_main.TimedContext, FakeDiscordContext):
+    """The bot's TimedContext (reply metrics included) on top of the fake channel"""
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip().lstrip("!")
+        if name not in bot_main.bot.all_commands:
+            raise SystemExit(f"unknown command: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def measure_lag(samples, stop):
+    # How late the loop wakes a task that asked to sleep: time stolen by code blocking it
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL_S)
+        samples.append(time.perf_counter() - start - LAG_INTERVAL_S)
+
+
+async def run_command(content, channel, arrived, results):
+    message = SimpleNamespace(id=0, content=content, channel=channel, guild=None, attachments=[],
+                              author=SimpleNamespace(id=1, bot=False), _state=bot_main.bot._connection)
+    ctx = await bot_main.bot.get_context(message, cls=LoadContext)
+    await bot_main.bot.invoke(ctx)
+    results.append((ctx.command.name, time.perf_counter() - arrived, ctx.failed or ctx.command_failed))
+
+
+async def run(args):
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    symbols = [f"PAIR{i:03d}/USDT" for i in range(args.pairs)]
+    horizon = args.duration + args.drain
+
+    market_data.async_exchange = FakeExchange(symbols, args.exchange_latency / 1000, horizon)
+    market_data.kline_feed = None
+    market_data.candle_store = None
+    llm_cache.chat_completion, llm_cache.chat_completion_async, llm_cache.stream_chat_completion = \
+        fake_openrouter(args.llm_latency)
+    if args.stream is not None:
+        bot_main.STREAM_AI_RESPONSES = args.stream
+    FakeDiscordContext.discord_latency = args.discord_latency / 1000
+
+    results, lag = [], []
+    stop = asyncio.Event()
+    async with bot_main.bot:
+        # get_context skips the bot's own messages, so it needs a logged-in user to compare with
+        bot_main.bot._connection.user = SimpleNamespace(id=0)
+        lag_task = asyncio.create_task(measure_lag(lag, stop))
+        channel = SimpleNamespace(id=1)
+        tasks = []
+        start = time.perf_counter()
+        arrival = start
+        while True:
+            arrival += rng.expovariate(args.rate)
+            if arrival - start >= args.duration:
+                break
+            await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+            command = rng.choices(list(mix), weights=list(mix.values()))[0]
+            content = f"!{command} {rng.choice(symbols)} {args.interval}"
+            tasks.append(asyncio.create_task(run_command(content, channel, arrival, results)))
+
+        offered = time.perf_counter() - start
+        _, pending = await asyncio.wait(tasks, timeout=args.drain) if tasks else (set(), set())
+        for task in pending:
+            task.cancel()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await lag_task
+    return mix, results, lag, len(tasks), len(pending), offered, elapsed
+
+
+def report(args, mix, results, lag, sent, unfinished, offered, elapsed):
+    print(f"{sent} commands over {offered:.1f}s ({sent / offered:.1f}/s offered, target {args.rate:g}/s) "
+          f"on {args.pairs} pairs • exchange {args.exchange_latency:g}ms • LLM {args.llm_latency:g}s "
+          f"• Discord {args.discord_latency:g}ms • streaming {'on' if bot_main.STREAM_AI_RESPONSES else 'off'}")
+    print(f"{'command':<16} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    rows = [(name, [r for r in results if r[0] == name]) for name in mix] + [("all", results)]
+    for name, rows_ in rows:
+        latencies = [latency for _, latency, _ in rows_]
+        errors = sum(1 for _, _, failed in rows_ if failed)
+        print(f"{name:<16} {len(rows_):>6} {errors:>6} {percentile(latencies, 0.5) * 1000:>9.0f} "
+              f"{percentile(latencies, 0.95) * 1000:>9.0f} {percentile(latencies, 0.99) * 1000:>9.0f} "
+              f"{max(latencies, default=0) * 1000:>9.0f}")
+    print(f"throughput {len(results) / elapsed:.2f} commands/s completed in {elapsed:.1f}s"
+          + (f" • {unfinished} still running after the {args.drain:g}s drain" if unfinished else ""))
+    print(f"event-loop lag p50 {percentile(lag, 0.5) * 1000:.1f}ms • p99 {percentile(lag, 0.99) * 1000:.1f}ms "
+          f"• max {max(lag, default=0) * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the bot's command handlers with simulated Discord traffic")
+    parser.add_argument("--rate", type=float, default=5.0, help="commands per second (Poisson arrivals)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of arrivals")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="command=weight,... (default: %(default)s)")
+    parser.add_argument("--pairs", type=int, default=20, help="pairs the commands are spread over")
+    parser.add_argument("--interval", default="15m")
+    parser.add_argument("--exchange-latency", type=float, default=80.0, help="ms per exchange request")
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="seconds per OpenRouter answer")
+    parser.add_argument("--discord-latency", type=float, default=100.0, help="ms per Discord send or edit")
+    parser.add_argument("--stream", action=argparse.BooleanOptionalAction, default=None,
+                        help="stream AI answers (default: STREAM_AI_RESPONSES)")
+    parser.add_argument("--drain", type=float, default=60.0, help="seconds to wait for commands still running")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+    report(args, *asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
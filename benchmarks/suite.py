@@ -0,0 +1,224 @@
+"""
+Benchmark suite with stored baselines.
+
+Feeds deterministic synthetic candles (or a CSV recorded with tools.candles)
+through the analysis entry points, the Supertrend and resampling helpers and
+the prompt builders, with the exchange and OpenRouter replaced by local
+fakes that answer instantly. Every case reports its best time per call (the
+least disturbed by whatever else the machine is doing), throughput and peak
+memory allocated per call. The numbers are compared with
+benchmarks/baseline.json, and cases that got slower or hungrier than the
+threshold are flagged (exit status 1).
+
+Caches are cleared before every call, so each one measures the full
+computation a command pays on a new candle rather than a cache hit. A fixed
+reference workload is timed between the calls of every case, and times are
+compared relative to it, so a machine that is busier or slower overall than
+when the baseline was saved doesn't flag every case.
+
+    python -m benchmarks.suite                    # compare with the baseline
+    python -m benchmarks.suite --save             # record the baseline on this machine
+    python -m benchmarks.suite --only supertrend --threshold 0.3
+    python -m benchmarks.suite --candles btc_15m.csv
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import warnings
+
+os.environ.setdefault("DISCORD_TOKEN", "benchmark")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_ohlcv
+from services import analytic, llm_cache, market_data, supertrend
+from services.exchange_scheduler import WeightScheduler
+from services.indicator_frame import FRAME_LIMIT, IndicatorFrame, indicator_frames
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+SYMBOL, INTERVAL = "BTC/USDT", "15m"
+LONG_SERIES = 100_000
+# Differences below this are timer noise, whatever the percentage
+MIN_DELTA_MS = 0.05
+MIN_CALLS, MAX_CALLS, TARGET_S = 5, 200, 1.0
+WARMUP_S = 2.0
+
+_REFERENCE_DATA = np.random.default_rng(0).normal(size=50_000)
+
+
+class FakeExchange:
+    """Serves the suite's candles from memory, like ccxt's fetch_ohlcv"""
+    id = "binance"
+    timeframes = {INTERVAL: INTERVAL}
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetch_ohlcv(self, symbol, interval, since=None, limit=500):
+        rows = self.rows if since is None else [row for row in self.rows if row[0] >= since]
+        return rows[-limit:]
+
+
+def fake_chat_completion(model, system_prompt, user_prompt, **kwargs):
+    return {"choices": [{"message": {"role": "assistant", "content": "🔹 Signal Type: No Signal"}}]}
+
+
+def reset_caches():
+    market_data.candle_cache.clear()
+    indicator_frames._frames.clear()
+    analytic.indicator_states._states.clear()
+    llm_cache.llm_cache._entries.clear()
+
+
+def build_cases(rows):
+    """name -> fn() for every benchmarked call; inputs are prepared once, outside the timing"""
+    frame = IndicatorFrame(rows[-FRAME_LIMIT:])
+    indicators = analytic.build_technical_indicators(frame)
+    df, analysis = supertrend.compute_advanced_technical_analysis(IndicatorFrame(rows[-FRAME_LIMIT:]))
+    long_frame = IndicatorFrame(synthetic_ohlcv(LONG_SERIES, seed=7)).candles
+    return {
+        "get_technical_analysis": lambda: analytic.get_technical_analysis(SYMBOL, INTERVAL),
+        "get_technical_analysis(signal)": lambda: analytic.get_technical_analysis(SYMBOL, INTERVAL, is_signal=True),
+        "get_advanced_technical_analysis": lambda: supertrend.get_advanced_technical_analysis(SYMBOL, INTERVAL),
+        "calculate_supertrend(1k)": lambda: supertrend.calculate_supertrend(frame.candles),
+        f"calculate_supertrend({LONG_SERIES // 1000}k)": lambda: supertrend.calculate_supertrend(long_frame),
+        "resample_to_higher_timeframe": lambda: supertrend.resample_to_higher_timeframe(frame.candles, '4h'),
+        "build_signal_prompt": lambda: analytic.build_signal_prompt(SYMBOL, indicators),
+        "build_signal_max_prompt": lambda: analytic.build_signal_max_prompt(SYMBOL, indicators),
+        "build_signal_smc_prompt": lambda: analytic.build_signal_smc_prompt(SYMBOL, indicators),
+        "build_advanced_ai_prompt": lambda: supertrend.build_advanced_ai_prompt(SYMBOL, df, analysis),
+        "get_trading_signal_max (fake LLM)": lambda: analytic.get_trading_signal_max(SYMBOL, INTERVAL),
+        "get_advanced_trading_signal_ai (fake LLM)": lambda: supertrend.get_advanced_trading_signal_ai(SYMBOL, INTERVAL),
+    }
+
+
+def reference():
+    """A fixed mix of interpreter and NumPy work, the yardstick for how fast the machine is right now"""
+    total = 0.0
+    for value in _REFERENCE_DATA[:5_000].tolist():
+        total += value * value
+    np.sort(_REFERENCE_DATA)
+    return total
+
+
+def warm_up():
+    # An idle core (or vCPU) runs the first calls slower, so keep it busy for a moment first
+    spin_until = time.perf_counter() + WARMUP_S
+    while time.perf_counter() < spin_until:
+        reference()
+
+
+def measure(fn):
+    """
+    Best ms per call over enough calls to fill TARGET_S, the best ms of the
+    reference workload run between those calls, and the peak KB one call allocates
+    """
+    reset_caches()
+    fn()
+    times, reference_times = [], []
+    while len(times) < MIN_CALLS or (sum(times) < TARGET_S and len(times) < MAX_CALLS):
+        start = time.perf_counter()
+        reference()
+        reference_times.append(time.perf_counter() - start)
+        reset_caches()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+
+    reset_caches()
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "ms": round(min(times) * 1000, 4),
+        "reference_ms": round(min(reference_times) * 1000, 4),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def compare(result, baseline, threshold):
+    """The time change relative to the reference workload, and regression notes beyond `threshold`"""
+    ms = result['ms'] * baseline['reference_ms'] / result['reference_ms']
+    notes = []
+    if ms > baseline['ms'] * (1 + threshold) and ms - baseline['ms'] > MIN_DELTA_MS:
+        notes.append(f"time +{ms / baseline['ms'] - 1:.0%}")
+    if result['peak_kb'] > baseline['peak_kb'] * (1 + threshold) and result['peak_kb'] - baseline['peak_kb'] > 1:
+        notes.append(f"memory +{result['peak_kb'] / baseline['peak_kb'] - 1:.0%}")
+    return ms / baseline['ms'] - 1, notes
+
+
+def load_rows(path):
+    if path is None:
+        # Candles end now, so the candle cache and the LLM cache key treat them as current
+        step = 900_000
+        start_ms = (int(time.time() * 1000) // step) * step - step * (FRAME_LIMIT - 1)
+        return synthetic_ohlcv(FRAME_LIMIT, seed=42, interval_ms=step, start_ms=start_ms)
+    from tools.candles import load_candles
+    candles = load_candles(path)
+    return [[int(row[0]), *map(float, row[1:])] for row in candles[-FRAME_LIMIT:]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite with regression check")
+    parser.add_argument("--candles", help="CSV written by tools.candles (default: synthetic candles)")
+    parser.add_argument("--only", help="run only the cases whose name contains this text")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args()
+    warnings.filterwarnings("ignore")
+
+    rows = load_rows(args.candles)
+    market_data.exchange = FakeExchange(rows)
+    market_data.kline_feed = None
+    market_data.candle_store = None
+    # The fake exchange has no request weight to protect
+    market_data.exchange_scheduler = WeightScheduler(10 ** 9)
+    llm_cache.chat_completion = fake_chat_completion
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['cases']
+
+    cases = {name: fn for name, fn in build_cases(rows).items() if not args.only or args.only in name}
+    warm_up()
+    results, regressions = {}, []
+    print(f"{'case':<42} {'ms/call':>9} {'calls/s':>9} {'peak KB':>9} {'baseline':>9}  status")
+    for name, fn in cases.items():
+        result = results[name] = measure(fn)
+        status, base_ms = "new", ""
+        if name in baseline:
+            base_ms = f"{baseline[name]['ms']:.3f}"
+            change, notes = compare(result, baseline[name], args.threshold)
+            status = "REGRESSION " + ", ".join(notes) if notes else f"ok ({change:+.0%})"
+            if notes:
+                regressions.append(name)
+        print(f"{name:<42} {result['ms']:>9.3f} {1000 / result['ms']:>9.1f} {result['peak_kb']:>9.1f} {base_ms:>9}  {status}")
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "machine": f"{platform.machine()} {platform.processor() or platform.system()}",
+                "python": platform.python_version(),
+                "candles": args.candles or "synthetic",
+                # Cases left out with --only keep their previous baseline
+                "cases": {**baseline, **results},
+            }, f, indent=2)
+            f.write("\n")
+        print(f"baseline saved to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} case(s) regressed beyond {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+"""Deterministic synthetic candles for the offline benchmarks"""
+import numpy as np
+import pandas as pd
+
+def synthetic_ohlcv(n, seed=42, interval_ms=900_000, start_ms=1_577_836_800_000):
+    """Random-walk OHLCV rows in ccxt's [timestamp, open, high, low, close, volume] layout"""
+    rng = np.random.default_rng(seed)
+    close = 30000 * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.003, n)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.uniform(10, 1000, n)
+    timestamps = start_ms + interval_ms * np.arange(n, dtype=np.int64)
+    return [
+        [int(t), float(o), float(h), float(l), float(c), float(v)]
+        for t, o, h, l, c, v in zip(timestamps, open_, high, low, close, volume)
+    ]
+
+def synthetic_frame(n, seed=42, interval_ms=900_000):
+    """The same candles as a DataFrame indexed by timestamp, like the services build"""
+    df = pd.DataFrame(synthetic_ohlcv(n, seed, interval_ms), columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    return df.set_index('timestamp')
@@ -1,3 +1,36 @@
-from decouple import config
+from decouple import Csv, config
 TOKEN=config("DISCORD_TOKEN")
-OPENROUTER_API_KEY=config("OPENROUTER_API_KEY")
\ No newline at end of file
+OPENROUTER_API_KEY=config("OPENROUTER_API_KEY")
+CANDLE_CACHE_MAX_MB=config("CANDLE_CACHE_MAX_MB", default=64, cast=int)
+CANDLE_CACHE_FLOAT32=config("CANDLE_CACHE_FLOAT32", default=False, cast=bool)
+PROMPT_TOKEN_BUDGET=config("PROMPT_TOKEN_BUDGET", default=2000, cast=int)
+LLM_CACHE_SIZE=config("LLM_CACHE_SIZE", default=512, cast=int)
+LLM_CACHE_PATH=config("LLM_CACHE_PATH", default="")
+OPENROUTER_BASE_URL=config("OPENROUTER_BASE_URL", default="https://openrouter.ai/api/v1")
+OPENROUTER_CONNECT_TIMEOUT=config("OPENROUTER_CONNECT_TIMEOUT", default=5.0, cast=float)
+OPENROUTER_READ_TIMEOUT=config("OPENROUTER_READ_TIMEOUT", default=60.0, cast=float)
+OPENROUTER_MAX_RETRIES=config("OPENROUTER_MAX_RETRIES", default=3, cast=int)
+STREAM_AI_RESPONSES=config("STREAM_AI_RESPONSES", default=True, cast=bool)
+DISCORD_EDIT_INTERVAL=config("DISCORD_EDIT_INTERVAL", default=1.0, cast=float)
+SCAN_CONCURRENCY=config("SCAN_CONCURRENCY", default=16, cast=int)
+CANDLE_STORE_DIR=config("CANDLE_STORE_DIR", default="")
+KLINE_FEED=config("KLINE_FEED", default=False, cast=bool)
+KLINE_FEED_URL=config("KLINE_FEED_URL", default="wss://stream.binance.com:9443/stream")
+KLINE_FEED_MAX_STREAMS=config("KLINE_FEED_MAX_STREAMS", default=200, cast=int)
+SUBSCRIPTIONS_PATH=config("SUBSCRIPTIONS_PATH", default="subscriptions.db")
+MAX_SUBSCRIPTIONS_PER_CHANNEL=config("MAX_SUBSCRIPTIONS_PER_CHANNEL", default=20, cast=int)
+ALERT_MAX_PAIRS=config("ALERT_MAX_PAIRS", default=300, cast=int)
+ALERT_CONCURRENCY=config("ALERT_CONCURRENCY", default=8, cast=int)
+ALERT_DELAY=config("ALERT_DELAY", default=2.0, cast=float)
+EXCHANGE_WEIGHT_PER_MINUTE=config("EXCHANGE_WEIGHT_PER_MINUTE", default=4800, cast=int)
+EXCHANGE_INTERACTIVE_DEADLINE=config("EXCHANGE_INTERACTIVE_DEADLINE", default=10.0, cast=float)
+EXCHANGE_BACKGROUND_DEADLINE=config("EXCHANGE_BACKGROUND_DEADLINE", default=120.0, cast=float)
+TRACE_BUFFER_SIZE=config("TRACE_BUFFER_SIZE", default=100, cast=int)
+TRACE_PROFILE_SLOW_MS=config("TRACE_PROFILE_SLOW_MS", default=0, cast=int)
+TRACE_PROFILE_INTERVAL_MS=config("TRACE_PROFILE_INTERVAL_MS", default=10, cast=int)
+MTF_BASE_INTERVAL=config("MTF_BASE_INTERVAL", default="15m")
+MTF_BASE_BARS=config("MTF_BASE_BARS", default=20000, cast=int)
+MTF_MAX_SYMBOLS=config("MTF_MAX_SYMBOLS", default=20, cast=int)
+FAST_STARTUP=config("FAST_STARTUP", default=True, cast=bool)
+PRELOAD_PAIRS=config("PRELOAD_PAIRS", default="BTC/USDT,ETH/USDT,BNB/USDT,SOL/USDT,XRP/USDT", cast=Csv())
+PRELOAD_INTERVALS=config("PRELOAD_INTERVALS", default="15m", cast=Csv())
@@ -1,12 +1,36 @@
+from services.startup import startup, import_services, import_services_in_background, preload, services_imported
 import discord
 from discord.ext import commands
-from config import TOKEN
-from services.analytic import get_technical_analysis, get_trading_signal,get_trading_signal_max, get_trading_signal_smc
-from services.supertrend import get_advanced_trading_signal,get_advanced_trading_signal_ai
-from flask import Flask, jsonify
+from config import TOKEN, STREAM_AI_RESPONSES, DISCORD_EDIT_INTERVAL, FAST_STARTUP
+from services import metrics
+from services.tracing import tracer, format_trace_list, format_waterfall
+from utils.discord_stream import stream_to_discord
+from utils.formatter import split_discord_message
+from utils.lazy import lazy_import
+from flask import Flask, Response, jsonify, request
+import asyncio
 import threading
 import time
 
+# Các service nặng (ccxt, pandas, ta) chỉ được import khi dùng lần đầu, hoặc ở thread nền lúc khởi động
+get_technical_analysis_async, get_trading_signal_async, get_trading_signal_max_async, get_trading_signal_smc_async = lazy_import(
+    'services.analytic', 'get_technical_analysis_async', 'get_trading_signal_async', 'get_trading_signal_max_async',
+    'get_trading_signal_smc_async')
+stream_trading_signal, stream_trading_signal_max, stream_trading_signal_smc = lazy_import(
+    'services.analytic', 'stream_trading_signal', 'stream_trading_signal_max', 'stream_trading_signal_smc')
+get_advanced_trading_signal_async, get_advanced_trading_signal_ai_async, stream_advanced_trading_signal_ai = lazy_import(
+    'services.supertrend', 'get_advanced_trading_signal_async', 'get_advanced_trading_signal_ai_async',
+    'stream_advanced_trading_signal_ai')
+get_market_scan_async = lazy_import('services.scanner', 'get_market_scan_async')
+get_backtest_async = lazy_import('services.backtest', 'get_backtest_async')
+get_mtf_analysis_async, mtf_engine = lazy_import('services.multi_timeframe', 'get_mtf_analysis_async', 'mtf_engine')
+alert_scheduler, subscriptions, format_subscriptions, validate_subscription = lazy_import(
+    'services.alerts', 'alert_scheduler', 'subscriptions', 'format_subscriptions', 'validate_subscription')
+market_data = lazy_import('services.market_data')
+openrouter = lazy_import('services.openrouter')
+indicator_frames = lazy_import('services.indicator_frame', 'indicator_frames')
+llm_cache, async_llm_flights = lazy_import('services.llm_cache', 'llm_cache', 'async_llm_flights')
+
 # Khởi tạo Flask app
 app = Flask(__name__)
 # Biến toàn cục để lưu trạng thái bot
@@ -15,9 +39,48 @@ bot_status = {
     "start_time": time.time(),
     "commands_processed": 0
 }
+class TimedContext(commands.Context):
+    async def send(self, content=None, **kwargs):
+        # Lỗi của các service được trả về dưới dạng tin nhắn "❌ ...", nên đếm lỗi ở đây
+        if self.command is not None and isinstance(content, str) and content.lstrip().startswith("❌"):
+            metrics.errors.inc('command', self.command.qualified_name)
+        # Mọi tin nhắn trả lời đều được tính vào stage discord_send
+        with metrics.timed('discord_send'):
+            return await super().send(content, **kwargs)
+
+class TradingBot(commands.Bot):
+    async def get_context(self, origin, *, cls=TimedContext):
+        return await super().get_context(origin, cls=cls)
+
+    async def close(self):
+        # Đóng các HTTP session dùng chung trước khi tắt bot
+        await market_data.close()
+        await openrouter.close()
+        await super().close()
+
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
+bot = TradingBot(command_prefix="!", intents=intents)
+
+@bot.before_invoke
+async def start_command_metrics(ctx):
+    # Gắn tên lệnh cho mọi stage được đo trong lúc lệnh chạy
+    ctx.metrics_started = time.perf_counter()
+    if not services_imported():
+        # Lệnh đến trước khi import xong: chờ ở thread khác để không chặn event loop
+        await asyncio.to_thread(import_services)
+    ctx.metrics_token = metrics.enter_command(ctx.command.qualified_name)
+    ctx.trace = tracer.start(ctx.command.qualified_name, ctx.message.content[:100])
+
+@bot.after_invoke
+async def finish_command_metrics(ctx):
+    tracer.finish(ctx.trace)
+    metrics.exit_command(ctx.metrics_token)
+    metrics.command_seconds.observe(time.perf_counter() - ctx.metrics_started, ctx.command.qualified_name)
+    if ctx.command_failed:
+        metrics.errors.inc('command', ctx.command.qualified_name)
+    bot_status["commands_processed"] += 1
+
 # Routes cho web server
 @app.route('/')
 def home():
@@ -69,15 +132,65 @@ def home():
 
 @app.route('/api/status')
 def api_status():
-    return jsonify(bot_status)
+    return jsonify({
+        **bot_status,
+        "startup": startup.stats(),
+        "candle_cache": market_data.candle_cache.stats(),
+        "candle_store": market_data.candle_store.stats() if market_data.candle_store else None,
+        "kline_feed": market_data.kline_feed.stats() if market_data.kline_feed else None,
+        "alerts": alert_scheduler.stats(),
+        "exchange": market_data.exchange_scheduler.stats(),
+        "indicator_frames": indicator_frames.stats(),
+        "mtf": mtf_engine.stats(),
+        "llm_cache": llm_cache.stats(),
+        "openrouter": openrouter.client.stats(),
+        "singleflight": {
+            "market_data": market_data.async_fetch_flights.stats(),
+            "llm": async_llm_flights.stats(),
+        },
+    })
+
+@app.route('/metrics')
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/api/traces')
+def api_traces():
+    # ?command=smcsignal chỉ lấy trace của một lệnh, ?limit=N giới hạn số trace
+    limit = request.args.get('limit', default=20, type=int)
+    traces = tracer.recent(limit, request.args.get('command'))
+    return jsonify([trace.to_dict() for trace in traces])
 
 @app.route('/api/health')
 def api_health():
     return jsonify({"status": "healthy", "bot_ready": bot.is_ready()})
 
+async def send_alert(channel_id, message):
+    try:
+        channel = bot.get_channel(channel_id) or await bot.fetch_channel(channel_id)
+        for chunk in split_discord_message(message):
+            with metrics.timed('discord_send'):
+                await channel.send(chunk)
+    except (discord.NotFound, discord.Forbidden):
+        # Kênh đã bị xoá hoặc bot mất quyền: huỷ các subscription của kênh đó
+        subscriptions.remove(channel_id)
+        raise
+
 @bot.event
 async def on_ready():
+    startup.mark('discord_ready')
     print(f"✅ Bot đã đăng nhập thành công với tên {bot.user}")
+    await asyncio.to_thread(import_services)
+    # Chạy bộ lập lịch cảnh báo theo mỗi lần đóng nến
+    alert_scheduler.start(send_alert)
+    # on_ready chạy lại sau mỗi lần kết nối lại, nhưng chỉ cần làm nóng một lần
+    if FAST_STARTUP and not hasattr(bot, "warm_up_task"):
+        bot.warm_up_task = asyncio.create_task(warm_up())
+
+async def warm_up():
+    # Tải sẵn markets và nến của các cặp phổ biến để lệnh đầu tiên sau khi deploy không bị chậm
+    await preload()
+    print(f"⏱️ Khởi động: {startup.summary()}")
 
 @bot.command()
 async def bothelp(ctx):
@@ -133,6 +246,61 @@ async def bothelp(ctx):
         inline=False
     )
     
+    help_embed.add_field(
+        name="!mtf <asset>",
+        value="Trend on 15m, 1h, 4h and 1d, all built from one candle series\n"
+              "• asset: Trading pair (default: BTC/USDT)\n"
+              "**Example:** `!mtf ETH/USDT`",
+        inline=False
+    )
+    
+    help_embed.add_field(
+        name="!scan <interval> <quote>",
+        value="Scan every active pair for Buy/Sell signals of the multi-filter strategy\n"
+              "• interval: Timeframe (default: 15m)\n"
+              "• quote: Quote currency (default: USDT)\n"
+              "**Example:** `!scan 1h USDT`",
+        inline=False
+    )
+    
+    help_embed.add_field(
+        name="!backtest <asset> <interval> <bars>",
+        value="Backtest the !trendsignal strategy over recent history\n"
+              "• asset: Trading pair (default: BTC/USDT)\n"
+              "• interval: Timeframe (default: 15m)\n"
+              "• bars: Candles to test (default: 5000, max: 50000)\n"
+              "**Example:** `!backtest BTC/USDT 1h 10000`",
+        inline=False
+    )
+    
+    help_embed.add_field(
+        name="!subscribe <asset> <interval> <strategy>",
+        value="Post alerts in this channel every time a candle closes\n"
+              "• asset: Trading pair (default: BTC/USDT)\n"
+              "• interval: Timeframe (default: 15m)\n"
+              "• strategy: `trend` (only on !trendsignal Buy/Sell signals) or `analytic` (report every candle)\n"
+              "**Example:** `!subscribe ETH/USDT 1h trend`",
+        inline=False
+    )
+    
+    help_embed.add_field(
+        name="!unsubscribe <asset> <interval> <strategy>",
+        value="Stop alerts in this channel. Leave out the interval or strategy to remove all matches, "
+              "or use `all`. `!subscriptions` lists this channel's alerts\n"
+              "**Example:** `!unsubscribe ETH/USDT 1h`",
+        inline=False
+    )
+    
+    help_embed.add_field(
+        name="!perf <last|list|id>",
+        value="Show where a recent command spent its time (exchange, indicators, prompt, AI, Discord)\n"
+              "• `last`: the latest command (default)\n"
+              "• `list`: the recent traces\n"
+              "• id: one trace from the list\n"
+              "**Example:** `!perf last`",
+        inline=False
+    )
+    
     help_embed.add_field(
         name="!bothelp",
         value="Display this guide\n**Example:** `!bothelp`",
@@ -147,7 +315,12 @@ async def bothelp(ctx):
             "`!analytic BTC/USDT 1h`\n"
             "`!signal ETH/USDT 30m`\n"
             "`!asignal ADA/USDT 1h`\n"
-            "`!smcsignal XRP/USDT 4h`"
+            "`!smcsignal XRP/USDT 4h`\n"
+            "`!mtf ETH/USDT`\n"
+            "`!scan 1h`\n"
+            "`!backtest BTC/USDT 1h 10000`\n"
+            "`!subscribe ETH/USDT 1h trend`\n"
+            "`!perf last`"
         ),
         inline=False
     )
@@ -164,7 +337,7 @@ async def ping(ctx):
 @bot.command()
 async def analytic(ctx, asset: str = "BTC/USDT", interval: str = "15m"):
     try:
-        response = get_technical_analysis(asset,interval)
+        response = await get_technical_analysis_async(asset,interval)
         await ctx.send(response)
     except Exception as e:
         await ctx.send(f"❌ Error: {str(e)}")
@@ -172,7 +345,11 @@ async def analytic(ctx, asset: str = "BTC/USDT", interval: str = "15m"):
 @bot.command()
 async def signal(ctx, asset: str = "BTC/USDT",interval: str = "15m", model: str = "deepseek/deepseek-chat-v3.1:free"):
     try:
-        response = get_trading_signal(asset,interval,model)
+        if STREAM_AI_RESPONSES:
+            # Hiển thị câu trả lời AI dần dần trong lúc stream
+            await stream_to_discord(ctx, stream_trading_signal(asset,interval,model), DISCORD_EDIT_INTERVAL)
+            return
+        response = await get_trading_signal_async(asset,interval,model)
         await ctx.send(response)
     except Exception as e:
         await ctx.send(f"❌ Error: {str(e)}")
@@ -180,7 +357,11 @@ async def signal(ctx, asset: str = "BTC/USDT",interval: str = "15m", model: str
 @bot.command()
 async def asignal(ctx, asset: str = "BTC/USDT",interval: str = "15m",model: str = "deepseek/deepseek-chat-v3.1:free"):
     try:
-        response = get_trading_signal_max(asset,interval,model)
+        if STREAM_AI_RESPONSES:
+            # Hiển thị câu trả lời AI dần dần trong lúc stream
+            await stream_to_discord(ctx, stream_trading_signal_max(asset,interval,model), DISCORD_EDIT_INTERVAL)
+            return
+        response = await get_trading_signal_max_async(asset,interval,model)
         await ctx.send(response)
     except Exception as e:
         await ctx.send(f"❌ Error: {str(e)}")
@@ -188,7 +369,11 @@ async def asignal(ctx, asset: str = "BTC/USDT",interval: str = "15m",model: str
 @bot.command()
 async def smcsignal(ctx, asset: str = "BTC/USDT",interval: str = "15m",model: str = "deepseek/deepseek-chat-v3.1:free"):
     try:
-        response = get_trading_signal_smc(asset,interval,model)
+        if STREAM_AI_RESPONSES:
+            # Hiển thị câu trả lời AI dần dần trong lúc stream
+            await stream_to_discord(ctx, stream_trading_signal_smc(asset,interval,model), DISCORD_EDIT_INTERVAL)
+            return
+        response = await get_trading_signal_smc_async(asset,interval,model)
         await ctx.send(response)
     except Exception as e:
         await ctx.send(f"❌ Error: {str(e)}")
@@ -196,22 +381,94 @@ async def smcsignal(ctx, asset: str = "BTC/USDT",interval: str = "15m",model: st
 @bot.command()
 async def trendsignal(ctx, asset: str = "BTC/USDT",interval: str = "15m",model: str = "deepseek/deepseek-chat-v3.1:free"):
     try:
-        response = get_advanced_trading_signal(asset,interval,model)
+        response = await get_advanced_trading_signal_async(asset,interval,model)
         await ctx.send(response)
     except Exception as e:
         await ctx.send(f"❌ Error: {str(e)}")
 @bot.command()
 async def aitrendsignal(ctx, asset: str = "BTC/USDT",interval: str = "15m",model: str = "deepseek/deepseek-chat-v3.1:free"):
     try:
-        response = get_advanced_trading_signal_ai(asset,interval,model)
+        if STREAM_AI_RESPONSES:
+            # Hiển thị câu trả lời AI dần dần trong lúc stream
+            await stream_to_discord(ctx, stream_advanced_trading_signal_ai(asset,interval,model), DISCORD_EDIT_INTERVAL)
+            return
+        response = await get_advanced_trading_signal_ai_async(asset,interval,model)
+        await ctx.send(response)
+    except Exception as e:
+        await ctx.send(f"❌ Error: {str(e)}")
+@bot.command()
+async def mtf(ctx, asset: str = "BTC/USDT"):
+    try:
+        response = await get_mtf_analysis_async(asset)
+        await ctx.send(response)
+    except Exception as e:
+        await ctx.send(f"❌ Error: {str(e)}")
+@bot.command()
+async def scan(ctx, interval: str = "15m", quote: str = "USDT"):
+    try:
+        await ctx.send(f"⏳ Scanning {quote.upper()} pairs on {interval}...")
+        response = await get_market_scan_async(interval, quote)
+        for chunk in split_discord_message(response):
+            await ctx.send(chunk)
+    except Exception as e:
+        await ctx.send(f"❌ Error: {str(e)}")
+@bot.command()
+async def backtest(ctx, asset: str = "BTC/USDT", interval: str = "15m", bars: int = 5000):
+    try:
+        response = await get_backtest_async(asset, interval, bars)
         await ctx.send(response)
     except Exception as e:
         await ctx.send(f"❌ Error: {str(e)}")
+@bot.command()
+async def subscribe(ctx, asset: str = "BTC/USDT", interval: str = "15m", strategy: str = "trend"):
+    try:
+        symbol, interval, strategy = await validate_subscription(asset, interval, strategy)
+        if subscriptions.add(ctx.channel.id, symbol, interval, strategy):
+            alert_scheduler.notify()
+            await ctx.send(f"🔔 Subscribed: **{symbol}** {interval} • {strategy}. Alerts post here after each candle close.")
+        else:
+            await ctx.send(f"ℹ️ Already subscribed to **{symbol}** {interval} • {strategy}.")
+    except Exception as e:
+        await ctx.send(f"❌ Error: {str(e)}")
+@bot.command()
+async def unsubscribe(ctx, asset: str = "all", interval: str = None, strategy: str = None):
+    try:
+        symbol = None if asset.lower() == "all" else asset.upper()
+        removed = subscriptions.remove(ctx.channel.id, symbol, interval, strategy.lower() if strategy else None)
+        await ctx.send(f"🔕 Removed {removed} subscription(s)." if removed else "ℹ️ No matching subscriptions.")
+    except Exception as e:
+        await ctx.send(f"❌ Error: {str(e)}")
+@bot.command(name="subscriptions")
+async def list_subscriptions(ctx):
+    await ctx.send(format_subscriptions(subscriptions.channel(ctx.channel.id)))
+@bot.command()
+async def perf(ctx, which: str = "last"):
+    try:
+        if which.lower() == "list":
+            await ctx.send(format_trace_list([t for t in tracer.recent() if t.name != "perf"][:15]))
+            return
+        if which.lower() == "last":
+            trace = next((t for t in tracer.recent() if t.name != "perf"), None)
+        else:
+            trace = tracer.get(int(which.lstrip("#")))
+        if trace is None:
+            await ctx.send("📭 No matching trace. `!perf list` shows the recent ones.")
+            return
+        for chunk in split_discord_message(format_waterfall(trace)):
+            await ctx.send(chunk)
+    except Exception as e:
+        await ctx.send(f"❌ Error: {str(e)}")
 def run_flask():
     app.run(host='0.0.0.0', port=5000, debug=False, use_reloader=False)
 if __name__ == "__main__":
+    if FAST_STARTUP:
+        # Import các service ở thread nền trong lúc bot đăng nhập Discord
+        import_services_in_background()
+    else:
+        import_services()
     # Khởi chạy Flask server trong một thread riêng biệt
     flask_thread = threading.Thread(target=run_flask)
     flask_thread.daemon = True
     flask_thread.start()
-bot.run(TOKEN)
+    startup.mark('login_started')
+    bot.run(TOKEN)
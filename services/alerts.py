@@ -0,0 +1,298 @@
+import asyncio
+import bisect
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from config import ALERT_CONCURRENCY, ALERT_DELAY, ALERT_MAX_PAIRS, MAX_SUBSCRIPTIONS_PER_CHANNEL, SUBSCRIPTIONS_PATH
+from services import market_data
+from services.analytic import build_technical_indicators, format_technical_report
+from services.candle_cache import timeframe_ms
+from services.exchange_scheduler import BACKGROUND, exchange_lane
+from services.indicator_frame import FRAME_LIMIT, IndicatorFrame
+from services.metrics import command_scope, timed
+from services.tracing import tracer
+from services.supertrend import compute_advanced_technical_analysis, format_advanced_signal
+
+def _trend_alert(asset, frame):
+    # Only candles that close with a Buy/Sell signal are worth a message
+    df, analysis = compute_advanced_technical_analysis(frame)
+    if analysis['signal'] == 'No Signal':
+        return None
+    return format_advanced_signal(asset, df, analysis)
+
+def _analytic_report(asset, frame):
+    with timed('indicators'):
+        latest = build_technical_indicators(frame, bars=1).iloc[-1]
+    return format_technical_report(asset, latest)
+
+# Strategy name -> fn(asset, frame of closed candles) -> message or None
+STRATEGIES = {
+    'trend': _trend_alert,
+    'analytic': _analytic_report,
+}
+
+class SubscriptionStore:
+    """
+    Alert subscriptions (channel, symbol, interval, strategy), grouped by
+    (symbol, interval) so each group is fetched and computed once per close.
+    With a path they are kept in SQLite and reloaded on restart; the database
+    is opened on first use, so importing the module doesn't create it.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._groups = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self._opened = False
+
+    def open(self):
+        """Open the database and load the saved subscriptions, if not done yet"""
+        with self._lock:
+            self._open()
+
+    def _open(self):
+        if self._opened:
+            return
+        if self.path:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS subscriptions ("
+                "channel_id INTEGER NOT NULL, symbol TEXT NOT NULL, interval TEXT NOT NULL, strategy TEXT NOT NULL, "
+                "PRIMARY KEY (channel_id, symbol, interval, strategy))"
+            )
+            self._db.commit()
+            for channel_id, symbol, interval, strategy in self._db.execute("SELECT * FROM subscriptions"):
+                self._groups.setdefault((symbol, interval), set()).add((channel_id, strategy))
+        self._opened = True
+
+    def add(self, channel_id, symbol, interval, strategy):
+        """Returns False if the subscription already exists; raises ValueError over the limits"""
+        with self._lock:
+            self._open()
+            members = self._groups.get((symbol, interval), set())
+            if (channel_id, strategy) in members:
+                return False
+            if len(self._channel(channel_id)) >= MAX_SUBSCRIPTIONS_PER_CHANNEL:
+                raise ValueError(f"this channel already has {MAX_SUBSCRIPTIONS_PER_CHANNEL} subscriptions")
+            if not members and len(self._groups) >= ALERT_MAX_PAIRS:
+                raise ValueError(f"alerts already cover {ALERT_MAX_PAIRS} pair/interval combinations")
+            self._groups.setdefault((symbol, interval), set()).add((channel_id, strategy))
+            if self._db is not None:
+                self._db.execute("INSERT OR IGNORE INTO subscriptions VALUES (?, ?, ?, ?)",
+                                 (channel_id, symbol, interval, strategy))
+                self._db.commit()
+            return True
+
+    def remove(self, channel_id, symbol=None, interval=None, strategy=None):
+        """Remove the channel's subscriptions matching the given fields, returns how many"""
+        with self._lock:
+            self._open()
+            removed = [s for s in self._channel(channel_id)
+                       if (symbol is None or s[0] == symbol) and (interval is None or s[1] == interval)
+                       and (strategy is None or s[2] == strategy)]
+            for symbol_, interval_, strategy_ in removed:
+                members = self._groups[(symbol_, interval_)]
+                members.discard((channel_id, strategy_))
+                if not members:
+                    del self._groups[(symbol_, interval_)]
+                if self._db is not None:
+                    self._db.execute("DELETE FROM subscriptions WHERE channel_id = ? AND symbol = ? "
+                                     "AND interval = ? AND strategy = ?", (channel_id, symbol_, interval_, strategy_))
+            if self._db is not None:
+                self._db.commit()
+            return len(removed)
+
+    def channel(self, channel_id):
+        """The channel's subscriptions as sorted (symbol, interval, strategy) tuples"""
+        with self._lock:
+            self._open()
+            return sorted(self._channel(channel_id))
+
+    def _channel(self, channel_id):
+        return [(symbol, interval, strategy) for (symbol, interval), members in self._groups.items()
+                for channel, strategy in members if channel == channel_id]
+
+    def groups(self, intervals=None):
+        """{(symbol, interval): [(channel_id, strategy), ...]}, optionally only for some intervals"""
+        with self._lock:
+            self._open()
+            return {key: sorted(members) for key, members in self._groups.items()
+                    if intervals is None or key[1] in intervals}
+
+    def intervals(self):
+        with self._lock:
+            self._open()
+            return {interval for _, interval in self._groups}
+
+    def stats(self):
+        with self._lock:
+            self._open()
+            return {"groups": len(self._groups), "subscriptions": sum(len(m) for m in self._groups.values())}
+
+def evaluate_group(asset, ohlcv, strategies):
+    """One indicator frame over the closed candles, shared by every strategy of the group"""
+    frame = IndicatorFrame(ohlcv)
+    return {strategy: STRATEGIES[strategy](asset, frame) for strategy in strategies}
+
+class AlertScheduler:
+    """
+    Runs subscriptions once per candle close.
+
+    Shortly after a boundary where some subscribed intervals close, every
+    (symbol, interval) group of those intervals is fetched once (at most
+    `concurrency` fetches in flight, through the candle cache and kline feed),
+    evaluated once per strategy on its closed candles, and the messages go to
+    every subscribed channel. Closes missed while a run was still busy are
+    skipped rather than queued.
+    """
+
+    def __init__(self, store, concurrency=ALERT_CONCURRENCY, delay=ALERT_DELAY):
+        self.store = store
+        self.concurrency = concurrency
+        self.delay = delay
+        self._send = None
+        self._task = None
+        self._changed = asyncio.Event()
+        self._last_boundary = 0
+        self.runs = 0
+        self.groups_run = 0
+        self.fetch_errors = 0
+        self.stale = 0
+        self.messages_sent = 0
+        self.delivery_errors = 0
+        self.last_run = None
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self, send):
+        """Start the loop on the running event loop; send(channel_id, message) delivers one alert"""
+        self._send = send
+        # Load the saved subscriptions now rather than at the first close
+        self.store.open()
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    def notify(self):
+        """Subscriptions changed: a new interval may close before the one being waited on"""
+        self._changed.set()
+
+    @staticmethod
+    def next_close(intervals, now_ms):
+        """The next candle boundary of any of `intervals`, and the intervals closing there"""
+        closes = {}
+        for interval in intervals:
+            step = timeframe_ms(interval)
+            closes.setdefault((now_ms // step + 1) * step, set()).add(interval)
+        boundary = min(closes)
+        return boundary, closes[boundary]
+
+    async def run(self):
+        while True:
+            intervals = self.store.intervals()
+            now_ms = int(time.time() * 1000)
+            if intervals:
+                # A close whose delay hasn't passed yet is still ahead, one already run isn't
+                after = max(now_ms - int(self.delay * 1000), self._last_boundary)
+                boundary, closing = self.next_close(intervals, after)
+                wait = (boundary - now_ms) / 1000 + self.delay
+            else:
+                boundary, closing, wait = None, set(), 60
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=wait)
+                continue
+            except asyncio.TimeoutError:
+                pass
+            if closing:
+                self._last_boundary = boundary
+                try:
+                    await self.run_close(boundary, closing)
+                except Exception as e:
+                    print(f"⚠️ Alert run failed: {e!r}")
+
+    async def run_close(self, boundary, intervals):
+        """Evaluate every group of `intervals` on the candles closed by `boundary`"""
+        started = time.perf_counter()
+        groups = self.store.groups(intervals)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        detail = f"alerts • {', '.join(sorted(intervals))} close • {len(groups)} pairs"
+        with exchange_lane(BACKGROUND), command_scope('alerts'), tracer.trace('alerts', detail):
+            await asyncio.gather(*(self._run_group(symbol, interval, boundary, members, semaphore)
+                                   for (symbol, interval), members in groups.items()))
+        self.runs += 1
+        self.last_run = {
+            "boundary": datetime.fromtimestamp(boundary / 1000, tz=timezone.utc).isoformat(),
+            "intervals": sorted(intervals),
+            "groups": len(groups),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    async def _run_group(self, symbol, interval, boundary, members, semaphore):
+        try:
+            async with semaphore:
+                ohlcv = await market_data.fetch_ohlcv_async(symbol, interval, limit=FRAME_LIMIT)
+            closed = ohlcv[:bisect.bisect_left(ohlcv, boundary, key=lambda row: row[0])]
+            if len(closed) < 3 or closed[-1][0] != boundary - timeframe_ms(interval):
+                # The exchange hasn't published the closed candle yet
+                self.stale += 1
+                return
+            strategies = sorted({strategy for _, strategy in members})
+            messages = await asyncio.to_thread(evaluate_group, symbol, closed, strategies)
+        except Exception as e:
+            print(f"⚠️ Alert run failed for {symbol} {interval}: {e!r}")
+            self.fetch_errors += 1
+            return
+        self.groups_run += 1
+        deliveries = [(channel_id, f"🔔 **{strategy.capitalize()} alert • {symbol} • {interval} close**\n{messages[strategy]}")
+                      for channel_id, strategy in members if messages[strategy]]
+        await asyncio.gather(*(self._deliver(channel_id, message) for channel_id, message in deliveries))
+
+    async def _deliver(self, channel_id, message):
+        try:
+            await self._send(channel_id, message)
+            self.messages_sent += 1
+        except Exception as e:
+            print(f"⚠️ Alert delivery to channel {channel_id} failed: {e!r}")
+            self.delivery_errors += 1
+
+    def stats(self):
+        return {
+            **self.store.stats(),
+            "running": self.running,
+            "runs": self.runs,
+            "groups_run": self.groups_run,
+            "stale": self.stale,
+            "fetch_errors": self.fetch_errors,
+            "messages_sent": self.messages_sent,
+            "delivery_errors": self.delivery_errors,
+            "last_run": self.last_run,
+        }
+
+def format_subscriptions(subscriptions):
+    """Render the !subscriptions list"""
+    if not subscriptions:
+        return "📭 No alert subscriptions in this channel. Add one with `!subscribe BTC/USDT 15m trend`."
+    lines = [f"🔔 **Alert subscriptions ({len(subscriptions)}/{MAX_SUBSCRIPTIONS_PER_CHANNEL})**"]
+    lines += [f"• **{symbol}** {interval} • {strategy}" for symbol, interval, strategy in subscriptions]
+    return "\n".join(lines)
+
+async def validate_subscription(asset, interval, strategy):
+    """Normalise and check a !subscribe request, returns (symbol, interval, strategy)"""
+    strategy = strategy.lower()
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy} (use {', '.join(STRATEGIES)})")
+    markets = await market_data.load_markets_async()
+    symbol = asset.upper()
+    if symbol not in markets:
+        raise ValueError(f"Unknown pair: {symbol}")
+    # Closes are scheduled on UTC-aligned boundaries, which weekly/monthly candles don't follow
+    if interval not in market_data.async_exchange.timeframes or timeframe_ms(interval) > timeframe_ms('1d'):
+        raise ValueError(f"Unsupported interval: {interval} (alerts run on 1m to 1d candles)")
+    return symbol, interval, strategy
+
+subscriptions = SubscriptionStore(SUBSCRIPTIONS_PATH)
+alert_scheduler = AlertScheduler(subscriptions)
@@ -1,46 +1,41 @@
-import ccxt
-import pandas as pd
+import asyncio
 from datetime import datetime
-from ta.momentum import RSIIndicator
-from ta.trend import MACD, EMAIndicator
-from ta.volatility import BollingerBands
-from utils.formatter import format_discord_signal
-from config import OPENROUTER_API_KEY
-import requests
-import json
-# Binance exchange public data
-exchange = ccxt.binance()
+from config import PROMPT_TOKEN_BUDGET
+from utils.formatter import format_discord_signal, format_partial_signal
+from utils.prompt_encoder import encode_market_data
+from services.market_data import fetch_ohlcv, fetch_ohlcv_async
+from services.llm_cache import cached_chat_completion, cached_chat_completion_async, stream_cached_chat_completion
+from services.streaming_indicators import IndicatorStateStore
+from services.indicator_frame import FRAME_LIMIT, indicator_frames
+from services.metrics import timed
 
-def get_technical_analysis(asset="BTC/USDT", interval="15m", is_signal=False):
-    symbol = f"{asset.upper()}"
-    ohlcv = exchange.fetch_ohlcv(symbol, interval, limit=500)
+# Live RSI/MACD/BB/EMA state per (symbol, interval) for the !analytic report
+indicator_states = IndicatorStateStore()
 
-    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-    df.set_index('timestamp', inplace=True)
+SYSTEM_PROMPT = "You are a professional crypto trading analyst. Provide clear, actionable trading signals with specific levels and risk assessment. Use Discord formatting with emojis and bullet points. Be concise but informative."
+
+def build_technical_indicators(frame, bars=500):
+    """The !analytic/!signal indicator table: the last `bars` candles of an IndicatorFrame"""
+    df = frame.candles.copy()
 
     # RSI
-    rsi_indicator = RSIIndicator(close=df['close'], window=24)
-    df['RSI'] = rsi_indicator.rsi()
+    df['RSI'] = frame.rsi(24)
 
     # MACD
-    macd_indicator = MACD(close=df['close'])
-    df['MACD'] = macd_indicator.macd()
-    df['MACD_signal'] = macd_indicator.macd_signal()
-    df['MACD_histogram'] = macd_indicator.macd_diff()
+    df['MACD'], df['MACD_signal'], df['MACD_histogram'] = frame.macd()
 
     # Bollinger Bands
-    bb_indicator = BollingerBands(close=df['close'], window=20, window_dev=2)
-    df['BB_upper'] = bb_indicator.bollinger_hband()
-    df['BB_middle'] = bb_indicator.bollinger_mavg()
-    df['BB_lower'] = bb_indicator.bollinger_lband()
+    df['BB_upper'], df['BB_middle'], df['BB_lower'] = frame.bollinger(20, 2)
 
     # Moving Averages
-    df['MA20'] = EMAIndicator(close=df['close'], window=20).ema_indicator()
-    df['MA50'] = EMAIndicator(close=df['close'], window=50).ema_indicator()
-    df['MA200'] = EMAIndicator(close=df['close'], window=200).ema_indicator()
+    df['MA20'] = frame.ema(20)
+    df['MA50'] = frame.ema(50)
+    df['MA200'] = frame.ema(200)
+
+    return df.iloc[-bars:]
 
-    latest = df.iloc[-1]
+def format_technical_report(asset, latest):
+    """Render the !analytic report from the newest row of indicator values"""
 
     # RSI analysis
     if latest['RSI'] > 70:
@@ -94,20 +89,36 @@ def get_technical_analysis(asset="BTC/USDT", interval="15m", is_signal=False):
 
 *Data from Binance • Generated at {datetime.now().strftime("%H:%M:%S")}*
 """
-    if is_signal:
-        return df
-    else:
-        return response
+    return response
 
-def get_trading_signal(asset="BTC/USDT",interval: str = "15m", model="deepseek/deepseek-chat-v3.1:free"):
-    try:
-        # Get technical data
-        indicators = get_technical_analysis(asset,interval, is_signal=True)
-        latest = indicators.iloc[-1]
-        previous = indicators.iloc[-2]
-        
-        # Prepare technical context
-        technical_context = f"""
+def get_technical_analysis(asset="BTC/USDT", interval="15m", is_signal=False):
+    symbol = f"{asset.upper()}"
+    ohlcv = fetch_ohlcv(symbol, interval, limit=FRAME_LIMIT)
+
+    with timed('indicators'):
+        if is_signal:
+            return build_technical_indicators(indicator_frames.get(symbol, interval, ohlcv))
+        # The report only needs the newest values, which the streaming state keeps up to date
+        latest = indicator_states.latest(symbol, interval, ohlcv)
+    return format_technical_report(asset, latest)
+
+async def get_technical_analysis_async(asset="BTC/USDT", interval="15m", is_signal=False):
+    """Same as get_technical_analysis, with the fetch awaited and pandas work off the event loop"""
+    symbol = f"{asset.upper()}"
+    ohlcv = await fetch_ohlcv_async(symbol, interval, limit=FRAME_LIMIT)
+
+    with timed('indicators'):
+        if is_signal:
+            return await asyncio.to_thread(lambda: build_technical_indicators(indicator_frames.get(symbol, interval, ohlcv)))
+        latest = await asyncio.to_thread(indicator_states.latest, symbol, interval, ohlcv)
+    return format_technical_report(asset, latest)
+
+def build_signal_prompt(asset, indicators):
+    """Prompt for !signal: latest indicator values only"""
+    latest = indicators.iloc[-1]
+    previous = indicators.iloc[-2]
+
+    return f"""
 CRYPTO TRADING SIGNAL ANALYSIS FOR {asset.upper()}
 
 CURRENT PRICE: ${latest['close']:.2f}
@@ -136,58 +147,14 @@ TECHNICAL INDICATORS:
 Format clearly for Discord with sections and emojis.
 Keep the output concise, no redundant explanations.
 """
-        
-        # Call AI API
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            data=json.dumps({
-                "model": model,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are a professional crypto trading analyst. Provide clear, actionable trading signals with specific levels and risk assessment. Use Discord formatting with emojis and bullet points. Be concise but informative."
-                    },
-                    {
-                        "role": "user",
-                        "content": technical_context
-                    }
-                ],
-                "temperature": 0.7,
-                "max_tokens": 600
-            })
-        )
-        response_data = response.json()
-        
-        # Check if choices exists in response
-        if 'choices' not in response_data:
-            return f"❌ Unexpected API response format: {response_data}"
-        
-        if not response_data['choices']:
-            return "❌ No response generated from AI"
-        
-        ai_response = response_data['choices'][0]['message']['content']
-        
-        # Format for Discord
-        return format_discord_signal(asset, ai_response, indicators)
-        
-    except Exception as e:
-        return f"❌ Error generating signal: {str(e)}"
 
-def get_trading_signal_max(asset="BTC/USDT",interval: str = "15m",model="deepseek/deepseek-chat-v3.1:free"):
-    try:
-        # Get technical data
-        indicators = get_technical_analysis(asset,interval, is_signal=True)
-        
-        # Prepare technical context
-        technical_context = f"""
+def build_signal_max_prompt(asset, indicators):
+    """Prompt for !asignal: the indicator frame, compacted to the prompt token budget"""
+    return f"""
 CRYPTO TRADING SIGNAL ANALYSIS FOR {asset.upper()}
 
 HERE IS DATA AND TECHNICAL INDICATORS:
-{indicators}
+{encode_market_data(indicators, token_budget=PROMPT_TOKEN_BUDGET)}
 
 *TRADING SIGNAL
 - Provide a signal **only if multiple indicators align clearly** (e.g., RSI confirmation + MACD crossover + MA trend, volumn momentum).
@@ -206,54 +173,10 @@ HERE IS DATA AND TECHNICAL INDICATORS:
 Format clearly for Discord with sections and emojis.
 Keep the output concise, no redundant explanations.
 """
-        
-        # Call AI API
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            data=json.dumps({
-                "model": model,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are a professional crypto trading analyst. Provide clear, actionable trading signals with specific levels and risk assessment. Use Discord formatting with emojis and bullet points. Be concise but informative."
-                    },
-                    {
-                        "role": "user",
-                        "content": technical_context
-                    }
-                ],
-                "temperature": 0.7,
-                "max_tokens": 600
-            })
-        )
-        response_data = response.json()
-        
-        # Check if choices exists in response
-        if 'choices' not in response_data:
-            return f"❌ Unexpected API response format: {response_data}"
-        
-        if not response_data['choices']:
-            return "❌ No response generated from AI"
-        
-        ai_response = response_data['choices'][0]['message']['content']
-        
-        # Format for Discord
-        return format_discord_signal(asset, ai_response, indicators)
-        
-    except Exception as e:
-        return f"❌ Error generating signal: {str(e)}"
-    
-def get_trading_signal_smc(asset="BTC/USDT",interval: str = "15m",model="deepseek/deepseek-chat-v3.1:free"):
-    try:
-        # Get technical data
-        indicators = get_technical_analysis(asset,interval, is_signal=True)
-        
-        # Prepare technical context
-        technical_context = f"""
+
+def build_signal_smc_prompt(asset, indicators):
+    """Prompt for !smcsignal: Smart Money Concept rules plus the compacted indicator frame"""
+    return f"""
 * Analyze the current market data for {asset} using Smart Money Concept (SMC) to identify the highest-probability buy or sell opportunity that maximizes potential wins. Leverage SMC principles such as liquidity zones, order blocks (prioritized), breaker blocks, and fair value gaps to pinpoint institutional activity. Avoid trading during periods of extreme volatility.
 
 * Incorporate the following additional rules to increase win probability:
@@ -292,46 +215,96 @@ def get_trading_signal_smc(asset="BTC/USDT",interval: str = "15m",model="deepsee
 - Ensure the response is concise, data-driven, and adheres strictly to the format.
 - Track the previous signal internally to compare with the current analysis, responding only when a change occurs or it’s the first signal.
 HERE IS DATA {asset}:
-{indicators}
+{encode_market_data(indicators, token_budget=PROMPT_TOKEN_BUDGET)}
 
 """
-        
-        # Call AI API
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            data=json.dumps({
-                "model": model,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are a professional crypto trading analyst. Provide clear, actionable trading signals with specific levels and risk assessment. Use Discord formatting with emojis and bullet points. Be concise but informative."
-                    },
-                    {
-                        "role": "user",
-                        "content": technical_context
-                    }
-                ],
-                "temperature": 0.7,
-                "max_tokens": 600
-            })
-        )
-        response_data = response.json()
-        
-        # Check if choices exists in response
-        if 'choices' not in response_data:
-            return f"❌ Unexpected API response format: {response_data}"
-        
-        if not response_data['choices']:
-            return "❌ No response generated from AI"
-        
-        ai_response = response_data['choices'][0]['message']['content']
-        
-        # Format for Discord
-        return format_discord_signal(asset, ai_response, indicators)
-        
+
+def _format_ai_signal(asset, response_data, indicators):
+    # Check if choices exists in response
+    if 'choices' not in response_data:
+        return f"❌ Unexpected API response format: {response_data}"
+
+    if not response_data['choices']:
+        return "❌ No response generated from AI"
+
+    ai_response = response_data['choices'][0]['message']['content']
+
+    # Format for Discord
+    return format_discord_signal(asset, ai_response, indicators)
+
+def _run_signal(command, asset, interval, model, build_prompt):
+    try:
+        # Get technical data
+        indicators = get_technical_analysis(asset, interval, is_signal=True)
+
+        # Prepare technical context and call AI API (repeat prompts on the same candle come from cache)
+        with timed('prompt_build'):
+            technical_context = build_prompt(asset, indicators)
+        response_data = cached_chat_completion(command, asset.upper(), interval, indicators, model,
+                                               SYSTEM_PROMPT, technical_context, max_tokens=600)
+
+        return _format_ai_signal(asset, response_data, indicators)
+
+    except Exception as e:
+        return f"❌ Error generating signal: {str(e)}"
+
+async def _run_signal_async(command, asset, interval, model, build_prompt):
+    try:
+        indicators = await get_technical_analysis_async(asset, interval, is_signal=True)
+
+        with timed('prompt_build'):
+            technical_context = await asyncio.to_thread(build_prompt, asset, indicators)
+        response_data = await cached_chat_completion_async(command, asset.upper(), interval, indicators, model,
+                                                           SYSTEM_PROMPT, technical_context, max_tokens=600)
+
+        return _format_ai_signal(asset, response_data, indicators)
+
     except Exception as e:
         return f"❌ Error generating signal: {str(e)}"
+
+async def _stream_signal_async(command, asset, interval, model, build_prompt):
+    # Yields the message to show: partial AI text while streaming, then the full formatted signal
+    try:
+        indicators = await get_technical_analysis_async(asset, interval, is_signal=True)
+
+        with timed('prompt_build'):
+            technical_context = await asyncio.to_thread(build_prompt, asset, indicators)
+        ai_response = ""
+        async for ai_response in stream_cached_chat_completion(command, asset.upper(), interval, indicators, model,
+                                                               SYSTEM_PROMPT, technical_context, max_tokens=600):
+            yield format_partial_signal(asset, ai_response)
+
+        if not ai_response:
+            yield "❌ No response generated from AI"
+            return
+        yield format_discord_signal(asset, ai_response, indicators)
+
+    except Exception as e:
+        yield f"❌ Error generating signal: {str(e)}"
+
+def get_trading_signal(asset="BTC/USDT",interval: str = "15m", model="deepseek/deepseek-chat-v3.1:free"):
+    return _run_signal("signal", asset, interval, model, build_signal_prompt)
+
+def get_trading_signal_max(asset="BTC/USDT",interval: str = "15m",model="deepseek/deepseek-chat-v3.1:free"):
+    return _run_signal("asignal", asset, interval, model, build_signal_max_prompt)
+
+def get_trading_signal_smc(asset="BTC/USDT",interval: str = "15m",model="deepseek/deepseek-chat-v3.1:free"):
+    return _run_signal("smcsignal", asset, interval, model, build_signal_smc_prompt)
+
+async def get_trading_signal_async(asset="BTC/USDT", interval: str = "15m", model="deepseek/deepseek-chat-v3.1:free"):
+    return await _run_signal_async("signal", asset, interval, model, build_signal_prompt)
+
+async def get_trading_signal_max_async(asset="BTC/USDT", interval: str = "15m", model="deepseek/deepseek-chat-v3.1:free"):
+    return await _run_signal_async("asignal", asset, interval, model, build_signal_max_prompt)
+
+async def get_trading_signal_smc_async(asset="BTC/USDT", interval: str = "15m", model="deepseek/deepseek-chat-v3.1:free"):
+    return await _run_signal_async("smcsignal", asset, interval, model, build_signal_smc_prompt)
+
+def stream_trading_signal(asset="BTC/USDT", interval: str = "15m", model="deepseek/deepseek-chat-v3.1:free"):
+    return _stream_signal_async("signal", asset, interval, model, build_signal_prompt)
+
+def stream_trading_signal_max(asset="BTC/USDT", interval: str = "15m", model="deepseek/deepseek-chat-v3.1:free"):
+    return _stream_signal_async("asignal", asset, interval, model, build_signal_max_prompt)
+
+def stream_trading_signal_smc(asset="BTC/USDT", interval: str = "15m", model="deepseek/deepseek-chat-v3.1:free"):
+    return _stream_signal_async("smcsignal", asset, interval, model, build_signal_smc_prompt)
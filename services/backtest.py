@@ -0,0 +1,244 @@
+import asyncio
+import numpy as np
+import pandas as pd
+from services.indicator_frame import IndicatorFrame
+from services.market_data import fetch_ohlcv_history_async
+from services.supertrend import strategy_columns
+
+# Upper bound for !backtest history (about 1.4 years of 15m candles)
+MAX_BACKTEST_BARS = 50000
+
+def strategy_frame(frame, **kwargs):
+    """
+    Candles of an IndicatorFrame plus the multi-filter strategy columns, over the whole history.
+
+    Every row only depends on the candles up to it, so it holds what the live
+    analysis would have seen at that bar.
+    """
+    return pd.concat([frame.candles, pd.DataFrame(strategy_columns(frame, **kwargs))], axis=1)
+
+def _previous(values):
+    prev = np.empty_like(values)
+    prev[0] = np.nan
+    prev[1:] = values[:-1]
+    return prev
+
+def _confidence(factors):
+    return np.where(factors >= 3, 'High', np.where(factors >= 2, 'Medium', 'Low'))
+
+def strategy_signals(df, rsi_long_threshold=55, rsi_short_threshold=45):
+    """
+    The entry rules of analyze_trading_conditions evaluated on every bar at once.
+
+    Returns boolean 'buy'/'sell' arrays and the 'confidence' label of each bar.
+    """
+    close = df['close'].to_numpy()
+    fast = df['fast_ema'].to_numpy()
+    slow = df['slow_ema'].to_numpy()
+    supertrend = df['supertrend'].to_numpy()
+    rsi = df['rsi'].to_numpy()
+    hist = df['macd_histogram'].to_numpy()
+    prev_close, prev_fast, prev_slow = _previous(close), _previous(fast), _previous(slow)
+    prev_supertrend, prev_hist = _previous(supertrend), _previous(hist)
+
+    # NaN compares False, like the scalar checks on warm-up rows
+    with np.errstate(invalid='ignore'):
+        bullish_trend = (close > fast) & (close > slow) & (fast > slow)
+        bearish_trend = (close < fast) & (close < slow) & (fast < slow)
+        volatility_filter = df['atr'].to_numpy() > df['atr_sma'].to_numpy()
+        htf_ema = df['htf_ema'].to_numpy()
+
+        ema_cross_bullish = (fast > slow) & (prev_fast <= prev_slow)
+        ema_cross_bearish = (fast < slow) & (prev_fast >= prev_slow)
+        macd_cross_bullish = (hist > 0) & (prev_hist <= 0)
+        macd_cross_bearish = (hist < 0) & (prev_hist >= 0)
+        st_cross_bullish = (close > supertrend) & (prev_close <= prev_supertrend)
+        st_cross_bearish = (close < supertrend) & (prev_close >= prev_supertrend)
+
+        buy = ((ema_cross_bullish | macd_cross_bullish | st_cross_bullish) & bullish_trend
+               & (rsi > rsi_long_threshold) & (hist > 0) & volatility_filter & (close > htf_ema))
+        sell = ((ema_cross_bearish | macd_cross_bearish | st_cross_bearish) & bearish_trend
+                & (rsi < rsi_short_threshold) & (hist < 0) & volatility_filter & (close < htf_ema))
+        # Long conditions are checked first
+        sell &= ~buy
+
+        long_factors = (ema_cross_bullish.astype(int) + macd_cross_bullish + st_cross_bullish
+                        + (rsi > 60) + (hist > prev_hist))
+        short_factors = (ema_cross_bearish.astype(int) + macd_cross_bearish + st_cross_bearish
+                         + (rsi < 40) + (hist < prev_hist))
+
+    confidence = np.where(buy, _confidence(long_factors), np.where(sell, _confidence(short_factors), 'Low'))
+    return {'buy': buy, 'sell': sell, 'confidence': confidence}
+
+def _first_exit(direction, start, stop, target, open_, high, low):
+    # Scans forward in growing windows, so each trade only touches the bars it is open for
+    n = len(high)
+    window = 256
+    while start < n:
+        end = min(n, start + window)
+        if direction > 0:
+            stop_hit = low[start:end] <= stop
+            target_hit = high[start:end] >= target
+        else:
+            stop_hit = high[start:end] >= stop
+            target_hit = low[start:end] <= target
+        hit = stop_hit | target_hit
+        if hit.any():
+            k = int(np.argmax(hit))
+            i = start + k
+            # Both levels inside one bar: assume the stop came first
+            if stop_hit[k]:
+                price = min(open_[i], stop) if direction > 0 else max(open_[i], stop)
+                return i, price, 'stop'
+            price = max(open_[i], target) if direction > 0 else min(open_[i], target)
+            return i, price, 'target'
+        start = end
+        window *= 2
+    return None, None, None
+
+def simulate_trades(df, signals, r_multiple=2.0):
+    """
+    One position at a time: enter at the signal bar's close, exit at the Supertrend
+    stop or the ATR x r_multiple target (gaps fill at the open).
+
+    Returns (trades, skipped, open_trade). Signals whose stop is on the wrong side
+    of the entry are skipped.
+    """
+    open_ = df['open'].to_numpy()
+    high = df['high'].to_numpy()
+    low = df['low'].to_numpy()
+    close = df['close'].to_numpy()
+    supertrend = df['supertrend'].to_numpy()
+    atr = df['atr'].to_numpy()
+    index = df.index
+
+    trades = []
+    skipped = 0
+    open_trade = None
+    next_entry = 0
+    for i in np.flatnonzero(signals['buy'] | signals['sell']):
+        if i < next_entry:
+            continue
+        direction = 1 if signals['buy'][i] else -1
+        entry, stop = close[i], supertrend[i]
+        target = entry + direction * atr[i] * r_multiple
+        risk = (entry - stop) * direction
+        if not risk > 0:
+            skipped += 1
+            continue
+
+        exit_i, exit_price, outcome = _first_exit(direction, i + 1, stop, target, open_, high, low)
+        trade = {
+            'entry_time': index[i],
+            'side': 'Buy' if direction > 0 else 'Sell',
+            'confidence': signals['confidence'][i],
+            'entry_price': entry,
+            'stop_loss': stop,
+            'take_profit': target,
+        }
+        if exit_i is None:
+            open_trade = trade
+            break
+        trade.update({
+            'exit_time': index[exit_i],
+            'exit_price': exit_price,
+            'outcome': outcome,
+            'bars_held': exit_i - i,
+            'return': direction * (exit_price - entry) / entry,
+            'r': direction * (exit_price - entry) / risk,
+        })
+        trades.append(trade)
+        next_entry = exit_i
+    return trades, skipped, open_trade
+
+def summarize_trades(trades):
+    """Win rate, expectancy and drawdown of a list of closed trades"""
+    if not trades:
+        return {'trades': 0, 'wins': 0, 'losses': 0, 'win_rate': 0.0, 'expectancy_pct': 0.0,
+                'expectancy_r': 0.0, 'profit_factor': 0.0, 'total_return_pct': 0.0,
+                'max_drawdown_pct': 0.0, 'avg_bars_held': 0.0}
+
+    returns = np.array([t['return'] for t in trades])
+    r_multiples = np.array([t['r'] for t in trades])
+    gains = returns[returns > 0].sum()
+    losses = -returns[returns < 0].sum()
+
+    # Equity of a fully invested account, compounding trade by trade (a short can lose
+    # more than 100%; the account just goes to zero)
+    equity = np.concatenate(([1.0], np.cumprod(np.maximum(1 + returns, 0.0))))
+    drawdown = 1 - equity / np.maximum.accumulate(equity)
+
+    return {
+        'trades': len(trades),
+        'wins': int((returns > 0).sum()),
+        'losses': int((returns <= 0).sum()),
+        'win_rate': float((returns > 0).mean() * 100),
+        'expectancy_pct': float(returns.mean() * 100),
+        'expectancy_r': float(r_multiples.mean()),
+        'profit_factor': float(gains / losses) if losses > 0 else float('inf'),
+        'total_return_pct': float((equity[-1] - 1) * 100),
+        'max_drawdown_pct': float(drawdown.max() * 100),
+        'avg_bars_held': float(np.mean([t['bars_held'] for t in trades])),
+    }
+
+def backtest_strategy_frame(df, rsi_long_threshold=55, rsi_short_threshold=45, r_multiple=2.0):
+    """Backtest over a frame built by strategy_frame"""
+    signals = strategy_signals(df, rsi_long_threshold, rsi_short_threshold)
+    trades, skipped, open_trade = simulate_trades(df, signals, r_multiple)
+    return {
+        **summarize_trades(trades),
+        'bars': len(df),
+        'start': df.index[0],
+        'end': df.index[-1],
+        'buy_signals': int(signals['buy'].sum()),
+        'sell_signals': int(signals['sell'].sum()),
+        'skipped': skipped,
+        'open_trade': open_trade,
+        'r_multiple': r_multiple,
+        'trade_log': trades,
+    }
+
+def run_backtest(ohlcv, rsi_long_threshold=55, rsi_short_threshold=45, r_multiple=2.0, **kwargs):
+    """
+    Backtest the !trendsignal strategy over OHLCV rows
+
+    Keyword arguments are the indicator parameters of strategy_columns.
+    """
+    df = strategy_frame(IndicatorFrame(ohlcv), **kwargs)
+    return backtest_strategy_frame(df, rsi_long_threshold, rsi_short_threshold, r_multiple)
+
+def format_backtest_report(asset, interval, result):
+    """Render the !backtest message"""
+    profit_factor = "∞" if result['profit_factor'] == float('inf') else f"{result['profit_factor']:.2f}"
+    response = f"""
+📊 **Backtest • {asset.upper()} • {interval}**
+--------------------------
+• **Period**: {result['start']:%Y-%m-%d %H:%M} → {result['end']:%Y-%m-%d %H:%M} ({result['bars']} bars)
+• **Signals**: {result['buy_signals']} Buy / {result['sell_signals']} Sell
+• **Trades**: {result['trades']} ({result['wins']} wins / {result['losses']} losses)
+• **Win Rate**: {result['win_rate']:.1f}%
+• **Expectancy**: {result['expectancy_pct']:+.2f}% per trade ({result['expectancy_r']:+.2f}R)
+• **Profit Factor**: {profit_factor}
+• **Total Return**: {result['total_return_pct']:+.1f}%
+• **Max Drawdown**: -{result['max_drawdown_pct']:.1f}%
+• **Avg Holding**: {result['avg_bars_held']:.1f} bars
+"""
+    if result['skipped']:
+        response += f"• Skipped {result['skipped']} signals with the stop on the wrong side of entry\n"
+    if result['open_trade']:
+        trade = result['open_trade']
+        response += f"• Open {trade['side']} since {trade['entry_time']:%Y-%m-%d %H:%M} @ ${trade['entry_price']:.2f}\n"
+    response += (f"\n*Entry at signal close, exit at Supertrend stop or ATR×{result['r_multiple']:g} target; "
+                 f"stop assumed first when both are hit in one bar.*")
+    return response
+
+async def get_backtest_async(asset="BTC/USDT", interval="15m", bars=5000, **kwargs):
+    try:
+        bars = max(100, min(int(bars), MAX_BACKTEST_BARS))
+        symbol = asset.upper()
+        # +1 for the still-open candle, which is left out of the backtest
+        ohlcv = await fetch_ohlcv_history_async(symbol, interval, bars + 1)
+        result = await asyncio.to_thread(run_backtest, ohlcv[:-1], **kwargs)
+        return format_backtest_report(asset, interval, result)
+    except Exception as e:
+        return f"❌ Error running backtest: {str(e)}"
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+import ccxt
+import numpy as np
+from services.candle_sync import CandleBuffer, plan_sync
+
+def timeframe_ms(interval):
+    """Length of one candle in milliseconds, e.g. '15m' -> 900000"""
+    return ccxt.Exchange.parse_timeframe(interval) * 1000
+
+class CandleCache:
+    """
+    LRU cache of OHLCV ring buffers keyed by (symbol, interval).
+
+    An entry stays valid until the newest cached candle closes, so every request
+    inside the same candle is served from memory. Expired entries are kept as the
+    base for an incremental sync that only fetches the candles that are missing.
+    Least recently used entries are evicted once the size of their column
+    arrays goes over max_bytes. With dtype float32 prices and volumes take half
+    the memory, rounded to about 7 significant digits.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, dtype=np.float64):
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.full_fetches = 0
+        self.incremental_fetches = 0
+        self.rows_fetched = 0
+        self.store_loads = 0
+
+    def get(self, symbol, interval, limit, now_ms=None):
+        """Return the last `limit` rows, or None if the entry is missing, too short or expired"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        key = (symbol, interval)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now_ms >= entry['expires_at'] or not entry['buffer'].covers(limit):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry['buffer'].tail(limit)
+
+    def sync_plan(self, symbol, interval, limit, now_ms=None):
+        """(since, fetch_limit) for refreshing an entry; since is None for a full fetch"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        with self._lock:
+            entry = self._entries.get((symbol, interval))
+            buffer = entry['buffer'] if entry is not None else None
+            return plan_sync(buffer, timeframe_ms(interval), limit, now_ms)
+
+    def load(self, symbol, interval, rows, limit):
+        """Install stored closed candles as the base for the next incremental sync"""
+        key = (symbol, interval)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry['bytes']
+            buffer = CandleBuffer(limit, self.dtype)
+            buffer.merge(rows)
+            self.store_loads += 1
+            self._install(key, buffer, interval)
+
+    def merge(self, symbol, interval, rows, limit, since=None):
+        """
+        Store fetched rows and return the last `limit` rows.
+
+        With since set the rows extend the existing buffer (the open candle is
+        replaced in place); otherwise they replace it.
+        """
+        key = (symbol, interval)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry['bytes']
+
+            if since is not None and entry is not None:
+                buffer = entry['buffer']
+                self.incremental_fetches += 1
+            else:
+                capacity = max(limit, entry['buffer'].capacity) if entry is not None else limit
+                buffer = CandleBuffer(capacity, self.dtype)
+                buffer.history_complete = since is None and len(rows) < limit
+                self.full_fetches += 1
+            buffer.merge(rows)
+            self.rows_fetched += len(rows)
+
+            if not len(buffer):
+                return []
+            self._install(key, buffer, interval)
+            return buffer.tail(limit)
+
+    def _install(self, key, buffer, interval):
+        size = buffer.nbytes
+        self._entries[key] = {
+            'buffer': buffer,
+            'expires_at': buffer.last_timestamp + timeframe_ms(interval),
+            'bytes': size,
+        }
+        self._bytes += size
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted['bytes']
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "full_fetches": self.full_fetches,
+                "incremental_fetches": self.incremental_fetches,
+                "rows_fetched": self.rows_fetched,
+                "store_loads": self.store_loads,
+            }
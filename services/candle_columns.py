@@ -0,0 +1,160 @@
+from collections.abc import Sequence
+import numpy as np
+import pandas as pd
+
+OHLCV = ('open', 'high', 'low', 'close', 'volume')
+# Rows built at once while iterating CandleRows
+ITER_CHUNK = 128
+
+class CandleColumns:
+    """
+    Candles (and any indicator columns added to them) as contiguous NumPy
+    arrays, oldest first.
+
+    Timestamps are int64 epoch milliseconds; every other column shares one
+    float dtype, float64 by default or float32 at half the memory (about 7
+    significant digits). Slicing returns views, no values are copied.
+    DataFrames and ccxt-style rows are only built when asked for.
+
+    Columns built from rows keep OHLCV as the rows of one (5, n) array, so
+    their DataFrame is a single pandas block, like one built from rows.
+    """
+
+    def __init__(self, columns, dtype=np.float64):
+        self.dtype = np.dtype(dtype)
+        self.timestamp = np.ascontiguousarray(columns['timestamp'], dtype=np.int64)
+        self._columns = {}
+        self._block = None
+        for name in OHLCV:
+            self.add(name, columns[name])
+        for name, values in columns.items():
+            if name != 'timestamp' and name not in self._columns:
+                self.add(name, values)
+
+    @classmethod
+    def _from_block(cls, timestamp, block, dtype):
+        columns = dict(zip(OHLCV, block), timestamp=timestamp)
+        result = cls(columns, dtype)
+        result._block = block
+        return result
+
+    @classmethod
+    def from_rows(cls, rows, dtype=np.float64):
+        """Columns of ccxt-style [timestamp, open, high, low, close, volume] rows"""
+        data = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+        return cls._from_block(data[:, 0], np.array(data[:, 1:].T, dtype=dtype, order='C'), dtype)
+
+    @classmethod
+    def allocate(cls, size, dtype=np.float64):
+        """`size` uninitialised candles, to be filled in place"""
+        return cls._from_block(np.empty(size, dtype=np.int64), np.empty((len(OHLCV), size), dtype=dtype), dtype)
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def __contains__(self, name):
+        return name == 'timestamp' or name in self._columns
+
+    def __getitem__(self, key):
+        """A column by name, or a view of the rows in a slice"""
+        if isinstance(key, slice):
+            view = CandleColumns.__new__(CandleColumns)
+            view.dtype = self.dtype
+            view.timestamp = self.timestamp[key]
+            view._columns = {name: values[key] for name, values in self._columns.items()}
+            view._block = None if self._block is None else self._block[:, key]
+            return view
+        return self.timestamp if key == 'timestamp' else self._columns[key]
+
+    @property
+    def names(self):
+        return ('timestamp', *self._columns)
+
+    @property
+    def nbytes(self):
+        return self.timestamp.nbytes + sum(values.nbytes for values in self._columns.values())
+
+    def add(self, name, values):
+        """
+        Store an indicator column (array or Series) in the container's dtype;
+        contiguous arrays already in that dtype aren't copied
+        """
+        values = np.ascontiguousarray(values, dtype=self.dtype)
+        if values.shape != self.timestamp.shape:
+            raise ValueError(f"{name} has {len(values)} values for {len(self)} candles")
+        if name in OHLCV:
+            self._block = None
+        self._columns[name] = values
+
+    def copy(self, dtype=None):
+        """Columns that own their values, in `dtype` (default: the same one)"""
+        dtype = self.dtype if dtype is None else dtype
+        if self._block is None:
+            return CandleColumns({name: self[name].copy() for name in self.names}, dtype)
+        result = CandleColumns._from_block(self.timestamp.copy(), np.array(self._block, dtype=dtype, order='C'), dtype)
+        for name in self._columns:
+            if name not in OHLCV:
+                result.add(name, self._columns[name].copy())
+        return result
+
+    def tail(self, limit):
+        """View of the newest `limit` candles"""
+        return self[len(self) - min(limit, len(self)):]
+
+    def between(self, start_ms=None, end_ms=None):
+        """View of the candles with start_ms <= timestamp < end_ms"""
+        lo = 0 if start_ms is None else int(np.searchsorted(self.timestamp, start_ms, side='left'))
+        hi = len(self) if end_ms is None else int(np.searchsorted(self.timestamp, end_ms, side='left'))
+        return self[lo:hi]
+
+    def row(self, i):
+        """One candle as a ccxt-style row"""
+        return [int(self.timestamp[i]), *(float(self._columns[name][i]) for name in OHLCV)]
+
+    def rows(self):
+        """All candles as ccxt-style rows"""
+        return list(map(list, zip(self.timestamp.tolist(), *(self._columns[name].tolist() for name in OHLCV))))
+
+    def frame(self, names=None):
+        """
+        DataFrame of the columns (OHLCV plus every added one by default) on a
+        DatetimeIndex, sharing the column arrays
+        """
+        names = tuple(self._columns if names is None else names)
+        index = pd.DatetimeIndex(pd.to_datetime(self.timestamp, unit='ms'), name='timestamp')
+        if names == OHLCV and self._block is not None:
+            return pd.DataFrame(self._block.T, index=index, columns=list(OHLCV), copy=False)
+        return pd.DataFrame({name: self._columns[name] for name in names}, index=index, copy=False)
+
+class CandleRows(Sequence):
+    """
+    Read-only ccxt-style rows over CandleColumns. A row is only built when it
+    is read, so passing candles around (e.g. into an IndicatorFrame, which
+    takes the columns as they are) doesn't create a Python list per candle.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return CandleRows(self.columns[key])
+        return self.columns.row(key)
+
+    def __iter__(self):
+        # A chunk at a time, so a pass over the candles doesn't hold all of them as lists
+        for start in range(0, len(self), ITER_CHUNK):
+            yield from self.columns[start:start + ITER_CHUNK].rows()
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and list(self) == list(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"<CandleRows {len(self)} candles>"
@@ -0,0 +1,177 @@
+import os
+import re
+import threading
+import numpy as np
+
+# One little-endian file per column; timestamps (ms) double as the sorted index
+COLUMNS = (('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'), ('volume', '<f8'))
+INDEX = ('timestamp', '<i8')
+
+class CandleSeries:
+    """
+    Closed candles of one (exchange, symbol, interval) on disk, oldest first.
+
+    Each column is a flat binary file, so reads are memory-mapped NumPy views
+    and appends only write the new bytes. Timestamps are kept strictly
+    increasing, which makes them a binary-searchable index for range queries.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mapped = None
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            self._repair()
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def _stored_rows(self, name, dtype):
+        path = self._file(name)
+        return os.path.getsize(path) // np.dtype(dtype).itemsize if os.path.exists(path) else 0
+
+    def _repair(self):
+        # An interrupted append can leave columns of different lengths; keep the common prefix
+        n = min(self._stored_rows(name, dtype) for name, dtype in (INDEX,) + COLUMNS)
+        for name, dtype in (INDEX,) + COLUMNS:
+            with open(self._file(name), 'ab') as f:
+                f.truncate(n * np.dtype(dtype).itemsize)
+        self._length = n
+
+    def __len__(self):
+        return self._length
+
+    def _columns(self):
+        # Maps are reused until the series grows; older maps stay valid since files only grow
+        n = self._length
+        if self._mapped is None or self._mapped[0] != n:
+            if n == 0:
+                columns = {name: np.empty(0, dtype=dtype) for name, dtype in (INDEX,) + COLUMNS}
+            else:
+                columns = {name: np.memmap(self._file(name), dtype=dtype, mode='r', shape=(n,))
+                           for name, dtype in (INDEX,) + COLUMNS}
+            self._mapped = (n, columns)
+        return self._mapped[1]
+
+    @property
+    def first_timestamp(self):
+        return int(self._columns()['timestamp'][0]) if self._length else None
+
+    @property
+    def last_timestamp(self):
+        return int(self._columns()['timestamp'][-1]) if self._length else None
+
+    def columns(self, start_ms=None, end_ms=None):
+        """Memory-mapped column views for start_ms <= timestamp < end_ms (no copy)"""
+        with self._lock:
+            columns = self._columns()
+        timestamps = columns['timestamp']
+        lo = 0 if start_ms is None else int(np.searchsorted(timestamps, start_ms, side='left'))
+        hi = len(timestamps) if end_ms is None else int(np.searchsorted(timestamps, end_ms, side='left'))
+        return {name: column[lo:hi] for name, column in columns.items()}
+
+    def tail_columns(self, limit):
+        """Column views of the newest `limit` candles"""
+        with self._lock:
+            columns = self._columns()
+        return {name: column[-limit:] if limit else column[:0] for name, column in columns.items()}
+
+    def tail(self, limit):
+        """The newest `limit` candles as ccxt-style [timestamp, open, high, low, close, volume] rows"""
+        return _to_rows(self.tail_columns(limit))
+
+    def merge(self, rows):
+        """
+        Store closed candles, returns how many were added.
+
+        Rows newer than the last stored candle are appended. Rows older than
+        the first one (a longer history download) are stitched in front by
+        rewriting the files.
+        """
+        with self._lock:
+            first = int(self._columns()['timestamp'][0]) if self._length else None
+            last = int(self._columns()['timestamp'][-1]) if self._length else None
+            newer = _increasing([r for r in rows if last is None or r[0] > last])
+            older = _increasing([r for r in rows if first is not None and r[0] < first])
+            if older:
+                self._rewrite(older + _to_rows(self._columns()) + newer)
+            elif newer:
+                self._append(newer)
+            return len(older) + len(newer)
+
+    def _append(self, rows):
+        data = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+        # Timestamps last: a crash before that leaves the extra values for _repair to cut
+        for i, (name, dtype) in enumerate(COLUMNS, start=1):
+            with open(self._file(name), 'ab') as f:
+                f.write(data[:, i].astype(dtype).tobytes())
+        with open(self._file(INDEX[0]), 'ab') as f:
+            f.write(np.asarray([int(r[0]) for r in rows], dtype=INDEX[1]).tobytes())
+        self._length += len(rows)
+
+    def _rewrite(self, rows):
+        self._mapped = None
+        data = np.asarray(rows, dtype=np.float64).reshape(-1, 6)
+        values = [(INDEX[0], np.asarray([int(r[0]) for r in rows], dtype=INDEX[1]))]
+        values += [(name, data[:, i].astype(dtype)) for i, (name, dtype) in enumerate(COLUMNS, start=1)]
+        for name, array in values:
+            tmp = self._file(name) + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(array.tobytes())
+            os.replace(tmp, self._file(name))
+        self._length = len(rows)
+
+def _increasing(rows):
+    # Keep rows sorted and unique by timestamp
+    result = []
+    for row in sorted(rows, key=lambda r: r[0]):
+        if not result or row[0] > result[-1][0]:
+            result.append(row)
+    return result
+
+def _to_rows(columns):
+    timestamps = columns['timestamp'].tolist()
+    values = [columns[name].tolist() for name, _ in COLUMNS]
+    return [[t, *v] for t, *v in zip(timestamps, *values)]
+
+class CandleStore:
+    """On-disk CandleSeries per (exchange, symbol, interval) under one root directory"""
+
+    def __init__(self, root):
+        self.root = root
+        self._series = {}
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.rows_written = 0
+
+    def series(self, exchange_id, symbol, interval):
+        key = (exchange_id, symbol, interval)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                safe_symbol = re.sub(r'[^A-Za-z0-9._-]', '_', symbol)
+                series = CandleSeries(os.path.join(self.root, exchange_id, safe_symbol, interval))
+                self._series[key] = series
+            return series
+
+    def tail(self, exchange_id, symbol, interval, limit):
+        """Newest `limit` stored candles as rows"""
+        self.reads += 1
+        return self.series(exchange_id, symbol, interval).tail(limit)
+
+    def write(self, exchange_id, symbol, interval, rows):
+        """Store closed candles, returns how many were new"""
+        added = self.series(exchange_id, symbol, interval).merge(rows)
+        self.rows_written += added
+        return added
+
+    def stats(self):
+        with self._lock:
+            return {
+                "root": self.root,
+                "series": len(self._series),
+                "rows": sum(len(series) for series in self._series.values()),
+                "reads": self.reads,
+                "rows_written": self.rows_written,
+            }
@@ -0,0 +1,123 @@
+import numpy as np
+from services.candle_columns import CandleColumns, CandleRows
+
+# Binance returns at most this many klines per request
+MAX_FETCH_LIMIT = 1000
+
+class CandleBuffer:
+    """
+    Ring buffer of OHLCV candles for one (symbol, interval), oldest first.
+
+    The newest candle is usually the still-open one; merging a row with the
+    same open time replaces it in place instead of appending. Candles are kept
+    as CandleColumns with some spare room at the end, so appends write into
+    the arrays and only occasionally move the kept candles back to the front.
+    """
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        self._data = CandleColumns.allocate(0, dtype)
+        self._start = 0
+        self._end = 0
+        # Set when a full fetch came back short: the exchange has no older candles
+        self.history_complete = False
+
+    @property
+    def last_timestamp(self):
+        return int(self._data.timestamp[self._end - 1]) if self._end > self._start else None
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def __len__(self):
+        return self._end - self._start
+
+    def merge(self, rows):
+        """Append rows newer than the buffer and replace the open candle, returns the number applied"""
+        if not rows:
+            return 0
+        if len(rows) == 1:
+            return self._merge_row(rows[0])
+        fresh = CandleColumns.from_rows(rows, self.dtype)
+        ts = fresh.timestamp
+        # A row applies if it isn't older than the newest candle before it (buffer or batch)
+        last = self.last_timestamp
+        start = np.iinfo(np.int64).min if last is None else last
+        before = np.maximum.accumulate(np.concatenate(([start], ts[:-1])))
+        applied = np.flatnonzero(ts >= before)
+        if len(applied) == 0:
+            return 0
+        # Of rows sharing an open time the last one wins
+        ts = ts[applied]
+        latest = applied[np.concatenate((ts[1:] != ts[:-1], [True]))]
+        if ts[0] == last:
+            self._write(self._end - 1, fresh, latest[:1])
+            latest = latest[1:]
+        if len(latest):
+            self._append(fresh, latest)
+        return len(applied)
+
+    def _merge_row(self, row):
+        # A live update touches one candle; skip building arrays for it
+        last = self.last_timestamp
+        if last is not None and row[0] < last:
+            return 0
+        if last is None or row[0] > last:
+            if self._end == len(self._data):
+                self._reserve(1)
+            self._end += 1
+            self._start = max(self._start, self._end - self.capacity)
+        for name, value in zip(self._data.names, row):
+            self._data[name][self._end - 1] = value
+        return 1
+
+    def _append(self, fresh, rows):
+        rows = rows[-self.capacity:]
+        n = len(rows)
+        if self._end + n > len(self._data):
+            self._reserve(n)
+        self._write(self._end, fresh, rows)
+        self._end += n
+        self._start = max(self._start, self._end - self.capacity)
+
+    def _reserve(self, n):
+        # Keep the newest candles that still fit with the new ones, at the front of arrays with a
+        # quarter of the capacity spare (less while the buffer is far from full)
+        kept = min(len(self), self.capacity - n)
+        size = min(self.capacity + max(self.capacity // 4, 16), max(2 * (kept + n), 64))
+        data = CandleColumns.allocate(size, self.dtype)
+        for name in self._data.names:
+            data[name][:kept] = self._data[name][self._end - kept:self._end]
+        self._data, self._start, self._end = data, 0, kept
+
+    def _write(self, at, fresh, rows):
+        for name in self._data.names:
+            self._data[name][at:at + len(rows)] = fresh[name][rows]
+
+    def covers(self, limit):
+        return len(self) >= limit or (self.history_complete and len(self) > 0)
+
+    def tail(self, limit):
+        """The newest `limit` candles, copied out as float64 CandleRows so later merges don't change them"""
+        return CandleRows(self._data[max(self._end - limit, self._start):self._end].copy(np.float64))
+
+def plan_sync(buffer, interval_ms, limit, now_ms):
+    """
+    Decide how to refresh a buffer, returns (since, fetch_limit).
+
+    since is None when a full fetch is needed: no buffer yet, the buffer is too
+    small for `limit`, or too many candles were missed to catch up in one request.
+    Otherwise only candles from the last stored (possibly still open) one onward
+    are requested.
+    """
+    if buffer is None or buffer.capacity < limit:
+        return None, limit
+    if not buffer.covers(limit):
+        return None, limit
+    since = buffer.last_timestamp
+    missing = (now_ms - since) // interval_ms + 1
+    if missing >= MAX_FETCH_LIMIT:
+        return None, limit
+    return since, int(missing) + 1
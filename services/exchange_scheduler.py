@@ -0,0 +1,257 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import ccxt
+from services.tracing import span
+
+# Lanes in priority order: people waiting on a command first, then scans, alerts and feed resyncs
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+LANES = (INTERACTIVE, BACKGROUND)
+
+# Binance spot request weights (GET /api/v3/klines by limit, GET /api/v3/exchangeInfo)
+KLINE_WEIGHTS = ((99, 1), (499, 2), (1000, 5))
+EXCHANGE_INFO_WEIGHT = 20
+
+_lane = contextvars.ContextVar('exchange_lane', default=INTERACTIVE)
+
+@contextmanager
+def exchange_lane(lane):
+    """Exchange requests made inside (including tasks started inside) go through `lane`"""
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+def kline_weight(limit):
+    for max_limit, weight in KLINE_WEIGHTS:
+        if limit <= max_limit:
+            return weight
+    return 10
+
+class ExchangeBusy(ccxt.RateLimitExceeded):
+    """The request could not get its weight before its lane's deadline"""
+
+class _Waiter:
+    __slots__ = ('weight', 'lane', 'deadline', 'enqueued', 'wake', 'granted', 'cancelled')
+
+    def __init__(self, weight, lane, deadline, enqueued, wake):
+        self.weight = weight
+        self.lane = lane
+        self.deadline = deadline
+        self.enqueued = enqueued
+        self.wake = wake
+        self.granted = False
+        self.cancelled = False
+
+class WeightScheduler:
+    """
+    Token bucket over Binance request weight, shared by every exchange call.
+
+    The bucket refills at weight_per_minute / 60 per second up to `burst`.
+    Requests that don't fit wait in priority order (interactive before
+    background, FIFO within a lane). A request whose estimated wait runs past
+    its lane's deadline fails fast with ExchangeBusy instead of queueing. The
+    used-weight header Binance sends back caps the tokens, so other clients
+    on the same IP are accounted for, and a 429/418 pauses every lane for
+    the Retry-After time.
+    """
+
+    def __init__(self, weight_per_minute=4800, burst=None, deadlines=None):
+        self.weight_per_minute = weight_per_minute
+        self.rate = weight_per_minute / 60
+        self.burst = burst or weight_per_minute / 4
+        self.deadlines = deadlines or {INTERACTIVE: 10.0, BACKGROUND: 120.0}
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._timer = None
+        self.used_weight = None
+        self.throttled = 0
+        self._lanes = {lane: {'requests': 0, 'weight': 0, 'rejected': 0, 'queued': 0,
+                              'wait_total': 0.0, 'wait_max': 0.0, 'waits': deque(maxlen=500)} for lane in LANES}
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _enqueue(self, weight, lane, wake):
+        # Returns None if the weight was granted right away, else the queued waiter
+        weight = min(weight, self.burst)
+        now = time.monotonic()
+        deadline = now + self.deadlines[lane]
+        with self._lock:
+            self._refill(now)
+            rank = LANES.index(lane)
+            ahead = sum(w.weight for r, _, w in self._waiters if r <= rank and not w.cancelled)
+            # Nothing of the same or a higher priority is waiting: go now if it fits
+            if not ahead and now >= self._paused_until and self.tokens >= weight:
+                self.tokens -= weight
+                self._record(lane, weight, 0.0)
+                return None
+            eta = max(self._paused_until - now, 0.0) + max(ahead + weight - self.tokens, 0.0) / self.rate
+            if eta > self.deadlines[lane]:
+                self._lanes[lane]['rejected'] += 1
+                raise ExchangeBusy(f"Exchange request budget exhausted ({lane} wait ~{eta:.0f}s)")
+            waiter = _Waiter(weight, lane, deadline, now, wake)
+            heapq.heappush(self._waiters, (rank, next(self._seq), waiter))
+            self._lanes[lane]['queued'] += 1
+            if self._waiters[0][2] is waiter and self._timer is not None:
+                # New head of the queue (it jumped a lower lane): its timer may be due sooner
+                self._timer.cancel()
+                self._timer = None
+            self._schedule(now)
+            return waiter
+
+    def _dispatch(self):
+        now = time.monotonic()
+        with self._lock:
+            self._timer = None
+            self._refill(now)
+            while self._waiters:
+                waiter = self._waiters[0][2]
+                if waiter.cancelled:
+                    heapq.heappop(self._waiters)
+                    continue
+                if now < self._paused_until or self.tokens < waiter.weight:
+                    break
+                heapq.heappop(self._waiters)
+                self.tokens -= waiter.weight
+                waiter.granted = True
+                self._lanes[waiter.lane]['queued'] -= 1
+                self._record(waiter.lane, waiter.weight, now - waiter.enqueued)
+                waiter.wake()
+            self._schedule(now)
+
+    def _schedule(self, now):
+        # Caller holds the lock; one timer, set for when the head of the queue can go
+        if self._timer is not None or not self._waiters:
+            return
+        head = self._waiters[0][2]
+        delay = max(self._paused_until - now, (head.weight - self.tokens) / self.rate, 0.0)
+        self._timer = threading.Timer(delay, self._dispatch)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _cancel(self, waiter):
+        """Drop a waiter that gave up, False if it was granted in the meantime"""
+        with self._lock:
+            if waiter.granted:
+                return False
+            waiter.cancelled = True
+            self._lanes[waiter.lane]['queued'] -= 1
+            self._lanes[waiter.lane]['rejected'] += 1
+            return True
+
+    def _record(self, lane, weight, waited):
+        stats = self._lanes[lane]
+        stats['requests'] += 1
+        stats['weight'] += weight
+        stats['wait_total'] += waited
+        stats['wait_max'] = max(stats['wait_max'], waited)
+        stats['waits'].append(waited)
+
+    def acquire(self, weight, lane=None):
+        """Block until `weight` is available (from a worker thread)"""
+        lane = lane or _lane.get()
+        granted = threading.Event()
+        waiter = self._enqueue(weight, lane, granted.set)
+        if waiter is not None and not granted.wait(waiter.deadline - time.monotonic()) and self._cancel(waiter):
+            raise ExchangeBusy(f"Exchange request budget exhausted ({lane} deadline passed)")
+
+    async def acquire_async(self, weight, lane=None):
+        """Wait on the event loop until `weight` is available"""
+        lane = lane or _lane.get()
+        loop = asyncio.get_running_loop()
+        granted = asyncio.Event()
+        waiter = self._enqueue(weight, lane, lambda: loop.call_soon_threadsafe(granted.set))
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(granted.wait(), timeout=waiter.deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            if self._cancel(waiter):
+                raise ExchangeBusy(f"Exchange request budget exhausted ({lane} deadline passed)")
+        except asyncio.CancelledError:
+            self._cancel(waiter)
+            raise
+
+    def observe(self, exchange):
+        """Sync with the weight Binance reports as used this minute, and back off when it pushes back"""
+        headers = getattr(exchange, 'last_response_headers', None) or {}
+        headers = {str(k).lower(): v for k, v in headers.items()}
+        used = headers.get('x-mbx-used-weight-1m')
+        if used is not None:
+            with self._lock:
+                self.used_weight = int(used)
+                self.tokens = min(self.tokens, max(self.weight_per_minute - self.used_weight, 0))
+        return headers
+
+    def throttle(self, exchange):
+        """Pause every lane after a 429/418 for Retry-After seconds (60 if missing)"""
+        retry_after = self.observe(exchange).get('retry-after')
+        now = time.monotonic()
+        with self._lock:
+            self.throttled += 1
+            self._paused_until = max(self._paused_until, now + float(retry_after or 60))
+            self.tokens = 0.0
+            self._updated = now
+
+    def call(self, exchange, method, *args, weight=1, lane=None, **kwargs):
+        """Run a blocking ccxt call once its weight is available"""
+        with span('exchange_queue'):
+            self.acquire(weight, lane)
+        try:
+            with span('exchange_request'):
+                result = getattr(exchange, method)(*args, **kwargs)
+        except (ccxt.DDoSProtection, ccxt.RateLimitExceeded):
+            self.throttle(exchange)
+            raise
+        self.observe(exchange)
+        return result
+
+    async def call_async(self, exchange, method, *args, weight=1, lane=None, **kwargs):
+        """Await an async ccxt call once its weight is available"""
+        with span('exchange_queue'):
+            await self.acquire_async(weight, lane)
+        try:
+            with span('exchange_request'):
+                result = await getattr(exchange, method)(*args, **kwargs)
+        except (ccxt.DDoSProtection, ccxt.RateLimitExceeded):
+            self.throttle(exchange)
+            raise
+        self.observe(exchange)
+        return result
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            lanes = {}
+            for lane, stats in self._lanes.items():
+                waits = sorted(stats['waits'])
+                lanes[lane] = {
+                    "queued": stats['queued'],
+                    "requests": stats['requests'],
+                    "weight": stats['weight'],
+                    "rejected": stats['rejected'],
+                    "avg_wait_ms": round(stats['wait_total'] / stats['requests'] * 1000, 1) if stats['requests'] else 0.0,
+                    "p95_wait_ms": round(waits[int(len(waits) * 0.95)] * 1000, 1) if waits else 0.0,
+                    "max_wait_ms": round(stats['wait_max'] * 1000, 1),
+                }
+            return {
+                "weight_per_minute": self.weight_per_minute,
+                "tokens": round(self.tokens, 1),
+                "used_weight_1m": self.used_weight,
+                "throttled": self.throttled,
+                "paused_for": round(max(self._paused_until - time.monotonic(), 0.0), 1),
+                "lanes": lanes,
+            }
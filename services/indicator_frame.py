@@ -0,0 +1,160 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from ta.momentum import RSIIndicator
+from ta.trend import MACD, EMAIndicator
+from ta.volatility import BollingerBands
+from services.candle_columns import OHLCV, CandleColumns, CandleRows
+from services.metrics import record_cache
+
+# Bars fetched for every indicator frame, enough for the 4H confirmation of !trendsignal
+FRAME_LIMIT = 1000
+
+def true_range(high, low, close):
+    """True range, matching ta's handling of the first bar (no previous close)"""
+    prev_close = np.empty_like(close)
+    prev_close[0] = np.nan
+    prev_close[1:] = close[:-1]
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+def wilder_atr(true_range, window):
+    """Wilder-smoothed ATR seeded with the SMA of the first window, like ta's AverageTrueRange"""
+    atr = np.zeros(len(true_range))
+    if len(true_range) < window:
+        return atr
+    atr[window - 1] = true_range[:window].mean()
+    if len(true_range) > window:
+        seeded = np.concatenate(([atr[window - 1]], true_range[window:]))
+        atr[window - 1:] = pd.Series(seeded).ewm(alpha=1.0 / window, adjust=False).mean().to_numpy()
+    return atr
+
+class IndicatorFrame:
+    """
+    Candles for one (symbol, interval) plus memoized indicator series.
+
+    Every indicator/parameter combination is computed at most once per frame and
+    shared by all commands reading the same candles. Module-specific indicators
+    plug in through cached(). The candles are kept as CandleColumns; the
+    DataFrame the indicators read is built over them on first use.
+
+    max_memo bounds the memo for long-lived frames that see many parameter
+    combinations, dropping the least recently used results first.
+    """
+
+    def __init__(self, ohlcv, max_memo=None):
+        if isinstance(ohlcv, CandleRows):
+            ohlcv = ohlcv.columns
+        self.columns = ohlcv if isinstance(ohlcv, CandleColumns) else CandleColumns.from_rows(ohlcv)
+        self.max_memo = max_memo
+        self.computations = 0
+        self._candles = None
+        self._memo = OrderedDict()
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_columns(cls, columns, max_memo=None):
+        """Frame over column arrays (e.g. CandleSeries views) without copying the values"""
+        return cls(CandleColumns(columns), max_memo)
+
+    @property
+    def candles(self):
+        """OHLCV DataFrame on a DatetimeIndex, sharing the column arrays"""
+        with self._lock:
+            if self._candles is None:
+                self._candles = self.columns.frame(OHLCV)
+            return self._candles
+
+    def matches(self, ohlcv):
+        """True if `ohlcv` holds the same candles, including the still-open one"""
+        columns = self.columns
+        return (len(ohlcv) == len(columns) and len(ohlcv) > 0
+                and ohlcv[0][0] == columns.timestamp[0] and ohlcv[-1] == columns.row(-1))
+
+    def cached(self, key, compute):
+        """Return the memoized result for `key`, computing it on first use"""
+        with self._lock:
+            if key not in self._memo:
+                self._memo[key] = compute()
+                self.computations += 1
+                if self.max_memo is not None and len(self._memo) > self.max_memo:
+                    self._memo.popitem(last=False)
+            elif self.max_memo is not None:
+                self._memo.move_to_end(key)
+            return self._memo[key]
+
+    def ema(self, window):
+        return self.cached(('ema', window), lambda: EMAIndicator(close=self.candles['close'], window=window).ema_indicator())
+
+    def rsi(self, window):
+        return self.cached(('rsi', window), lambda: RSIIndicator(close=self.candles['close'], window=window).rsi())
+
+    def macd(self, window_slow=26, window_fast=12, window_sign=9):
+        """(macd, signal, histogram)"""
+        def compute():
+            indicator = MACD(close=self.candles['close'], window_slow=window_slow,
+                             window_fast=window_fast, window_sign=window_sign)
+            return indicator.macd(), indicator.macd_signal(), indicator.macd_diff()
+        return self.cached(('macd', window_slow, window_fast, window_sign), compute)
+
+    def bollinger(self, window=20, window_dev=2):
+        """(upper, middle, lower)"""
+        def compute():
+            indicator = BollingerBands(close=self.candles['close'], window=window, window_dev=window_dev)
+            return indicator.bollinger_hband(), indicator.bollinger_mavg(), indicator.bollinger_lband()
+        return self.cached(('bollinger', window, window_dev), compute)
+
+    def atr(self, window):
+        # Same values as ta's AverageTrueRange without its per-row Python loop
+        def compute():
+            candles = self.candles
+            tr = true_range(candles['high'].to_numpy(), candles['low'].to_numpy(), candles['close'].to_numpy())
+            return pd.Series(wilder_atr(tr, window), index=candles.index, name='atr')
+        return self.cached(('atr', window), compute)
+
+class IndicatorFrameStore:
+    """
+    One IndicatorFrame per (symbol, interval, last closed candle).
+
+    A frame is reused while the fetched candles are identical, so back-to-back
+    commands on the same pair share their indicator math.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, symbol, interval, ohlcv):
+        last_closed = ohlcv[-2][0] if len(ohlcv) > 1 else None
+        key = (symbol, interval, last_closed)
+        with self._lock:
+            frame = self._frames.get(key)
+            if frame is not None and frame.matches(ohlcv):
+                self._frames.move_to_end(key)
+                self.hits += 1
+                record_cache('indicator_frames', True)
+                return frame
+            self.misses += 1
+            record_cache('indicator_frames', False)
+            frame = IndicatorFrame(ohlcv)
+            self._frames[key] = frame
+            # Frames for older candles of the same pair are never asked for again
+            for stale in [k for k in self._frames if k[:2] == key[:2] and k != key]:
+                del self._frames[stale]
+            while len(self._frames) > self.max_entries:
+                self._frames.popitem(last=False)
+            return frame
+
+    def stats(self):
+        with self._lock:
+            return {
+                "frames": len(self._frames),
+                "hits": self.hits,
+                "misses": self.misses,
+                "computations": sum(frame.computations for frame in self._frames.values()),
+            }
+
+indicator_frames = IndicatorFrameStore()
@@ -0,0 +1,309 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import OrderedDict
+import aiohttp
+from services.candle_cache import timeframe_ms
+from services.candle_sync import CandleBuffer, plan_sync
+
+# Binance accepts up to 1024 streams per connection and 5 control messages per second
+SUBSCRIBE_BATCH_DELAY = 0.25
+# How long after a candle should have closed its rows are still served without a newer update
+STALE_GRACE_MS = 5000
+PRUNE_INTERVAL = 60
+
+def stream_name(symbol, interval):
+    """Binance kline stream for a ccxt symbol, e.g. ('BTC/USDT', '15m') -> 'btcusdt@kline_15m'"""
+    return f"{symbol.replace('/', '').lower()}@kline_{interval}"
+
+def kline_row(kline):
+    """A kline payload ("k") as a ccxt-style [timestamp, open, high, low, close, volume] row"""
+    return [int(kline['t']), float(kline['o']), float(kline['h']), float(kline['l']), float(kline['c']), float(kline['v'])]
+
+class KlineFeed:
+    """
+    Live candles from Binance kline WebSocket streams.
+
+    Pairs are subscribed on first use and seeded with a REST fetch; every kline
+    update then replaces the open candle in place or appends the next one, so
+    reads need no network round trip. Updates that arrive while a pair is
+    being (re)synced are queued and applied on top of the REST rows. After a
+    disconnect every pair is resynced, and a skipped candle triggers a resync
+    of that pair. Pairs not read for idle_seconds are unsubscribed.
+    """
+
+    def __init__(self, url, fetch_history, capacity=1000, max_streams=200, idle_seconds=3600,
+                 reconnect_delay=1.0, max_reconnect_delay=60.0):
+        self.url = url
+        # async fetch_history(symbol, interval, since, limit) -> rows, used for seeding and resyncs
+        self.fetch_history = fetch_history
+        self.capacity = capacity
+        self.max_streams = max_streams
+        self.idle_seconds = idle_seconds
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._entries = OrderedDict()
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._task = None
+        self._ws = None
+        self._session = None
+        self._to_subscribe = set()
+        self._to_unsubscribe = set()
+        self._flush_scheduled = False
+        self._request_id = 0
+        self._last_prune = time.monotonic()
+        self._closed = False
+        self.connected = False
+        self.messages = 0
+        self.reconnects = 0
+        self.resyncs = 0
+        self.gaps = 0
+        self.hits = 0
+        self.misses = 0
+
+    def candles(self, symbol, interval, limit, track=True):
+        """
+        The last `limit` live rows, or None if the pair isn't live yet (or the
+        feed is disconnected or behind). With track, a pair that isn't live is
+        subscribed so later reads are.
+        """
+        key = (symbol, interval)
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry['last_used'] = time.monotonic()
+                self._entries.move_to_end(key)
+                buffer = entry['buffer']
+                if (self.connected and entry['ready'] and len(buffer) >= limit
+                        and now_ms < buffer.last_timestamp + entry['step'] + STALE_GRACE_MS):
+                    self.hits += 1
+                    return buffer.tail(limit)
+            self.misses += 1
+        if entry is None and track and limit <= self.capacity:
+            self.track(symbol, interval)
+        return None
+
+    def track(self, symbol, interval):
+        """Subscribe to a pair; safe to call from any thread once the feed runs on a loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None and (self._loop is None or loop is self._loop):
+            self._track(symbol, interval)
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._track, symbol, interval)
+
+    def _track(self, symbol, interval):
+        key = (symbol, interval)
+        if self._closed:
+            return
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._task = self._loop.create_task(self.run())
+        with self._lock:
+            if key in self._entries:
+                return
+            while len(self._entries) >= self.max_streams:
+                self._drop(next(iter(self._entries)))
+            stream = stream_name(symbol, interval)
+            self._entries[key] = {'buffer': CandleBuffer(self.capacity), 'ready': False, 'syncing': False,
+                                  'pending': [], 'last_used': time.monotonic(), 'stream': stream,
+                                  'step': timeframe_ms(interval)}
+            self._streams[stream] = key
+            self._to_unsubscribe.discard(stream)
+            self._to_subscribe.add(stream)
+        self._schedule_flush()
+
+    def _drop(self, key):
+        # Caller holds the lock
+        entry = self._entries.pop(key)
+        del self._streams[entry['stream']]
+        self._to_subscribe.discard(entry['stream'])
+        self._to_unsubscribe.add(entry['stream'])
+
+    def _schedule_flush(self):
+        # Batch (un)subscriptions into one control message
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._loop.call_later(SUBSCRIBE_BATCH_DELAY, lambda: self._loop.create_task(self._flush()))
+
+    async def _flush(self):
+        self._flush_scheduled = False
+        with self._lock:
+            subscribe, self._to_subscribe = sorted(self._to_subscribe), set()
+            unsubscribe, self._to_unsubscribe = sorted(self._to_unsubscribe), set()
+        ws = self._ws
+        if ws is None or ws.closed:
+            # The next connection subscribes to everything tracked
+            return
+        try:
+            if unsubscribe:
+                await self._send(ws, "UNSUBSCRIBE", unsubscribe)
+            if subscribe:
+                await self._send(ws, "SUBSCRIBE", subscribe)
+        except (aiohttp.ClientError, ConnectionError):
+            return
+        # Seed after subscribing, so no update between the REST fetch and the stream is lost
+        for stream in subscribe:
+            key = self._streams.get(stream)
+            if key is not None:
+                self._resync(key)
+
+    async def _send(self, ws, method, streams):
+        self._request_id += 1
+        await ws.send_str(json.dumps({"method": method, "params": streams, "id": self._request_id}))
+
+    def _resync(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry['syncing']:
+            return
+        entry['ready'] = False
+        entry['syncing'] = True
+        self._loop.create_task(self._sync(key, entry))
+
+    async def _sync(self, key, entry):
+        symbol, interval = key
+        delay = self.reconnect_delay
+        while not self._closed and self._entries.get(key) is entry:
+            buffer = entry['buffer']
+            now_ms = int(time.time() * 1000)
+            since, limit = plan_sync(buffer if len(buffer) else None, entry['step'], self.capacity, now_ms)
+            try:
+                rows = await self.fetch_history(symbol, interval, since, limit)
+                break
+            except Exception as e:
+                print(f"⚠️ Kline feed resync failed for {symbol} {interval}: {e!r}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+        else:
+            return
+
+        with self._lock:
+            if since is None:
+                buffer = CandleBuffer(self.capacity)
+            buffer.merge(rows)
+            # Updates that came in during the fetch are newer than (or replace) the REST rows
+            pending, entry['pending'] = entry['pending'], []
+            entry['buffer'] = buffer
+            entry['syncing'] = False
+            self.resyncs += 1
+            if all(self._apply(entry, row) for row in pending):
+                entry['ready'] = self.connected
+                return
+        self._resync(key)
+
+    def _apply(self, entry, row):
+        """Apply one kline row, False if a candle was skipped and the pair needs a resync"""
+        buffer = entry['buffer']
+        last = buffer.last_timestamp
+        if last is not None and row[0] > last + entry['step']:
+            self.gaps += 1
+            return False
+        buffer.merge([row])
+        return True
+
+    def _on_message(self, text):
+        message = json.loads(text)
+        data = message.get('data')
+        if not isinstance(data, dict) or data.get('e') != 'kline':
+            # Subscription acks and other control replies
+            return
+        self.messages += 1
+        key = self._streams.get(message.get('stream'))
+        if key is None:
+            return
+        row = kline_row(data['k'])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            if entry['syncing']:
+                entry['pending'].append(row)
+                return
+            if self._apply(entry, row):
+                return
+        self._resync(key)
+
+    def _prune(self):
+        now = time.monotonic()
+        if now - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        with self._lock:
+            idle = [key for key, entry in self._entries.items() if now - entry['last_used'] > self.idle_seconds]
+            for key in idle:
+                self._drop(key)
+        if idle:
+            self._schedule_flush()
+
+    async def run(self):
+        """Keep the WebSocket connected, resubscribing and resyncing after every reconnect"""
+        delay = self.reconnect_delay
+        while not self._closed:
+            try:
+                if self._session is None or self._session.closed:
+                    self._session = aiohttp.ClientSession()
+                async with self._session.ws_connect(self.url, heartbeat=30) as ws:
+                    with self._lock:
+                        streams = sorted(self._streams)
+                        self._to_subscribe.clear()
+                        self._to_unsubscribe.clear()
+                    if streams:
+                        await self._send(ws, "SUBSCRIBE", streams)
+                    self._ws = ws
+                    self.connected = True
+                    delay = self.reconnect_delay
+                    for key in list(self._entries):
+                        self._resync(key)
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            self._on_message(msg.data)
+                            self._prune()
+                        elif msg.type == aiohttp.WSMsgType.ERROR:
+                            break
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                print(f"⚠️ Kline feed connection error: {e!r}")
+            finally:
+                self._ws = None
+                self.connected = False
+                with self._lock:
+                    for entry in self._entries.values():
+                        entry['ready'] = False
+            if self._closed:
+                break
+            self.reconnects += 1
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def close(self):
+        self._closed = True
+        if self._ws is not None:
+            await self._ws.close()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "connected": self.connected,
+                "streams": len(self._entries),
+                "live": sum(entry['ready'] for entry in self._entries.values()),
+                "messages": self.messages,
+                "reconnects": self.reconnects,
+                "resyncs": self.resyncs,
+                "gaps": self.gaps,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from config import LLM_CACHE_PATH, LLM_CACHE_SIZE
+from services.candle_cache import timeframe_ms
+from services.metrics import record_cache, timed
+from services.openrouter import chat_completion, chat_completion_async, stream_chat_completion
+from services.singleflight import AsyncSingleFlight, SingleFlight
+
+class LLMResponseCache:
+    """
+    Bounded LRU cache of chat completion responses.
+
+    Entries expire when the candle they were generated on closes. With a path,
+    responses are also written to SQLite so they survive a restart.
+    """
+
+    def __init__(self, max_entries=512, path=None):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at INTEGER NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(command, symbol, interval, last_closed_ts, model, prompt):
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        return f"{command}|{symbol}|{interval}|{last_closed_ts}|{model}|{prompt_hash}"
+
+    def get(self, key, now_ms=None):
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now_ms < entry['expires_at']:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry['response']
+            if entry is not None:
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT response, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now_ms < row[1]:
+                    response = json.loads(row[0])
+                    self._store(key, response, row[1])
+                    self.disk_hits += 1
+                    return response
+
+            self.misses += 1
+            return None
+
+    def put(self, key, response, expires_at):
+        with self._lock:
+            self._store(key, response, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(response), expires_at)
+                )
+                # Expired rows are useless after a restart too, and the table keeps the same bound as memory
+                self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (int(time.time() * 1000),))
+                self._db.execute(
+                    "DELETE FROM responses WHERE key NOT IN "
+                    "(SELECT key FROM responses ORDER BY expires_at DESC LIMIT ?)", (self.max_entries,)
+                )
+                self._db.commit()
+
+    def _store(self, key, response, expires_at):
+        self._entries[key] = {'response': response, 'expires_at': expires_at}
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def persistent(self):
+        return self._db is not None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "persistent": self._db is not None,
+            }
+
+llm_cache = LLMResponseCache(max_entries=LLM_CACHE_SIZE, path=LLM_CACHE_PATH or None)
+llm_flights = SingleFlight()
+async_llm_flights = AsyncSingleFlight()
+
+def _cache_key(command, symbol, interval, candles, model, system_prompt, user_prompt):
+    # The frame's last row is the open candle; the answer is valid until it closes
+    last_closed_ts = int(candles.index[-2].timestamp() * 1000) if len(candles) > 1 else 0
+    expires_at = int(candles.index[-1].timestamp() * 1000) + timeframe_ms(interval)
+    key = llm_cache.make_key(command, symbol, interval, last_closed_ts, model, system_prompt + user_prompt)
+    return key, expires_at
+
+def cached_chat_completion(command, symbol, interval, candles, model, system_prompt, user_prompt, **kwargs):
+    """chat_completion, answered from the cache for repeat prompts on the same candle"""
+    key, expires_at = _cache_key(command, symbol, interval, candles, model, system_prompt, user_prompt)
+    response_data = llm_cache.get(key)
+    record_cache('llm', response_data is not None)
+    if response_data is None:
+        # Identical prompts already waiting on OpenRouter share that call
+        response_data = llm_flights.do(key, _complete, key, expires_at, model, system_prompt, user_prompt, **kwargs)
+    return response_data
+
+def _complete(key, expires_at, model, system_prompt, user_prompt, **kwargs):
+    with timed('llm_call'):
+        response_data = chat_completion(model, system_prompt, user_prompt, **kwargs)
+    if response_data.get('choices'):
+        llm_cache.put(key, response_data, expires_at)
+    return response_data
+
+async def cached_chat_completion_async(command, symbol, interval, candles, model, system_prompt, user_prompt, **kwargs):
+    """chat_completion_async, answered from the cache for repeat prompts on the same candle"""
+    key, expires_at = _cache_key(command, symbol, interval, candles, model, system_prompt, user_prompt)
+    # SQLite reads/writes go to a thread so disk latency never stalls the event loop
+    if llm_cache.persistent:
+        response_data = await asyncio.to_thread(llm_cache.get, key)
+    else:
+        response_data = llm_cache.get(key)
+    record_cache('llm', response_data is not None)
+    if response_data is None:
+        response_data = await async_llm_flights.do(key, _complete_async, key, expires_at,
+                                                   model, system_prompt, user_prompt, **kwargs)
+    return response_data
+
+async def _complete_async(key, expires_at, model, system_prompt, user_prompt, **kwargs):
+    with timed('llm_call'):
+        response_data = await chat_completion_async(model, system_prompt, user_prompt, **kwargs)
+    if response_data.get('choices'):
+        if llm_cache.persistent:
+            await asyncio.to_thread(llm_cache.put, key, response_data, expires_at)
+        else:
+            llm_cache.put(key, response_data, expires_at)
+    return response_data
+
+async def stream_cached_chat_completion(command, symbol, interval, candles, model, system_prompt, user_prompt, **kwargs):
+    """
+    Streaming cached_chat_completion_async, yields the accumulated answer text.
+
+    A cached answer is yielded once in full; otherwise the OpenRouter stream is
+    relayed and the finished answer is cached like a regular completion.
+    Identical prompts already streaming share that stream, replayed from its
+    first delta.
+    """
+    key, expires_at = _cache_key(command, symbol, interval, candles, model, system_prompt, user_prompt)
+    if llm_cache.persistent:
+        response_data = await asyncio.to_thread(llm_cache.get, key)
+    else:
+        response_data = llm_cache.get(key)
+    record_cache('llm', response_data is not None)
+    if response_data is not None:
+        yield response_data['choices'][0]['message']['content']
+        return
+
+    text = ""
+    async for delta in async_llm_flights.stream(key, _stream_async, key, expires_at,
+                                                model, system_prompt, user_prompt, **kwargs):
+        text += delta
+        yield text
+    if not text:
+        yield text
+
+async def _stream_async(key, expires_at, model, system_prompt, user_prompt, **kwargs):
+    text = ""
+    # Pulled by the flight's own task, so this times OpenRouter alone, not the readers' Discord edits
+    with timed('llm_call'):
+        async for delta in stream_chat_completion(model, system_prompt, user_prompt, **kwargs):
+            text += delta
+            yield delta
+    if not text:
+        return
+
+    response_data = {"choices": [{"message": {"role": "assistant", "content": text}}]}
+    if llm_cache.persistent:
+        await asyncio.to_thread(llm_cache.put, key, response_data, expires_at)
+    else:
+        llm_cache.put(key, response_data, expires_at)
@@ -0,0 +1,178 @@
+import asyncio
+import time
+import ccxt
+import ccxt.async_support as ccxt_async
+import numpy as np
+from config import CANDLE_CACHE_FLOAT32, CANDLE_CACHE_MAX_MB, CANDLE_STORE_DIR, KLINE_FEED, KLINE_FEED_URL, KLINE_FEED_MAX_STREAMS
+from config import EXCHANGE_WEIGHT_PER_MINUTE, EXCHANGE_INTERACTIVE_DEADLINE, EXCHANGE_BACKGROUND_DEADLINE
+from services.candle_cache import CandleCache, timeframe_ms
+from services.candle_store import CandleStore
+from services.candle_sync import MAX_FETCH_LIMIT
+from services.exchange_scheduler import (BACKGROUND, EXCHANGE_INFO_WEIGHT, INTERACTIVE, WeightScheduler,
+                                         exchange_lane, kline_weight)
+from services.kline_feed import KlineFeed
+from services.metrics import record_cache, timed
+from services.singleflight import AsyncSingleFlight, SingleFlight
+
+# Binance exchange public data, shared by the analysis services (spot markets only)
+EXCHANGE_OPTIONS = {'enableRateLimit': True, 'options': {'fetchMarkets': {'types': ['spot']}}}
+exchange = ccxt.binance(EXCHANGE_OPTIONS)
+async_exchange = ccxt_async.binance(EXCHANGE_OPTIONS)
+
+# Every request to Binance takes its weight from one budget, interactive commands first
+exchange_scheduler = WeightScheduler(EXCHANGE_WEIGHT_PER_MINUTE, deadlines={
+    INTERACTIVE: EXCHANGE_INTERACTIVE_DEADLINE,
+    BACKGROUND: EXCHANGE_BACKGROUND_DEADLINE,
+})
+
+def _klines(symbol, interval, since, limit):
+    return exchange_scheduler.call(exchange, 'fetch_ohlcv', symbol, interval, since=since, limit=limit,
+                                   weight=kline_weight(limit))
+
+async def _klines_async(symbol, interval, since, limit):
+    return await exchange_scheduler.call_async(async_exchange, 'fetch_ohlcv', symbol, interval, since=since,
+                                               limit=limit, weight=kline_weight(limit))
+
+async def load_markets_async():
+    """Binance markets, loaded once through the request scheduler"""
+    if getattr(async_exchange, 'markets', None):
+        return async_exchange.markets
+    return await exchange_scheduler.call_async(async_exchange, 'load_markets', weight=EXCHANGE_INFO_WEIGHT)
+
+# Candles are reused until the newest one closes, then synced incrementally
+candle_cache = CandleCache(max_bytes=CANDLE_CACHE_MAX_MB * 1024 * 1024,
+                           dtype=np.float32 if CANDLE_CACHE_FLOAT32 else np.float64)
+
+# Closed candles persisted on disk, so restarts and long lookbacks skip most of the refetch
+candle_store = CandleStore(CANDLE_STORE_DIR) if CANDLE_STORE_DIR else None
+
+async def _fetch_recent(symbol, interval, since, limit):
+    # Seeding and resyncs aren't what a command waits on; commands fall back to REST meanwhile
+    with exchange_lane(BACKGROUND):
+        return await _klines_async(symbol, interval, since, limit)
+
+# Live candles from Binance's kline WebSocket for the pairs in use, read without a round trip
+kline_feed = KlineFeed(KLINE_FEED_URL, _fetch_recent, capacity=MAX_FETCH_LIMIT,
+                       max_streams=KLINE_FEED_MAX_STREAMS) if KLINE_FEED else None
+
+# Concurrent cache misses for the same candles share one exchange request
+fetch_flights = SingleFlight()
+async_fetch_flights = AsyncSingleFlight()
+
+def fetch_ohlcv(symbol, interval, limit=500):
+    """Fetch OHLCV rows (blocking), served from the live feed or the candle cache when possible"""
+    with timed('exchange_fetch'):
+        if kline_feed is not None:
+            rows = kline_feed.candles(symbol, interval, limit)
+            record_cache('kline_feed', rows is not None)
+            if rows is not None:
+                return rows
+        rows = candle_cache.get(symbol, interval, limit)
+        record_cache('candles', rows is not None)
+        if rows is None:
+            rows = fetch_flights.do((symbol, interval, limit), _sync_candles, symbol, interval, limit)
+        return rows
+
+def _sync_candles(symbol, interval, limit):
+    _load_from_store(symbol, interval, limit)
+    since, fetch_limit = candle_cache.sync_plan(symbol, interval, limit)
+    fresh = _klines(symbol, interval, since, fetch_limit)
+    rows = candle_cache.merge(symbol, interval, fresh, limit, since=since)
+    _save_to_store(symbol, interval, fresh, since)
+    return rows
+
+def _load_from_store(symbol, interval, limit):
+    # A cold cache starts from the stored candles, so the sync only fetches what is newer
+    if candle_store is None or candle_cache.sync_plan(symbol, interval, limit)[0] is not None:
+        return
+    rows = candle_store.tail(exchange.id, symbol, interval, limit)
+    if len(rows) == limit:
+        candle_cache.load(symbol, interval, rows, limit)
+
+def _save_to_store(symbol, interval, rows, since=None):
+    if candle_store is None or not rows:
+        return
+    step = timeframe_ms(interval)
+    # Only append what continues the stored series; a gap is left for a history fetch to fill
+    last = candle_store.series(exchange.id, symbol, interval).last_timestamp
+    start = since if since is not None else rows[0][0]
+    if last is not None and start > last + step:
+        return
+    # Only closed candles are final
+    closed_before = int(time.time() * 1000) - step
+    closed = [row for row in rows if row[0] <= closed_before]
+    if closed:
+        candle_store.write(exchange.id, symbol, interval, closed)
+
+async def fetch_ohlcv_async(symbol, interval, limit=500, live=True):
+    """
+    Fetch OHLCV rows without blocking the event loop, served from the live feed or
+    the candle cache when possible. With live=False a pair the feed doesn't follow
+    yet isn't subscribed (one-off reads like !scan).
+    """
+    with timed('exchange_fetch'):
+        if kline_feed is not None:
+            rows = kline_feed.candles(symbol, interval, limit, track=live)
+            record_cache('kline_feed', rows is not None)
+            if rows is not None:
+                return rows
+        rows = candle_cache.get(symbol, interval, limit)
+        record_cache('candles', rows is not None)
+        if rows is None:
+            rows = await async_fetch_flights.do((symbol, interval, limit), _sync_candles_async, symbol, interval, limit)
+        return rows
+
+async def _sync_candles_async(symbol, interval, limit):
+    if candle_store is not None:
+        await asyncio.to_thread(_load_from_store, symbol, interval, limit)
+    since, fetch_limit = candle_cache.sync_plan(symbol, interval, limit)
+    fresh = await _klines_async(symbol, interval, since, fetch_limit)
+    rows = candle_cache.merge(symbol, interval, fresh, limit, since=since)
+    if candle_store is not None:
+        await asyncio.to_thread(_save_to_store, symbol, interval, fresh, since)
+    return rows
+
+async def fetch_ohlcv_history_async(symbol, interval, bars):
+    """
+    Fetch the last `bars` candles, paging through the exchange MAX_FETCH_LIMIT rows
+    at a time. Long histories are one-off reads, so they bypass the candle cache.
+    With the candle store enabled, stored candles are reused and only the
+    missing ones are fetched.
+    """
+    with timed('exchange_fetch'):
+        step = timeframe_ms(interval)
+        since = async_exchange.milliseconds() - bars * step
+        if candle_store is not None:
+            series = candle_store.series(async_exchange.id, symbol, interval)
+            first = series.first_timestamp
+            if first is not None and first <= since + step:
+                fresh_since = series.last_timestamp + step
+                fresh = await _fetch_pages(symbol, interval, fresh_since)
+                await asyncio.to_thread(_save_to_store, symbol, interval, fresh, fresh_since)
+                stored = await asyncio.to_thread(series.tail, bars)
+                rows = stored + [row for row in fresh if row[0] > stored[-1][0]]
+                return rows[-bars:]
+
+        rows = await _fetch_pages(symbol, interval, since, bars)
+        if candle_store is not None:
+            await asyncio.to_thread(_save_to_store, symbol, interval, rows, since)
+        return rows[-bars:]
+
+async def _fetch_pages(symbol, interval, since, bars=None):
+    step = timeframe_ms(interval)
+    rows = []
+    while bars is None or len(rows) < bars:
+        # Long downloads yield to interactive commands between pages
+        with exchange_lane(BACKGROUND):
+            page = await _klines_async(symbol, interval, since, MAX_FETCH_LIMIT)
+        rows.extend(row for row in page if not rows or row[0] > rows[-1][0])
+        if len(page) < MAX_FETCH_LIMIT:
+            break
+        since = page[-1][0] + step
+    return rows
+
+async def close():
+    """Stop the kline feed and release the async exchange's HTTP session"""
+    if kline_feed is not None:
+        await kline_feed.close()
+    await async_exchange.close()
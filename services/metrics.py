@@ -0,0 +1,126 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from services.tracing import span
+
+# Pipeline stages timed per command
+STAGES = ('exchange_fetch', 'indicators', 'supertrend', 'prompt_build', 'llm_call', 'discord_send')
+
+# Histogram bucket bounds in seconds: sub-ms cache reads up to slow LLM answers
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_command = contextvars.ContextVar('metrics_command', default='none')
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    """Monotonic counter per label values"""
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values, amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def value(self, *values):
+        with self._lock:
+            return self._values.get(values, 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, count in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, values)} {count}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label values, in seconds"""
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *values):
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), then sum and count
+                series = self._series[values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect_left(self.buckets, seconds)] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket in zip((*self.buckets, '+Inf'), counts):
+                    cumulative += bucket
+                    lines.append(f"{self.name}_bucket{_labels(self.labels, values, [('le', bound)])} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, values)} {total:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.labels, values)} {count}")
+        return lines
+
+stage_seconds = Histogram('bot_stage_duration_seconds', 'Time spent in one pipeline stage.', ('stage', 'command'))
+command_seconds = Histogram('bot_command_duration_seconds', 'Time from invoking a command to its last reply.', ('command',))
+errors = Counter('bot_errors_total', 'Errors raised in a pipeline stage or reported by a command.', ('stage', 'command'))
+cache_requests = Counter('bot_cache_requests_total', 'Cache lookups by cache and result.', ('cache', 'result', 'command'))
+
+def enter_command(command):
+    """Label stages timed from here on (including threads and tasks started after) with `command`"""
+    return _command.set(command)
+
+def exit_command(token):
+    _command.reset(token)
+
+@contextmanager
+def command_scope(command):
+    """Stages timed inside the block are labelled with `command`"""
+    token = enter_command(command)
+    try:
+        yield
+    finally:
+        exit_command(token)
+
+@contextmanager
+def timed(stage):
+    """
+    Time the block into the stage histogram (and as a span of the open trace);
+    an exception leaving it counts as that stage's error
+    """
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    except Exception:
+        errors.inc(stage, _command.get())
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage, _command.get())
+
+def record_cache(cache, hit):
+    cache_requests.inc(cache, 'hit' if hit else 'miss', _command.get())
+
+def render():
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in (command_seconds, stage_seconds, errors, cache_requests):
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,298 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+import numpy as np
+from config import MTF_BASE_BARS, MTF_BASE_INTERVAL, MTF_MAX_SYMBOLS
+from services import market_data
+from services.candle_cache import timeframe_ms
+from services.indicator_frame import FRAME_LIMIT, IndicatorFrame
+from services.metrics import timed
+from services.singleflight import AsyncSingleFlight
+from services.supertrend import calculate_supertrend_arrays
+
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+HIGHER_TIMEFRAMES = ('1h', '4h', '1d')
+
+# Trend read per timeframe: the !trendsignal EMA cloud and Supertrend defaults
+FAST_EMA, SLOW_EMA, RSI_LENGTH = 21, 55, 14
+SUPERTREND_PERIOD, SUPERTREND_MULTIPLIER = 10, 3.0
+# Candles before the slow EMA has forgotten its seed
+WARM_BARS = 3 * SLOW_EMA
+
+def _columns(rows):
+    data = np.asarray(rows, dtype=np.float64).reshape(-1, len(COLUMNS))
+    columns = {name: data[:, i].copy() for i, name in enumerate(COLUMNS)}
+    columns['timestamp'] = columns['timestamp'].astype(np.int64)
+    return columns
+
+def aggregate(columns, step):
+    """OHLCV column arrays bucketed into `step`-ms candles aligned to UTC, like Binance's klines"""
+    ts = columns['timestamp']
+    if len(ts) == 0:
+        return {name: values[:0] for name, values in columns.items()}
+    keys = ts - ts % step
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    ends = np.concatenate((starts[1:], [len(ts)])) - 1
+    return {
+        'timestamp': keys[starts],
+        'open': columns['open'][starts],
+        'high': np.maximum.reduceat(columns['high'], starts),
+        'low': np.minimum.reduceat(columns['low'], starts),
+        'close': columns['close'][ends],
+        'volume': np.add.reduceat(columns['volume'], starts),
+    }
+
+class TimeframeCandles:
+    """
+    Candles of one timeframe as NumPy column arrays, oldest first. The first
+    `closed` are final; a last one past that is still forming.
+    """
+
+    def __init__(self, interval, columns, closed):
+        self.interval = interval
+        self.columns = columns
+        self.closed = closed
+
+    def __len__(self):
+        return len(self.columns['timestamp'])
+
+    @property
+    def forming(self):
+        return len(self) > self.closed
+
+    def frame(self):
+        return IndicatorFrame.from_columns(self.columns)
+
+class MultiTimeframeSeries:
+    """
+    One base series of a symbol and the higher-timeframe candles built from it.
+
+    Merging base rows only rebuilds the higher-timeframe candles they fall in
+    (usually just the forming one). The base is trimmed at a boundary of the
+    largest timeframe, so every higher-timeframe candle is built from complete
+    base data except the forming one.
+    """
+
+    def __init__(self, base_interval, timeframes=HIGHER_TIMEFRAMES, capacity=MTF_BASE_BARS):
+        self.base_interval = base_interval
+        self.base_step = timeframe_ms(base_interval)
+        self.steps = {interval: timeframe_ms(interval) for interval in timeframes}
+        for interval, step in self.steps.items():
+            if step <= self.base_step or step % self.base_step:
+                raise ValueError(f"{interval} candles can't be built from {base_interval} candles")
+        self.capacity = capacity
+        self.base = _columns([])
+        self.higher = {interval: _columns([]) for interval in timeframes}
+        self._lock = threading.Lock()
+
+    @property
+    def last_timestamp(self):
+        ts = self.base['timestamp']
+        return int(ts[-1]) if len(ts) else None
+
+    def __len__(self):
+        return len(self.base['timestamp'])
+
+    def merge(self, rows):
+        """Append base rows newer than the series and replace the forming one, returns the number applied"""
+        fresh = _columns(rows)
+        with self._lock:
+            last = self.last_timestamp
+            if last is not None:
+                keep = fresh['timestamp'] >= last
+                fresh = {name: values[keep] for name, values in fresh.items()}
+            if len(fresh['timestamp']) == 0:
+                return 0
+            start = np.searchsorted(self.base['timestamp'], fresh['timestamp'][0])
+            base = {name: np.concatenate((self.base[name][:start], fresh[name])) for name in COLUMNS}
+            trimmed = self._trim(base)
+            self.base = base
+            for interval, step in self.steps.items():
+                self.higher[interval] = self._rebuild(self.higher[interval], step, base, start, trimmed)
+            return len(fresh['timestamp'])
+
+    def _trim(self, base):
+        # Drop the oldest base candles past capacity (and, on the first merge, before the first
+        # boundary) up to a boundary of the largest timeframe, so no candle is left half built
+        largest = max(self.steps.values())
+        ts = base['timestamp']
+        cut = max(len(ts) - self.capacity, 0)
+        aligned = np.flatnonzero(ts[cut:] % largest == 0)
+        if len(aligned):
+            cut += int(aligned[0])
+        if cut:
+            for name in COLUMNS:
+                base[name] = base[name][cut:]
+        return cut
+
+    @staticmethod
+    def _rebuild(candles, step, base, start, trimmed):
+        ts = base['timestamp']
+        if len(ts) == 0:
+            return _columns([])
+        if trimmed:
+            # The front moved (first merge, or about once per largest candle at capacity): rebuild the lot
+            return aggregate(base, step)
+        # Keep the candles before the one the first new base row falls in, rebuild from there
+        first = ts[start] - ts[start] % step if start < len(ts) else ts[-1] - ts[-1] % step
+        kept = np.searchsorted(candles['timestamp'], first)
+        offset = np.searchsorted(ts, first)
+        tail = aggregate({name: base[name][offset:] for name in COLUMNS}, step)
+        return {name: np.concatenate((candles[name][:kept], tail[name])) for name in COLUMNS}
+
+    def candles(self, interval, now_ms=None):
+        """TimeframeCandles of the base interval or one of the higher timeframes"""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        with self._lock:
+            if interval == self.base_interval:
+                columns, step = self.base, self.base_step
+            else:
+                columns, step = self.higher[interval], self.steps[interval]
+            last = self.last_timestamp
+        if last is None:
+            return TimeframeCandles(interval, columns, 0)
+        # A candle is final once its period has passed and the base covers all of it
+        covered = min(now_ms, last + self.base_step)
+        closed = int(np.searchsorted(columns['timestamp'] + step, covered, side='right'))
+        return TimeframeCandles(interval, columns, closed)
+
+    @property
+    def timeframes(self):
+        return (self.base_interval, *self.steps)
+
+class MultiTimeframeEngine:
+    """
+    MultiTimeframeSeries per symbol, least recently used ones evicted.
+
+    The first request for a symbol downloads `capacity` base candles; after
+    that each request is one regular candle fetch (usually a candle cache or
+    kline feed hit) merged into the series.
+    """
+
+    def __init__(self, base_interval=MTF_BASE_INTERVAL, capacity=MTF_BASE_BARS, max_symbols=MTF_MAX_SYMBOLS):
+        self.base_interval = base_interval
+        self.capacity = capacity
+        self.max_symbols = max_symbols
+        self._series = OrderedDict()
+        self._flights = AsyncSingleFlight()
+        self.history_fetches = 0
+        self.updates = 0
+
+    async def get(self, symbol):
+        """The symbol's series, brought up to date with the latest base candles"""
+        return await self._flights.do(symbol, self._refresh, symbol)
+
+    async def _refresh(self, symbol):
+        series = self._series.get(symbol)
+        step = timeframe_ms(self.base_interval)
+        now_ms = int(time.time() * 1000)
+        if series is None or (now_ms - series.last_timestamp) // step >= FRAME_LIMIT - 1:
+            # New symbol, or idle for longer than one fetch can catch up on
+            rows = await market_data.fetch_ohlcv_history_async(symbol, self.base_interval, self.capacity)
+            series = MultiTimeframeSeries(self.base_interval, capacity=self.capacity)
+            await asyncio.to_thread(series.merge, rows)
+            self.history_fetches += 1
+        else:
+            rows = await market_data.fetch_ohlcv_async(symbol, self.base_interval, limit=FRAME_LIMIT)
+            await asyncio.to_thread(series.merge, rows)
+            self.updates += 1
+        self._series[symbol] = series
+        self._series.move_to_end(symbol)
+        while len(self._series) > self.max_symbols:
+            self._series.popitem(last=False)
+        return series
+
+    def stats(self):
+        return {
+            "base_interval": self.base_interval,
+            "symbols": len(self._series),
+            "base_candles": sum(len(series) for series in self._series.values()),
+            "history_fetches": self.history_fetches,
+            "updates": self.updates,
+        }
+
+mtf_engine = MultiTimeframeEngine()
+
+def timeframe_trend(candles):
+    """Supertrend, EMA cloud and RSI of the newest candle (forming one included), as a dict"""
+    if len(candles) < 3:
+        return None
+    frame = candles.frame()
+    columns = candles.columns
+    _, direction = calculate_supertrend_arrays(columns['high'], columns['low'], columns['close'],
+                                               period=SUPERTREND_PERIOD, multiplier=SUPERTREND_MULTIPLIER)
+    fast = frame.ema(FAST_EMA).iloc[-1]
+    slow = frame.ema(SLOW_EMA).iloc[-1]
+    supertrend_up = direction[-1] > 0
+    cloud_up = fast > slow if not np.isnan(slow) else None
+    if cloud_up is None:
+        trend = 'Bullish' if supertrend_up else 'Bearish'
+    elif supertrend_up == cloud_up:
+        trend = 'Bullish' if supertrend_up else 'Bearish'
+    else:
+        trend = 'Mixed'
+    return {
+        "trend": trend,
+        "supertrend_up": bool(supertrend_up),
+        "cloud_up": cloud_up,
+        "rsi": frame.rsi(RSI_LENGTH).iloc[-1],
+        "close": columns['close'][-1],
+        "candles": len(candles),
+        "warm": len(candles) >= WARM_BARS,
+        "forming": candles.forming,
+    }
+
+def compute_mtf_trends(series):
+    """{interval: timeframe_trend} for the base interval and every higher timeframe"""
+    with timed('indicators'):
+        now_ms = int(time.time() * 1000)
+        return {interval: timeframe_trend(series.candles(interval, now_ms)) for interval in series.timeframes}
+
+def format_mtf_report(asset, series, trends):
+    """Render the !mtf report"""
+    icons = {'Bullish': '🟢', 'Bearish': '🔴', 'Mixed': '⚪'}
+    lines = [f"🧭 **Multi-Timeframe Trend for {asset.upper()}**", "--------------------------"]
+    for interval, trend in trends.items():
+        if trend is None:
+            lines.append(f"• **{interval}**: ⚠️ Not enough candles")
+            continue
+        line = (f"• **{interval}**: {icons[trend['trend']]} {trend['trend']} • Supertrend {'▲' if trend['supertrend_up'] else '▼'}"
+                f" • EMA {FAST_EMA}/{SLOW_EMA} {'—' if trend['cloud_up'] is None else '▲' if trend['cloud_up'] else '▼'}"
+                f" • RSI {'—' if np.isnan(trend['rsi']) else format(trend['rsi'], '.1f')}")
+        if not trend['warm']:
+            line += f" • ⚠️ only {trend['candles']} candles, EMA {SLOW_EMA} still warming up"
+        lines.append(line)
+
+    known = [t['trend'] for t in trends.values() if t is not None]
+    bullish, bearish = known.count('Bullish'), known.count('Bearish')
+    if known and bullish == len(known):
+        alignment = "✅ Aligned bullish on every timeframe"
+    elif known and bearish == len(known):
+        alignment = "✅ Aligned bearish on every timeframe"
+    else:
+        alignment = f"↔️ {bullish} bullish, {bearish} bearish, {len(known) - bullish - bearish} mixed"
+    base = series.candles(series.base_interval)
+    first = datetime.fromtimestamp(base.columns['timestamp'][0] / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+    lines += [
+        "",
+        f"**🎯 Alignment**: {alignment}",
+        f"• **Current Price**: ${base.columns['close'][-1]:.2f}",
+        "",
+        f"*{len(base)} {series.base_interval} candles since {first}, higher timeframes built from them "
+        f"• the newest candle of each timeframe counts while still forming • Generated at {datetime.now().strftime('%H:%M:%S')}*",
+    ]
+    return "\n".join(lines)
+
+async def get_mtf_analysis_async(asset="BTC/USDT"):
+    """Trend on the base interval and every higher timeframe of `asset`, from its one base series"""
+    try:
+        symbol = f"{asset.upper()}"
+        series = await mtf_engine.get(symbol)
+        if len(series) == 0:
+            return f"❌ No {mtf_engine.base_interval} candles for {symbol}"
+        trends = await asyncio.to_thread(compute_mtf_trends, series)
+        return format_mtf_report(symbol, series, trends)
+    except Exception as e:
+        return f"❌ Error in multi-timeframe analysis: {str(e)}"
@@ -0,0 +1,307 @@
+import asyncio
+import json
+import random
+import threading
+import time
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from config import (OPENROUTER_API_KEY, OPENROUTER_BASE_URL, OPENROUTER_CONNECT_TIMEOUT,
+                    OPENROUTER_READ_TIMEOUT, OPENROUTER_MAX_RETRIES)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class OpenRouterError(Exception):
+    pass
+
+class CircuitOpenError(OpenRouterError):
+    pass
+
+class CircuitBreaker:
+    """
+    Stops calling OpenRouter after repeated failures.
+
+    After failure_threshold consecutive failures the circuit opens and calls fail
+    fast for reset_timeout seconds. Then a single trial call is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            # One trial at a time; a trial that never reported back doesn't block forever
+            now = time.monotonic()
+            if state == "half-open" and (self._trial_started is None
+                                         or now - self._trial_started >= self.reset_timeout):
+                self._trial_started = now
+                return
+            raise CircuitOpenError("OpenRouter circuit is open after repeated failures, try again shortly")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_started is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_started = None
+
+class OpenRouterClient:
+    """
+    Chat completions client shared by every signal command.
+
+    Connections are pooled and kept alive (a requests.Session for blocking calls,
+    an aiohttp session for the event loop). Every request has connect/read
+    timeouts. 429/5xx responses and connection errors are retried with jittered
+    exponential backoff (honouring Retry-After), behind a circuit breaker that
+    counts a call as one success or failure once its retries are over.
+    """
+
+    def __init__(self, base_url=OPENROUTER_BASE_URL, api_key=OPENROUTER_API_KEY,
+                 connect_timeout=OPENROUTER_CONNECT_TIMEOUT, read_timeout=OPENROUTER_READ_TIMEOUT,
+                 max_retries=OPENROUTER_MAX_RETRIES, backoff_base=0.5, backoff_cap=8.0,
+                 pool_size=16, breaker=None):
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.api_key = api_key
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._async_session = None
+
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+
+    def _payload(self, model, system_prompt, user_prompt, temperature, max_tokens, stream=False):
+        payload = {
+            "model": model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": user_prompt
+                }
+            ],
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_cap)
+            except ValueError:
+                pass
+        # Full jitter: spreads retries of concurrent callers apart
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def chat_completion(self, model, system_prompt, user_prompt, temperature=0.7, max_tokens=600):
+        """Blocking chat completion, returns the decoded JSON"""
+        body = json.dumps(self._payload(model, system_prompt, user_prompt, temperature, max_tokens))
+        self.breaker.allow()
+        for attempt in range(self.max_retries + 1):
+            self.requests += 1
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self._session.post(self.url, headers=self._headers(), data=body,
+                                              timeout=(self.connect_timeout, self.read_timeout))
+            except requests.RequestException as e:
+                if last_attempt:
+                    self._record_failure()
+                    raise OpenRouterError(f"OpenRouter request failed: {e}") from e
+                self.retries += 1
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if response.status_code in RETRY_STATUSES and not last_attempt:
+                self.retries += 1
+                time.sleep(self._backoff(attempt, response.headers.get("Retry-After")))
+                continue
+            self._record_result(response.status_code)
+            return _decode(response.text, response.status_code)
+
+    async def chat_completion_async(self, model, system_prompt, user_prompt, temperature=0.7, max_tokens=600):
+        """Chat completion from the event loop, returns the decoded JSON"""
+        session = self._get_async_session()
+        body = json.dumps(self._payload(model, system_prompt, user_prompt, temperature, max_tokens))
+        self.breaker.allow()
+        for attempt in range(self.max_retries + 1):
+            self.requests += 1
+            last_attempt = attempt == self.max_retries
+            try:
+                async with session.post(self.url, headers=self._headers(), data=body) as response:
+                    text = await response.text()
+                    status, retry_after = response.status, response.headers.get("Retry-After")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if last_attempt:
+                    self._record_failure()
+                    raise OpenRouterError(f"OpenRouter request failed: {e!r}") from e
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+                continue
+
+            if status in RETRY_STATUSES and not last_attempt:
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+                continue
+            self._record_result(status)
+            return _decode(text, status)
+
+    async def stream_chat_completion(self, model, system_prompt, user_prompt, temperature=0.7, max_tokens=600):
+        """
+        Streamed chat completion (SSE), yields content deltas as they arrive.
+
+        Retries only happen before the first byte of the answer; once text has
+        been yielded a broken stream raises OpenRouterError.
+        """
+        session = self._get_async_session()
+        body = json.dumps(self._payload(model, system_prompt, user_prompt, temperature, max_tokens, stream=True))
+        started = False
+        self.breaker.allow()
+        for attempt in range(self.max_retries + 1):
+            self.requests += 1
+            last_attempt = attempt == self.max_retries
+            try:
+                async with session.post(self.url, headers=self._headers(), data=body) as response:
+                    if response.status in RETRY_STATUSES and not last_attempt:
+                        self.retries += 1
+                        retry_after = response.headers.get("Retry-After")
+                        await asyncio.sleep(self._backoff(attempt, retry_after))
+                        continue
+                    if response.status != 200:
+                        self._record_result(response.status)
+                        error = _decode(await response.text(), response.status).get("error", {})
+                        raise OpenRouterError(f"OpenRouter error {response.status}: {error.get('message', error)}")
+
+                    async for line in response.content:
+                        delta = _sse_delta(line)
+                        if delta is None:
+                            break
+                        if delta:
+                            started = True
+                            yield delta
+                # Only a stream read to its end is a success; a broken one is counted below instead
+                self.breaker.record_success()
+                return
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if started:
+                    self._record_failure()
+                    raise OpenRouterError(f"OpenRouter stream interrupted: {e!r}") from e
+                if last_attempt:
+                    self._record_failure()
+                    raise OpenRouterError(f"OpenRouter request failed: {e!r}") from e
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+
+    def _record_failure(self):
+        # Once per call, after its retries: one failed command is one failure for the breaker
+        self.failures += 1
+        self.breaker.record_failure()
+
+    def _record_result(self, status):
+        if status in RETRY_STATUSES:
+            self._record_failure()
+        else:
+            self.breaker.record_success()
+
+    def _get_async_session(self):
+        if self._async_session is None or self._async_session.closed:
+            self._async_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout),
+            )
+        return self._async_session
+
+    async def close(self):
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
+        self._async_session = None
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "circuit": self.breaker.state,
+        }
+
+def _decode(text, status):
+    # Error bodies are passed back as-is so callers can show them, like before
+    try:
+        return json.loads(text)
+    except ValueError:
+        return {"error": {"code": status, "message": text[:500]}}
+
+def _sse_delta(line):
+    # One SSE line -> content delta ("" for keep-alives/comments, None at [DONE])
+    line = line.decode("utf-8").strip()
+    if not line.startswith("data:"):
+        return ""
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return None
+    chunk = json.loads(data)
+    if "error" in chunk:
+        raise OpenRouterError(f"OpenRouter stream error: {chunk['error'].get('message', chunk['error'])}")
+    choices = chunk.get("choices") or [{}]
+    return choices[0].get("delta", {}).get("content") or ""
+
+client = OpenRouterClient()
+
+def chat_completion(model, system_prompt, user_prompt, temperature=0.7, max_tokens=600):
+    """Call the OpenRouter chat completions API (blocking), returns the decoded JSON"""
+    return client.chat_completion(model, system_prompt, user_prompt, temperature, max_tokens)
+
+async def chat_completion_async(model, system_prompt, user_prompt, temperature=0.7, max_tokens=600):
+    """Call the OpenRouter chat completions API from the event loop, returns the decoded JSON"""
+    return await client.chat_completion_async(model, system_prompt, user_prompt, temperature, max_tokens)
+
+def stream_chat_completion(model, system_prompt, user_prompt, temperature=0.7, max_tokens=600):
+    """Stream an OpenRouter chat completion, async iterator of content deltas"""
+    return client.stream_chat_completion(model, system_prompt, user_prompt, temperature, max_tokens)
+
+async def close():
+    """Release the pooled HTTP session"""
+    await client.close()
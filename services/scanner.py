@@ -0,0 +1,125 @@
+import asyncio
+import time
+from datetime import datetime
+import ccxt
+from config import SCAN_CONCURRENCY
+from services import market_data
+from services.exchange_scheduler import BACKGROUND, exchange_lane
+from services.indicator_frame import FRAME_LIMIT, IndicatorFrame
+from services.supertrend import compute_advanced_technical_analysis
+
+CONFIDENCE_RANK = {'High': 3, 'Medium': 2, 'Low': 1}
+
+async def list_active_pairs_async(quote="USDT"):
+    """Symbols of every active spot market quoted in `quote` (markets are loaded once by ccxt)"""
+    markets = await market_data.load_markets_async()
+    quote = quote.upper()
+    return sorted(symbol for symbol, market in markets.items()
+                  if market.get('spot') and market.get('active') and market.get('quote') == quote)
+
+async def _fetch_with_backoff(symbol, interval, retries=2):
+    # Requests are already budgeted; this only backs off if Binance still pushes back or the budget runs out
+    for attempt in range(retries + 1):
+        try:
+            return await market_data.fetch_ohlcv_async(symbol, interval, limit=FRAME_LIMIT, live=False)
+        except (ccxt.RateLimitExceeded, ccxt.DDoSProtection):
+            if attempt == retries:
+                raise
+            await asyncio.sleep(2 ** attempt)
+
+def _scan_candles(symbol, ohlcv, **kwargs):
+    df, analysis = compute_advanced_technical_analysis(IndicatorFrame(ohlcv), **kwargs)
+    if analysis['signal'] == 'No Signal':
+        return None
+    details = analysis['details']
+    return {
+        'symbol': symbol,
+        'signal': analysis['signal'],
+        'confidence': analysis['confidence'],
+        'entry_price': analysis['entry_price'],
+        'stop_loss': analysis['stop_loss'],
+        'take_profit': analysis['take_profit'],
+        'rsi': details['rsi'],
+        # ATR relative to its average: how strongly volatility is expanding
+        'volatility_ratio': details['atr'] / details['atr_sma'] if details['atr_sma'] else 0.0,
+    }
+
+async def scan_market_async(interval="15m", quote="USDT", concurrency=SCAN_CONCURRENCY, **kwargs):
+    """
+    Run the multi-filter strategy over every active pair quoted in `quote`
+
+    Candle fetches run concurrently (at most `concurrency` in flight, paced by
+    the exchange scheduler's background lane) and go through the shared candle cache, so a rescan
+    only pulls the newest candles. Keyword arguments are the strategy
+    parameters of compute_advanced_technical_analysis.
+    """
+    started = time.perf_counter()
+    await market_data.load_markets_async()
+    if interval not in market_data.async_exchange.timeframes:
+        raise ValueError(f"Unsupported interval: {interval}")
+
+    symbols = await list_active_pairs_async(quote)
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = []
+
+    async def scan_one(symbol):
+        try:
+            async with semaphore:
+                ohlcv = await _fetch_with_backoff(symbol, interval)
+            if len(ohlcv) < 3:
+                return None
+            # Indicator math runs in a worker thread while other fetches are in flight
+            return await asyncio.to_thread(_scan_candles, symbol, ohlcv, **kwargs)
+        except Exception as e:
+            errors.append((symbol, str(e)))
+            return None
+
+    # Scans queue behind interactive commands for exchange weight
+    with exchange_lane(BACKGROUND):
+        results = [r for r in await asyncio.gather(*(scan_one(s) for s in symbols)) if r is not None]
+    results.sort(key=lambda r: (CONFIDENCE_RANK[r['confidence']], r['volatility_ratio']), reverse=True)
+
+    return {
+        'interval': interval,
+        'quote': quote.upper(),
+        'scanned': len(symbols),
+        'errors': errors,
+        'results': results,
+        'elapsed': time.perf_counter() - started,
+    }
+
+def _fmt_price(value):
+    return f"{value:.8g}"
+
+def format_scan_results(scan, limit=10):
+    """Render the !scan message, strongest signals first"""
+    buys = [r for r in scan['results'] if r['signal'] == 'Buy']
+    sells = [r for r in scan['results'] if r['signal'] == 'Sell']
+
+    lines = [
+        f"🔎 **Market Scan • {scan['quote']} pairs • {scan['interval']}**",
+        "--------------------------",
+    ]
+    for title, emoji, rows in (("Buy", "🟢", buys), ("Sell", "🔴", sells)):
+        lines.append(f"\n{emoji} **{title} signals ({len(rows)})**")
+        if not rows:
+            lines.append("• None")
+        for r in rows[:limit]:
+            lines.append(f"• **{r['symbol']}** ({r['confidence']}) @ ${_fmt_price(r['entry_price'])} "
+                         f"| SL ${_fmt_price(r['stop_loss'])} | TP ${_fmt_price(r['take_profit'])} "
+                         f"| RSI {r['rsi']:.1f}")
+        if len(rows) > limit:
+            lines.append(f"• ...and {len(rows) - limit} more")
+
+    footer = f"\n*Scanned {scan['scanned']} pairs in {scan['elapsed']:.1f}s"
+    if scan['errors']:
+        footer += f" ({len(scan['errors'])} failed)"
+    lines.append(footer + f" • {datetime.now().strftime('%H:%M:%S')}*")
+    return "\n".join(lines)
+
+async def get_market_scan_async(interval="15m", quote="USDT", **kwargs):
+    try:
+        scan = await scan_market_async(interval, quote, **kwargs)
+        return format_scan_results(scan)
+    except Exception as e:
+        return f"❌ Error scanning market: {str(e)}"
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+
+class SingleFlight:
+    """
+    Coalesces concurrent blocking calls: while a call for `key` is running,
+    other threads asking for the same key wait for it and share its result
+    (or exception) instead of running their own.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'done': threading.Event(), 'result': None, 'error': None}
+                self._calls[key] = call
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn(*args, **kwargs)
+            return call['result']
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+    def stats(self):
+        return {"executions": self.executions, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+class _SharedStream:
+    """Items of one async iterator as they arrive, replayed from the first to any number of readers"""
+
+    def __init__(self):
+        self.items = []
+        self.done = False
+        self.error = None
+        self.task = None
+        self._changed = asyncio.Condition()
+
+    async def pump(self, iterator):
+        try:
+            async for item in iterator:
+                async with self._changed:
+                    self.items.append(item)
+                    self._changed.notify_all()
+        except BaseException as e:
+            self.error = e
+            # Readers get the error; only cancellation (loop shutdown) propagates from the task itself
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def replay(self):
+        read = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.done or len(self.items) > read)
+                items, done = self.items[read:], self.done
+            for item in items:
+                yield item
+            read += len(items)
+            if done:
+                break
+        if self.error is not None:
+            raise self.error
+
+class AsyncSingleFlight:
+    """
+    Coalesces concurrent coroutines on the event loop: callers awaiting the same
+    key share one task. The task is shielded, so a caller being cancelled does
+    not cancel the work for the others. stream() does the same for async
+    iterators.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._streams = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn, *args, **kwargs):
+        task = self._tasks.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            self._tasks[key] = task
+            self.executions += 1
+            task.add_done_callback(lambda done: self._tasks.pop(key) if self._tasks.get(key) is done else None)
+        return await asyncio.shield(task)
+
+    async def stream(self, key, fn, *args, **kwargs):
+        """
+        Iterate fn(*args, **kwargs) once for every concurrent caller of `key`.
+
+        The first caller's iterator is pulled by a task of its own; every caller,
+        including one arriving mid-stream, gets all its items from the first. A
+        caller that stops reading doesn't stop the stream for the others.
+        """
+        shared = self._streams.get(key)
+        if shared is not None:
+            self.coalesced += 1
+        else:
+            shared = _SharedStream()
+            self._streams[key] = shared
+            self.executions += 1
+            shared.task = asyncio.ensure_future(shared.pump(fn(*args, **kwargs)))
+            shared.task.add_done_callback(
+                lambda done: self._streams.pop(key) if self._streams.get(key) is shared else None)
+        async for item in shared.replay():
+            yield item
+
+    def stats(self):
+        return {"executions": self.executions, "coalesced": self.coalesced,
+                "in_flight": len(self._tasks) + len(self._streams)}
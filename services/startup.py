@@ -0,0 +1,88 @@
+import asyncio
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from config import PRELOAD_INTERVALS, PRELOAD_PAIRS
+
+# Modules behind the commands; most of their import time is ccxt, pandas and ta
+SERVICE_MODULES = ('services.market_data', 'services.analytic', 'services.supertrend', 'services.scanner',
+                   'services.backtest', 'services.alerts', 'services.multi_timeframe')
+
+class StartupTimer:
+    """When each startup milestone was reached (seconds since the bot module loaded) and how long each step took"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.milestones = {}
+        self.steps = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name):
+        """Record the first time `name` is reached"""
+        with self._lock:
+            self.milestones.setdefault(name, round(time.perf_counter() - self.started, 3))
+
+    @contextmanager
+    def step(self, name, milestone=True):
+        """Time the block as step `name`, and mark its end as a milestone"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.steps[name] = round(time.perf_counter() - start, 3)
+            if milestone:
+                self.mark(name)
+
+    def stats(self):
+        with self._lock:
+            return {"milestones": dict(self.milestones), "steps": dict(self.steps)}
+
+    def summary(self):
+        with self._lock:
+            return " • ".join(f"{name} {seconds:.2f}s" for name, seconds in self.milestones.items())
+
+startup = StartupTimer()
+_import_lock = threading.Lock()
+
+def import_services():
+    """Import every service module (blocking); callers arriving mid-import wait for it to finish"""
+    with _import_lock:
+        for name in SERVICE_MODULES:
+            if name not in sys.modules:
+                with startup.step(f"import {name}", milestone=False):
+                    importlib.import_module(name)
+        startup.mark('services_imported')
+
+def import_services_in_background():
+    """Start the service imports on a thread, so the Discord login doesn't wait for them"""
+    threading.Thread(target=import_services, name='startup-imports', daemon=True).start()
+
+def services_imported():
+    return 'services_imported' in startup.milestones
+
+async def preload(pairs=PRELOAD_PAIRS, intervals=PRELOAD_INTERVALS):
+    """
+    Load Binance's markets and the candles of the most used pairs, as
+    background exchange work, so the first commands after a restart find
+    them cached instead of paying for them
+    """
+    from services import market_data
+    from services.exchange_scheduler import BACKGROUND, exchange_lane
+    from services.indicator_frame import FRAME_LIMIT
+
+    with exchange_lane(BACKGROUND):
+        try:
+            with startup.step('preload_markets'):
+                await market_data.load_markets_async()
+        except Exception as e:
+            print(f"⚠️ Market preload failed: {e!r}")
+        with startup.step('preload_candles'):
+            results = await asyncio.gather(*(market_data.fetch_ohlcv_async(pair, interval, limit=FRAME_LIMIT)
+                                             for pair in pairs for interval in intervals), return_exceptions=True)
+    failed = [r for r in results if isinstance(r, Exception)]
+    if failed:
+        print(f"⚠️ Candle preload failed for {len(failed)}/{len(results)} pairs: {failed[0]!r}")
+    startup.mark('warm')
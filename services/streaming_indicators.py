@@ -0,0 +1,257 @@
+import bisect
+import math
+import threading
+from collections import OrderedDict, deque
+
+NAN = float('nan')
+
+class StreamingEMA:
+    """EMA updated one value at a time, same seeding and warm-up as ta's EMAIndicator"""
+
+    def __init__(self, window):
+        self.window = window
+        self.alpha = 2.0 / (window + 1)
+        self.count = 0
+        self.ema = None
+
+    def _next(self, x):
+        return x if self.ema is None else (1 - self.alpha) * self.ema + self.alpha * x
+
+    def update(self, x):
+        self.ema = self._next(x)
+        self.count += 1
+        return self.value
+
+    def peek(self, x):
+        """The value update(x) would return, without changing the state"""
+        return self._next(x) if self.count + 1 >= self.window else NAN
+
+    @property
+    def value(self):
+        return self.ema if self.count >= self.window else NAN
+
+class StreamingRSI:
+    """Wilder RSI, matching ta's RSIIndicator (the first bar counts as a zero move)"""
+
+    def __init__(self, window=14):
+        self.window = window
+        self.alpha = 1.0 / window
+        self.count = 0
+        self.prev_close = None
+        self.avg_up = None
+        self.avg_down = None
+
+    def _next(self, close):
+        diff = close - self.prev_close if self.prev_close is not None else 0.0
+        up = diff if diff > 0 else 0.0
+        down = -diff if diff < 0 else 0.0
+        if self.avg_up is None:
+            return up, down
+        return (1 - self.alpha) * self.avg_up + self.alpha * up, (1 - self.alpha) * self.avg_down + self.alpha * down
+
+    def update(self, close):
+        self.avg_up, self.avg_down = self._next(close)
+        self.prev_close = close
+        self.count += 1
+        return self.value
+
+    def peek(self, close):
+        """The value update(close) would return, without changing the state"""
+        return self._rsi(self.count + 1, *self._next(close))
+
+    @property
+    def value(self):
+        return self._rsi(self.count, self.avg_up, self.avg_down)
+
+    def _rsi(self, count, avg_up, avg_down):
+        if count < self.window:
+            return NAN
+        if avg_down == 0:
+            return 100.0
+        return 100 - 100 / (1 + avg_up / avg_down)
+
+class StreamingMACD:
+    """MACD line, signal and histogram, matching ta's MACD"""
+
+    def __init__(self, window_fast=12, window_slow=26, window_sign=9):
+        self.fast = StreamingEMA(window_fast)
+        self.slow = StreamingEMA(window_slow)
+        self.signal = StreamingEMA(window_sign)
+
+    def update(self, close):
+        self.fast.update(close)
+        self.slow.update(close)
+        macd = self.fast.value - self.slow.value
+        # The signal EMA only starts once the MACD line itself is defined
+        if not math.isnan(macd):
+            self.signal.update(macd)
+        return self.value
+
+    def peek(self, close):
+        """The value update(close) would return, without changing the state"""
+        macd = self.fast.peek(close) - self.slow.peek(close)
+        signal = self.signal.value if math.isnan(macd) else self.signal.peek(macd)
+        return macd, signal, macd - signal
+
+    @property
+    def value(self):
+        macd = self.fast.value - self.slow.value
+        signal = self.signal.value
+        return macd, signal, macd - signal
+
+class StreamingBollinger:
+    """Bollinger Bands over a rolling window with population std, matching ta's BollingerBands"""
+
+    def __init__(self, window=20, window_dev=2):
+        self.window = window
+        self.window_dev = window_dev
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.updates = 0
+
+    def update(self, close):
+        if len(self.values) == self.window:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(close)
+        self.total += close
+        self.total_sq += close * close
+        self.updates += 1
+        # Re-sum once per full window so running-sum rounding never accumulates
+        if self.updates % self.window == 0:
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(v * v for v in self.values)
+        return self.value
+
+    def peek(self, close):
+        """The value update(close) would return, without changing the state"""
+        if len(self.values) + 1 < self.window:
+            return NAN, NAN, NAN
+        total, total_sq = self.total + close, self.total_sq + close * close
+        # The window is full already: the oldest value drops out
+        if len(self.values) == self.window:
+            old = self.values[0]
+            total, total_sq = total - old, total_sq - old * old
+        return self._bands(total, total_sq)
+
+    @property
+    def value(self):
+        if len(self.values) < self.window:
+            return NAN, NAN, NAN
+        return self._bands(self.total, self.total_sq)
+
+    def _bands(self, total, total_sq):
+        mavg = total / self.window
+        var = max(total_sq / self.window - mavg * mavg, 0.0)
+        std = math.sqrt(var)
+        return mavg + self.window_dev * std, mavg, mavg - self.window_dev * std
+
+class StreamingATR:
+    """Wilder ATR, matching ta's AverageTrueRange (0 during warm-up, SMA seed)"""
+
+    def __init__(self, window=14):
+        self.window = window
+        self.count = 0
+        self.prev_close = None
+        self.seed_total = 0.0
+        self.atr = 0.0
+
+    def update(self, high, low, close):
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.count += 1
+        if self.count < self.window:
+            self.seed_total += tr
+        elif self.count == self.window:
+            self.atr = (self.seed_total + tr) / self.window
+        else:
+            self.atr = (self.atr * (self.window - 1) + tr) / self.window
+        self.prev_close = close
+        return self.value
+
+    @property
+    def value(self):
+        return self.atr
+
+class IndicatorState:
+    """
+    Live indicator set for one (symbol, interval): the columns of the
+    !analytic indicator frame, updated in constant time per closed candle.
+    """
+
+    def __init__(self):
+        self.rsi = StreamingRSI(24)
+        self.macd = StreamingMACD()
+        self.bollinger = StreamingBollinger(20, 2)
+        self.ma20 = StreamingEMA(20)
+        self.ma50 = StreamingEMA(50)
+        self.ma200 = StreamingEMA(200)
+        self.last_timestamp = None
+
+    def update(self, row):
+        """Feed one closed OHLCV row"""
+        close = row[4]
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.bollinger.update(close)
+        self.ma20.update(close)
+        self.ma50.update(close)
+        self.ma200.update(close)
+        self.last_timestamp = row[0]
+
+    def snapshot(self, row):
+        """Indicator values with `row` as the newest candle, without committing it"""
+        # One step from the committed state per indicator; nothing is copied or changed
+        close = row[4]
+        macd, macd_signal, macd_hist = self.macd.peek(close)
+        bb_upper, bb_middle, bb_lower = self.bollinger.peek(close)
+        return {
+            'timestamp': row[0],
+            'open': row[1],
+            'high': row[2],
+            'low': row[3],
+            'close': row[4],
+            'volume': row[5],
+            'RSI': self.rsi.peek(close),
+            'MACD': macd,
+            'MACD_signal': macd_signal,
+            'MACD_histogram': macd_hist,
+            'BB_upper': bb_upper,
+            'BB_middle': bb_middle,
+            'BB_lower': bb_lower,
+            'MA20': self.ma20.peek(close),
+            'MA50': self.ma50.peek(close),
+            'MA200': self.ma200.peek(close),
+        }
+
+class IndicatorStateStore:
+    """IndicatorState per (symbol, interval), fed from OHLCV rows whose last row is the open candle"""
+
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def latest(self, symbol, interval, rows):
+        """Bring the state up to date with `rows` and return the newest candle's indicator values"""
+        key = (symbol, interval)
+        closed, current = rows[:-1], rows[-1]
+        with self._lock:
+            state = self._states.pop(key, None)
+            # Without overlap the stored state can't be continued, so warm up from these rows
+            if state is None or not closed or state.last_timestamp is None \
+                    or state.last_timestamp < closed[0][0] or state.last_timestamp > closed[-1][0]:
+                state = IndicatorState()
+            # Only the rows after the last one the state has seen
+            start = 0 if state.last_timestamp is None else \
+                bisect.bisect_right(closed, state.last_timestamp, key=lambda row: row[0])
+            for row in closed[start:]:
+                state.update(row)
+            self._states[key] = state
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+            return state.snapshot(current)
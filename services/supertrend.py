@@ -1,66 +1,75 @@
-import ccxt
+import asyncio
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from ta.momentum import RSIIndicator
-from ta.trend import MACD, EMAIndicator
-from ta.volatility import AverageTrueRange
-from utils.formatter import format_discord_signal
-from config import OPENROUTER_API_KEY
-import requests
-import json
+from ta.trend import EMAIndicator
+from services.indicator_frame import FRAME_LIMIT, indicator_frames, true_range, wilder_atr
+from services.market_data import fetch_ohlcv, fetch_ohlcv_async
+from services.llm_cache import cached_chat_completion, cached_chat_completion_async, stream_cached_chat_completion
+from services.metrics import timed
+from utils.formatter import format_partial_signal
 
-# Binance exchange public data
-exchange = ccxt.binance()
+ADVANCED_SYSTEM_PROMPT = "You are an expert crypto trader specializing in multi-filter technical analysis. Provide clear, actionable insights using EMA Cloud, Supertrend, RSI, MACD, volatility, and higher timeframe analysis. Use Discord formatting with emojis."
+
+def calculate_supertrend_arrays(high, low, close, period=10, multiplier=3.0):
+    """Supertrend over NumPy arrays, returns (supertrend, direction) arrays"""
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    if n == 0:
+        return np.empty(0), np.empty(0)
+
+    atr = wilder_atr(true_range(high, low, close), period)
+    hl2 = (high + low) / 2
+    upper_band = (hl2 + multiplier * atr).tolist()
+    lower_band = (hl2 - multiplier * atr).tolist()
+    closes = close.tolist()
+
+    # The band/direction recurrence is path dependent, so it runs as one tight
+    # pass over plain floats instead of per-element pandas access
+    supertrend = [0.0] * n
+    direction = [0.0] * n
+    prev_st = upper_band[0]
+    prev_dir = 1.0
+    supertrend[0] = prev_st
+    direction[0] = prev_dir
+    prev_close = closes[0]
+    for i in range(1, n):
+        c = closes[i]
+        upper = upper_band[i]
+        if not (upper < prev_st or prev_close > prev_st):
+            upper = prev_st
+        lower = lower_band[i]
+        if not (lower > prev_st or prev_close < prev_st):
+            lower = prev_st
+
+        if c <= lower:
+            prev_st = lower
+            prev_dir = -1.0
+        elif c >= upper:
+            prev_st = upper
+            prev_dir = 1.0
+        supertrend[i] = prev_st
+        direction[i] = prev_dir
+        prev_close = c
+
+    return np.array(supertrend), np.array(direction)
 
 def calculate_supertrend(df, period=10, multiplier=3.0):
     """Calculate Supertrend indicator"""
-    atr = AverageTrueRange(high=df['high'], low=df['low'], close=df['close'], window=period).average_true_range()
-    
-    hl2 = (df['high'] + df['low']) / 2
-    upper_band = hl2 + (multiplier * atr)
-    lower_band = hl2 - (multiplier * atr)
-    
-    supertrend = pd.Series(index=df.index, dtype=float)
-    direction = pd.Series(index=df.index, dtype=int)
-    
-    for i in range(len(df)):
-        if i == 0:
-            supertrend.iloc[i] = upper_band.iloc[i]
-            direction.iloc[i] = 1
-        else:
-            # Calculate basic upper and lower bands
-            if upper_band.iloc[i] < supertrend.iloc[i-1] or df['close'].iloc[i-1] > supertrend.iloc[i-1]:
-                upper_band.iloc[i] = upper_band.iloc[i]
-            else:
-                upper_band.iloc[i] = supertrend.iloc[i-1]
-                
-            if lower_band.iloc[i] > supertrend.iloc[i-1] or df['close'].iloc[i-1] < supertrend.iloc[i-1]:
-                lower_band.iloc[i] = lower_band.iloc[i]
-            else:
-                lower_band.iloc[i] = supertrend.iloc[i-1]
-            
-            # Determine supertrend direction
-            if df['close'].iloc[i] <= lower_band.iloc[i]:
-                supertrend.iloc[i] = lower_band.iloc[i]
-                direction.iloc[i] = -1
-            elif df['close'].iloc[i] >= upper_band.iloc[i]:
-                supertrend.iloc[i] = upper_band.iloc[i]
-                direction.iloc[i] = 1
-            else:
-                supertrend.iloc[i] = supertrend.iloc[i-1]
-                direction.iloc[i] = direction.iloc[i-1]
-    
-    return supertrend, direction
+    with timed('supertrend'):
+        supertrend, direction = calculate_supertrend_arrays(
+            df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy(),
+            period=period, multiplier=multiplier
+        )
+    # Direction stays float64, the dtype the frame column has always had
+    return pd.Series(supertrend, index=df.index), pd.Series(direction, index=df.index)
 
 def resample_to_higher_timeframe(df, htf='4H'):
     """Resample data to higher timeframe"""
-    # Reset index to make timestamp a column for resampling
-    df_reset = df.reset_index()
-    df_reset.set_index('timestamp', inplace=True)
-    
-    # Resample to higher timeframe
-    htf_data = df_reset.resample(htf).agg({
+    # Resample on the timestamp index as it is; no reset_index/set_index copy of the frame
+    htf_data = df.resample(htf).agg({
         'open': 'first',
         'high': 'max',
         'low': 'min',
@@ -70,58 +79,79 @@ def resample_to_higher_timeframe(df, htf='4H'):
     
     return htf_data
 
-def get_advanced_technical_analysis(asset="BTC/USDT", interval="15m", 
-                                  fast_ema=21, slow_ema=55, rsi_length=14, 
-                                  rsi_long_threshold=55, rsi_short_threshold=45,
-                                  supertrend_period=10, supertrend_multiplier=3.0,
-                                  atr_length=14, atr_sma_length=14, r_multiple=2.0,
-                                  htf_interval='4H', htf_ema_length=50):
+def _aligned_htf_ema(df, htf_interval, htf_ema_length):
     """
-    Advanced technical analysis with EMA Cloud, Supertrend, and multi-filter strategy
+    Higher timeframe EMA on the lower timeframe index, as known at each bar.
+
+    A bar inside a forming HTF candle sees that candle's close so far (its own
+    close), not the candle's final close, so every row holds the value the
+    last row would have if the frame ended there.
     """
+    # Only the HTF closes (and the position of each HTF candle's last bar) are needed, so skip the full
+    # OHLCV resample; empty buckets drop out the same way
+    close = df['close']
+    positions = np.arange(len(close))
+    htf = pd.DataFrame({'close': close, 'last_bar': positions}).resample(htf_interval).last().dropna()
+    htf_ema = EMAIndicator(close=htf['close'], window=htf_ema_length, fillna=True).ema_indicator().to_numpy()
+    # HTF candle of each bar: the first one whose last bar is at or after it
+    bucket = np.searchsorted(htf['last_bar'].to_numpy(), positions)
+    # One more EMA step from the previous HTF candle's EMA, with this bar's close as the forming candle's close
+    alpha = 2 / (htf_ema_length + 1)
+    values = close.to_numpy(dtype=np.float64)
+    previous = htf_ema[np.maximum(bucket - 1, 0)]
+    ema = np.where(bucket > 0, (1 - alpha) * previous + alpha * values, values)
+    # Same warm-up as EMAIndicator: no value before htf_ema_length HTF candles
+    ema[bucket < htf_ema_length - 1] = np.nan
+    return pd.Series(ema, index=df.index, name='htf_ema')
+
+def strategy_columns(frame, fast_ema=21, slow_ema=55, rsi_length=14,
+                     supertrend_period=10, supertrend_multiplier=3.0,
+                     atr_length=14, atr_sma_length=14, htf_interval='4H', htf_ema_length=50):
+    """Indicator columns of the multi-filter strategy, memoized on the IndicatorFrame"""
+    close = frame.candles['close']
+    columns = {}
+    
+    # 1. EMA Cloud
+    columns['fast_ema'] = frame.ema(fast_ema).fillna(close)
+    columns['slow_ema'] = frame.ema(slow_ema).fillna(close)
+    
+    # 2. Supertrend
+    columns['supertrend'], columns['supertrend_direction'] = frame.cached(
+        ('supertrend', supertrend_period, supertrend_multiplier),
+        lambda: calculate_supertrend(frame.candles, period=supertrend_period, multiplier=supertrend_multiplier)
+    )
+    
+    # 3. RSI
+    columns['rsi'] = frame.rsi(rsi_length)
+    
+    # 4. MACD
+    columns['macd'], columns['macd_signal'], columns['macd_histogram'] = frame.macd()
+    
+    # 5. Volatility Filter (ATR)
+    columns['atr'] = frame.atr(atr_length)
+    columns['atr_sma'] = frame.cached(('atr_sma', atr_length, atr_sma_length),
+                                      lambda: frame.atr(atr_length).rolling(window=atr_sma_length).mean())
+    
+    # 6. Higher Timeframe Confirmation
     try:
-        symbol = f"{asset.upper()}"
-        
-        # Get more data for higher timeframe analysis
-        ohlcv = exchange.fetch_ohlcv(symbol, interval, limit=1000)
-        
-        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df.set_index('timestamp', inplace=True)
-        
-        # 1. EMA Cloud
-        df['fast_ema'] = EMAIndicator(close=df['close'], window=fast_ema).ema_indicator().fillna(df['close'])
-        df['slow_ema'] = EMAIndicator(close=df['close'], window=slow_ema).ema_indicator().fillna(df['close'])
-        
-        # 2. Supertrend
-        df['supertrend'], df['supertrend_direction'] = calculate_supertrend(
-            df, period=supertrend_period, multiplier=supertrend_multiplier
-        )
-        
-        # 3. RSI
-        df['rsi'] = RSIIndicator(close=df['close'], window=rsi_length).rsi()
-        
-        # 4. MACD
-        macd_indicator = MACD(close=df['close'])
-        df['macd'] = macd_indicator.macd()
-        df['macd_signal'] = macd_indicator.macd_signal()
-        df['macd_histogram'] = macd_indicator.macd_diff()
-        
-        # 5. Volatility Filter (ATR)
-        df['atr'] = AverageTrueRange(high=df['high'], low=df['low'], close=df['close'], window=atr_length).average_true_range()
-        df['atr_sma'] = df['atr'].rolling(window=atr_sma_length).mean()
-        
-        # 6. Higher Timeframe Confirmation
-        try:
-            htf_data = resample_to_higher_timeframe(df, htf_interval)
-            htf_data['htf_ema'] = EMAIndicator(close=htf_data['close'], window=htf_ema_length).ema_indicator()
-            
-            # Align HTF EMA with LTF data (forward fill)
-            df = df.join(htf_data[['htf_ema']], how='left')
-            df['htf_ema'] = df['htf_ema'].fillna(method='ffill')
-        except Exception as e:
-            print(f"HTF analysis error: {e}")
-            df['htf_ema'] = df['close']  # Fallback
+        columns['htf_ema'] = frame.cached(('htf_ema', htf_interval, htf_ema_length),
+                                          lambda: _aligned_htf_ema(frame.candles, htf_interval, htf_ema_length))
+    except Exception as e:
+        print(f"HTF analysis error: {e}")
+        columns['htf_ema'] = close  # Fallback
+    
+    return columns
+
+def compute_advanced_technical_analysis(frame, rsi_long_threshold=55, rsi_short_threshold=45,
+                                       r_multiple=2.0, **kwargs):
+    """
+    EMA Cloud, Supertrend and multi-filter strategy over an IndicatorFrame, returns (df, analysis)
+
+    Keyword arguments are the indicator parameters of strategy_columns.
+    """
+    with timed('indicators'):
+        # One concat instead of a column insert per indicator
+        df = pd.concat([frame.candles, pd.DataFrame(strategy_columns(frame, **kwargs))], axis=1)
         
         # Get current and previous values
         current = df.iloc[-1]
@@ -131,9 +161,40 @@ def get_advanced_technical_analysis(asset="BTC/USDT", interval="15m",
         # Analyze conditions
         analysis = analyze_trading_conditions(df, current, previous, prev2, 
                                             rsi_long_threshold, rsi_short_threshold, r_multiple)
-        
-        return df, analysis
-        
+    
+    return df, analysis
+
+def get_advanced_technical_analysis(asset="BTC/USDT", interval="15m", **kwargs):
+    """
+    Advanced technical analysis with EMA Cloud, Supertrend, and multi-filter strategy
+
+    Keyword arguments are the strategy parameters of compute_advanced_technical_analysis.
+    """
+    try:
+        symbol = f"{asset.upper()}"
+
+        # Get more data for higher timeframe analysis
+        ohlcv = fetch_ohlcv(symbol, interval, limit=FRAME_LIMIT)
+        frame = indicator_frames.get(symbol, interval, ohlcv)
+
+        return compute_advanced_technical_analysis(frame, **kwargs)
+
+    except Exception as e:
+        return None, f"Error in technical analysis: {str(e)}"
+
+async def get_advanced_technical_analysis_async(asset="BTC/USDT", interval="15m", **kwargs):
+    """
+    Same as get_advanced_technical_analysis, with the fetch awaited and pandas work off the event loop
+    """
+    try:
+        symbol = f"{asset.upper()}"
+        ohlcv = await fetch_ohlcv_async(symbol, interval, limit=FRAME_LIMIT)
+
+        def compute():
+            frame = indicator_frames.get(symbol, interval, ohlcv)
+            return compute_advanced_technical_analysis(frame, **kwargs)
+        return await asyncio.to_thread(compute)
+
     except Exception as e:
         return None, f"Error in technical analysis: {str(e)}"
 
@@ -272,23 +333,13 @@ def analyze_trading_conditions(df, current, previous, prev2,
     
     return analysis
 
-def get_advanced_trading_signal(asset="BTC/USDT", interval="15m", 
-                               model="deepseek/deepseek-chat-v3.1:free", **kwargs):
-    """
-    Generate advanced trading signals using multi-filter strategy
-    """
-    try:
-        # Get technical analysis
-        df, analysis = get_advanced_technical_analysis(asset, interval, **kwargs)
-        
-        if df is None:
-            return f"❌ Error: {analysis}"
-        
-        current = df.iloc[-1]
-        
-        # Format the response
-        if analysis['signal'] == 'No Signal':
-            response = f"""
+def format_advanced_signal(asset, df, analysis):
+    """Render the !trendsignal message from the analysis frame"""
+    current = df.iloc[-1]
+    
+    # Format the response
+    if analysis['signal'] == 'No Signal':
+        response = f"""
 🔍 **Advanced Signal Analysis for {asset.upper()}**
 --------------------------
 📊 **Current Price**: ${current['close']:.2f}
@@ -309,18 +360,18 @@ def get_advanced_trading_signal(asset="BTC/USDT", interval="15m",
 
 *Waiting for trigger alignment • {datetime.now().strftime("%H:%M:%S")}*
 """
+    else:
+        # Calculate risk/reward
+        if analysis['signal'] == 'Buy':
+            risk = analysis['entry_price'] - analysis['stop_loss']
+            reward = analysis['take_profit'] - analysis['entry_price']
         else:
-            # Calculate risk/reward
-            if analysis['signal'] == 'Buy':
-                risk = analysis['entry_price'] - analysis['stop_loss']
-                reward = analysis['take_profit'] - analysis['entry_price']
-            else:
-                risk = analysis['stop_loss'] - analysis['entry_price']
-                reward = analysis['entry_price'] - analysis['take_profit']
-            
-            rr_ratio = reward / risk if risk > 0 else 0
-            
-            response = f"""
+            risk = analysis['stop_loss'] - analysis['entry_price']
+            reward = analysis['entry_price'] - analysis['take_profit']
+        
+        rr_ratio = reward / risk if risk > 0 else 0
+        
+        response = f"""
 🚨 **ADVANCED TRADING SIGNAL - {asset.upper()}**
 --------------------------
 🎯 **Signal**: {'🟢 ' + analysis['signal'].upper() if analysis['signal'] == 'Buy' else '🔴 ' + analysis['signal'].upper()}
@@ -346,31 +397,18 @@ def get_advanced_trading_signal(asset="BTC/USDT", interval="15m",
 
 *Multi-filter strategy activated • {datetime.now().strftime("%H:%M:%S")}*
 """
-        
-        return response
-        
-    except Exception as e:
-        return f"❌ Error generating advanced signal: {str(e)}"
+    
+    return response
 
-def get_advanced_trading_signal_ai(asset="BTC/USDT", interval="15m", 
-                                  model="deepseek/deepseek-chat-v3.1:free", **kwargs):
-    """
-    Generate AI-enhanced advanced trading signals
-    """
-    try:
-        # Get technical analysis
-        df, analysis = get_advanced_technical_analysis(asset, interval, **kwargs)
-        
-        if df is None:
-            return f"❌ Error: {analysis}"
-        
-        current = df.iloc[-1]
-        entry_price_str = f"${analysis['entry_price']:.2f}" if analysis['entry_price'] else "N/A"
-        stop_loss_str = f"${analysis['stop_loss']:.2f}" if analysis['stop_loss'] else "N/A"
-        take_profit_str = f"${analysis['take_profit']:.2f}" if analysis['take_profit'] else "N/A"
+def build_advanced_ai_prompt(asset, df, analysis):
+    """Prompt for !aitrendsignal built from the multi-filter analysis"""
+    current = df.iloc[-1]
+    entry_price_str = f"${analysis['entry_price']:.2f}" if analysis['entry_price'] else "N/A"
+    stop_loss_str = f"${analysis['stop_loss']:.2f}" if analysis['stop_loss'] else "N/A"
+    take_profit_str = f"${analysis['take_profit']:.2f}" if analysis['take_profit'] else "N/A"
 
-        # Prepare context for AI
-        technical_context = f"""
+    # Prepare context for AI
+    return f"""
 ADVANCED MULTI-FILTER TRADING ANALYSIS FOR {asset.upper()}
 
 CURRENT MARKET DATA:
@@ -400,45 +438,121 @@ INSTRUCTIONS:
 - Use Discord formatting with clear sections and emojis
 - Keep analysis concise but comprehensive
 """
+
+def _format_ai_trend_response(response_data):
+    if 'choices' not in response_data or not response_data['choices']:
+        return f"❌ AI API error: {response_data}"
+
+    ai_response = response_data['choices'][0]['message']['content']
+
+    # Format for Discord (assuming format_discord_signal handles this)
+    MAX_DISCORD_LENGTH = 1900  # safe buffer under 2000 chars
+
+    ai_response_trimmed = ai_response
+    if len(ai_response) > MAX_DISCORD_LENGTH:
+        ai_response_trimmed = ai_response[:MAX_DISCORD_LENGTH] + "\n... (truncated)"
+    return ai_response_trimmed
+
+def get_advanced_trading_signal(asset="BTC/USDT", interval="15m", 
+                               model="deepseek/deepseek-chat-v3.1:free", **kwargs):
+    """
+    Generate advanced trading signals using multi-filter strategy
+    """
+    try:
+        # Get technical analysis
+        df, analysis = get_advanced_technical_analysis(asset, interval, **kwargs)
         
-        # Call AI API
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            data=json.dumps({
-                "model": model,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are an expert crypto trader specializing in multi-filter technical analysis. Provide clear, actionable insights using EMA Cloud, Supertrend, RSI, MACD, volatility, and higher timeframe analysis. Use Discord formatting with emojis."
-                    },
-                    {
-                        "role": "user",
-                        "content": technical_context
-                    }
-                ],
-                "temperature": 0.7,
-                "max_tokens": 800
-            })
-        )
+        if df is None:
+            return f"❌ Error: {analysis}"
         
-        response_data = response.json()
+        return format_advanced_signal(asset, df, analysis)
         
-        if 'choices' not in response_data or not response_data['choices']:
-            return f"❌ AI API error: {response_data}"
+    except Exception as e:
+        return f"❌ Error generating advanced signal: {str(e)}"
+
+async def get_advanced_trading_signal_async(asset="BTC/USDT", interval="15m",
+                                            model="deepseek/deepseek-chat-v3.1:free", **kwargs):
+    """
+    Non-blocking get_advanced_trading_signal
+    """
+    try:
+        df, analysis = await get_advanced_technical_analysis_async(asset, interval, **kwargs)
+
+        if df is None:
+            return f"❌ Error: {analysis}"
+
+        return format_advanced_signal(asset, df, analysis)
+
+    except Exception as e:
+        return f"❌ Error generating advanced signal: {str(e)}"
+
+def get_advanced_trading_signal_ai(asset="BTC/USDT", interval="15m", 
+                                  model="deepseek/deepseek-chat-v3.1:free", **kwargs):
+    """
+    Generate AI-enhanced advanced trading signals
+    """
+    try:
+        # Get technical analysis
+        df, analysis = get_advanced_technical_analysis(asset, interval, **kwargs)
         
-        ai_response = response_data['choices'][0]['message']['content']
+        if df is None:
+            return f"❌ Error: {analysis}"
         
-        # Format for Discord (assuming format_discord_signal handles this)
-        MAX_DISCORD_LENGTH = 1900  # safe buffer under 2000 chars
+        # Prepare context for AI and call AI API (repeat prompts on the same candle come from cache)
+        with timed('prompt_build'):
+            technical_context = build_advanced_ai_prompt(asset, df, analysis)
+        response_data = cached_chat_completion("aitrendsignal", asset.upper(), interval, df, model,
+                                               ADVANCED_SYSTEM_PROMPT, technical_context, max_tokens=800)
 
-        ai_response_trimmed = ai_response
-        if len(ai_response) > MAX_DISCORD_LENGTH:
-            ai_response_trimmed = ai_response[:MAX_DISCORD_LENGTH] + "\n... (truncated)"
-        return ai_response_trimmed
+        return _format_ai_trend_response(response_data)
         
     except Exception as e:
-        return f"❌ Error generating AI-enhanced signal: {str(e)}"
\ No newline at end of file
+        return f"❌ Error generating AI-enhanced signal: {str(e)}"
+
+async def get_advanced_trading_signal_ai_async(asset="BTC/USDT", interval="15m",
+                                               model="deepseek/deepseek-chat-v3.1:free", **kwargs):
+    """
+    Non-blocking get_advanced_trading_signal_ai
+    """
+    try:
+        df, analysis = await get_advanced_technical_analysis_async(asset, interval, **kwargs)
+
+        if df is None:
+            return f"❌ Error: {analysis}"
+
+        with timed('prompt_build'):
+            technical_context = build_advanced_ai_prompt(asset, df, analysis)
+        response_data = await cached_chat_completion_async("aitrendsignal", asset.upper(), interval, df, model,
+                                                           ADVANCED_SYSTEM_PROMPT, technical_context, max_tokens=800)
+
+        return _format_ai_trend_response(response_data)
+
+    except Exception as e:
+        return f"❌ Error generating AI-enhanced signal: {str(e)}"
+
+async def stream_advanced_trading_signal_ai(asset="BTC/USDT", interval="15m",
+                                            model="deepseek/deepseek-chat-v3.1:free", **kwargs):
+    """
+    Streaming get_advanced_trading_signal_ai, yields the message as the AI answer arrives
+    """
+    try:
+        df, analysis = await get_advanced_technical_analysis_async(asset, interval, **kwargs)
+
+        if df is None:
+            yield f"❌ Error: {analysis}"
+            return
+
+        with timed('prompt_build'):
+            technical_context = build_advanced_ai_prompt(asset, df, analysis)
+        ai_response = ""
+        async for ai_response in stream_cached_chat_completion("aitrendsignal", asset.upper(), interval, df, model,
+                                                               ADVANCED_SYSTEM_PROMPT, technical_context, max_tokens=800):
+            yield format_partial_signal(asset, ai_response)
+
+        if not ai_response:
+            yield "❌ AI API error: empty response"
+            return
+        yield _format_ai_trend_response({"choices": [{"message": {"content": ai_response}}]})
+
+    except Exception as e:
+        yield f"❌ Error generating AI-enhanced signal: {str(e)}"
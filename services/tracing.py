@@ -0,0 +1,276 @@
+import contextvars
+import itertools
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from config import TRACE_BUFFER_SIZE, TRACE_PROFILE_INTERVAL_MS, TRACE_PROFILE_SLOW_MS
+
+# Spans kept per trace; a !scan opens thousands, the rest are only counted
+MAX_SPANS = 500
+WATERFALL_WIDTH = 20
+WATERFALL_ROWS = 25
+
+_trace = contextvars.ContextVar('trace', default=None)
+_parent = contextvars.ContextVar('trace_span', default=None)
+
+class Span:
+    __slots__ = ('id', 'name', 'parent', 'start', 'end', 'thread', 'error')
+
+    def __init__(self, id, name, parent, start, thread):
+        self.id = id
+        self.name = name
+        self.parent = parent
+        self.start = start
+        self.end = None
+        self.thread = thread
+        self.error = None
+
+class Trace:
+    """One command (or alert run): its spans and, for slow ones, a sampled profile"""
+
+    def __init__(self, id, name, detail=""):
+        self.id = id
+        self.name = name
+        self.detail = detail
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        self.spans = []
+        self.dropped = 0
+        self.profile = None
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._token = None
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def open(self, name, parent):
+        with self._lock:
+            if len(self.spans) >= MAX_SPANS:
+                self.dropped += 1
+                return None
+            span = Span(next(self._ids), name, parent, time.perf_counter(), threading.current_thread().name)
+            self.spans.append(span)
+            return span
+
+    def to_dict(self):
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "id": self.id,
+            "name": self.name,
+            "detail": self.detail,
+            "started_at": datetime.fromtimestamp(self.started_at, tz=timezone.utc).isoformat(),
+            "duration_ms": round(self.duration * 1000, 1),
+            "spans": [{
+                "id": s.id,
+                "name": s.name,
+                "parent": s.parent,
+                "start_ms": round((s.start - self.start) * 1000, 1),
+                "duration_ms": round(((s.end or time.perf_counter()) - s.start) * 1000, 1),
+                "thread": s.thread,
+                "error": s.error,
+            } for s in spans],
+            "dropped_spans": self.dropped,
+            "profile": self.profile,
+        }
+
+class Sampler:
+    """
+    Opt-in sampling profiler. While traces are open it records the Python
+    stack of every busy thread every `interval` seconds; a trace slower than
+    `slow` keeps the stacks sampled during it. Samples cover the whole
+    process, so commands running at the same time share them.
+    """
+
+    # Innermost frames of a thread that is only waiting (event loop select, idle workers, locks)
+    IDLE_FILES = ('selectors.py', 'threading.py', 'queue.py', 'socketserver.py')
+    IDLE_FUNCTIONS = ('_worker',)
+
+    def __init__(self, interval, slow, max_samples=20000):
+        self.interval = interval
+        self.slow = slow
+        self._samples = deque(maxlen=max_samples)
+        self._active = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread = None
+
+    def begin(self):
+        with self._lock:
+            self._active += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='trace-sampler', daemon=True)
+                self._thread.start()
+            self._wake.notify()
+
+    def end(self, trace):
+        with self._lock:
+            self._active -= 1
+        if trace.duration < self.slow:
+            return None
+        with self._lock:
+            samples = list(self._samples)
+        stacks = Counter(stack for at, stack in samples if trace.start <= at <= trace.end)
+        return {
+            "interval_ms": round(self.interval * 1000, 1),
+            "samples": sum(stacks.values()),
+            "stacks": [{"stack": stack, "samples": n} for stack, n in stacks.most_common(20)],
+        }
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                while not self._active:
+                    self._wake.wait()
+            now = time.perf_counter()
+            busy = [(now, _stack(frame)) for ident, frame in sys._current_frames().items()
+                    if ident != me and not frame.f_code.co_filename.endswith(self.IDLE_FILES)
+                    and frame.f_code.co_name not in self.IDLE_FUNCTIONS]
+            with self._lock:
+                self._samples.extend(busy)
+            time.sleep(self.interval)
+
+def _stack(frame, depth=12):
+    names = []
+    while frame is not None and len(names) < depth:
+        module = frame.f_globals.get('__name__', '?')
+        names.append(f"{module}.{frame.f_code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class Tracer:
+    """Ring buffer of the most recent finished traces"""
+
+    def __init__(self, capacity=100, sampler=None):
+        self.traces = deque(maxlen=capacity)
+        self.sampler = sampler
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self, name, detail=""):
+        """Open a trace in the current context; spans opened from here on land in it"""
+        trace = Trace(next(self._ids), name, detail)
+        trace._token = _trace.set(trace)
+        if self.sampler is not None:
+            self.sampler.begin()
+        return trace
+
+    def finish(self, trace):
+        trace.end = time.perf_counter()
+        _trace.reset(trace._token)
+        if self.sampler is not None:
+            trace.profile = self.sampler.end(trace)
+        with self._lock:
+            self.traces.append(trace)
+
+    @contextmanager
+    def trace(self, name, detail=""):
+        trace = self.start(name, detail)
+        try:
+            yield trace
+        finally:
+            self.finish(trace)
+
+    def recent(self, limit=20, name=None):
+        """Finished traces, newest first, optionally of one command"""
+        with self._lock:
+            traces = list(self.traces)
+        return [t for t in reversed(traces) if name is None or t.name == name][:limit]
+
+    def get(self, trace_id):
+        with self._lock:
+            return next((t for t in self.traces if t.id == trace_id), None)
+
+@contextmanager
+def span(name):
+    """Time the block as a child of the current span, if a trace is open"""
+    trace = _trace.get()
+    record = trace.open(name, _parent.get()) if trace is not None else None
+    if record is None:
+        yield
+        return
+    _parent.set(record.id)
+    try:
+        yield
+    except Exception as e:
+        record.error = type(e).__name__
+        raise
+    finally:
+        record.end = time.perf_counter()
+        # Set rather than reset: an async generator may be closed from another context
+        _parent.set(record.parent)
+
+def _groups(spans, parents):
+    # Sibling spans with the same name (e.g. one fetch per pair of a scan) are shown as one row
+    groups = {}
+    for s in spans:
+        if s.parent in parents:
+            groups.setdefault(s.name, []).append(s)
+    return sorted(groups.items(), key=lambda item: min(s.start for s in item[1]))
+
+def format_waterfall(trace):
+    """Render a trace as a Discord message: one bar per span (group) on the trace's timeline"""
+    with trace._lock:
+        spans = list(trace.spans)
+    total = max(trace.duration, 1e-9)
+    rows = []
+
+    def walk(parents, depth):
+        for name, group in _groups(spans, parents):
+            start = min(s.start for s in group) - trace.start
+            end = max((s.end or trace.end or time.perf_counter()) for s in group) - trace.start
+            busy = sum((s.end or trace.end or time.perf_counter()) - s.start for s in group)
+            left = min(int(start / total * WATERFALL_WIDTH), WATERFALL_WIDTH - 1)
+            width = max(1, round(end / total * WATERFALL_WIDTH) - left)
+            bar = " " * left + "█" * width
+            label = "  " * depth + name + (f" ×{len(group)}" if len(group) > 1 else "")
+            errors = sum(1 for s in group if s.error)
+            timing = f"{busy * 1000:.0f}ms" + (f" ({errors} failed)" if errors else "")
+            rows.append(f"{label:<24.24}|{bar:<{WATERFALL_WIDTH}}| {timing}")
+            walk({s.id for s in group}, depth + 1)
+
+    walk({None}, 0)
+    lines = [f"🧭 **Trace #{trace.id} • {trace.detail or '!' + trace.name} • {trace.duration * 1000:.0f}ms**",
+             f"*{datetime.fromtimestamp(trace.started_at).strftime('%H:%M:%S')} • time per stage, summed over repeated spans*",
+             "```"]
+    lines += rows[:WATERFALL_ROWS]
+    if len(rows) > WATERFALL_ROWS:
+        lines.append(f"... {len(rows) - WATERFALL_ROWS} more rows")
+    if not rows:
+        lines.append("(no spans recorded)")
+    lines.append("```")
+    if trace.dropped:
+        lines.append(f"⚠️ {trace.dropped} spans over the {MAX_SPANS} span limit were not recorded")
+    if trace.profile and trace.profile['samples']:
+        lines.append(f"🔥 **Hottest code** ({trace.profile['samples']} samples every {trace.profile['interval_ms']:.0f}ms):")
+        hot = Counter()
+        for entry in trace.profile['stacks']:
+            hot[entry['stack'].rsplit(';', 1)[-1]] += entry['samples']
+        for frame, n in hot.most_common(5):
+            lines.append(f"• `{frame}` {n / trace.profile['samples']:.0%}")
+    return "\n".join(lines)
+
+def format_trace_list(traces):
+    """Render the !perf list summary"""
+    if not traces:
+        return "📭 No traces recorded yet."
+    lines = ["🧭 **Recent traces** (`!perf <id>` for the waterfall)"]
+    for t in traces:
+        slowest = {}
+        for s in t.spans:
+            if s.parent is None and s.end is not None:
+                slowest[s.name] = slowest.get(s.name, 0.0) + s.end - s.start
+        top = max(slowest, key=slowest.get) if slowest else None
+        lines.append(f"• #{t.id} {t.detail or '!' + t.name} • {t.duration * 1000:.0f}ms"
+                     + (f" • mostly {top}" if top else ""))
+    return "\n".join(lines)
+
+tracer = Tracer(TRACE_BUFFER_SIZE, Sampler(TRACE_PROFILE_INTERVAL_MS / 1000, TRACE_PROFILE_SLOW_MS / 1000)
+                if TRACE_PROFILE_SLOW_MS > 0 else None)
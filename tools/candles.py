@@ -0,0 +1,60 @@
+"""
+Download candles once and keep them on disk for the offline tools.
+
+    python -m tools.candles BTC/USDT 15m 50000 btc_15m.csv
+
+Files are CSV with a timestamp,open,high,low,close,volume header (timestamps
+in milliseconds, like ccxt).
+"""
+import argparse
+import asyncio
+import os
+
+os.environ.setdefault("DISCORD_TOKEN", "offline")
+os.environ.setdefault("OPENROUTER_API_KEY", "offline")
+
+import numpy as np
+
+COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+
+def save_candles(path, rows):
+    """Write OHLCV rows to a CSV file"""
+    with open(path, "w") as f:
+        f.write(",".join(COLUMNS) + "\n")
+        for row in rows:
+            f.write(f"{int(row[0])},{row[1]!r},{row[2]!r},{row[3]!r},{row[4]!r},{row[5]!r}\n")
+
+
+def load_candles(path):
+    """Read a CSV written by save_candles as an (n, 6) float64 array"""
+    candles = np.loadtxt(path, delimiter=",", skiprows=1, dtype=np.float64, ndmin=2)
+    if candles.shape[1] != len(COLUMNS):
+        raise ValueError(f"{path}: expected columns {','.join(COLUMNS)}")
+    return candles
+
+
+async def download(symbol, interval, bars):
+    from services import market_data
+    try:
+        # Drop the still-open candle
+        return (await market_data.fetch_ohlcv_history_async(symbol, interval, bars + 1))[:-1]
+    finally:
+        await market_data.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download closed candles from Binance to a CSV file")
+    parser.add_argument("symbol")
+    parser.add_argument("interval")
+    parser.add_argument("bars", type=int)
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    rows = asyncio.run(download(args.symbol.upper(), args.interval, args.bars))
+    save_candles(args.path, rows)
+    print(f"saved {len(rows)} candles to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Record Binance kline streams and replay them from a local WebSocket stand-in.
+
+    python -m tools.kline_replay record klines.jsonl BTC/USDT:15m ETH/USDT:1m --seconds 600
+    python -m tools.kline_replay serve klines.jsonl --port 8765 --speed 10 --drop-after 500
+
+Recordings are JSON lines of {"at": seconds since the start, "message": ...}
+with the combined-stream messages exactly as Binance sent them. The server
+speaks the same protocol as wss://stream.binance.com:9443/stream (SUBSCRIBE /
+UNSUBSCRIBE control messages, {"stream", "data"} payloads), so the bot can be
+pointed at it with KLINE_FEED_URL=ws://localhost:8765/stream. By default kline
+times are shifted so the recording starts in the current candle, which keeps
+it consistent with the REST candles the feed is seeded with. --drop-after
+closes each connection after that many messages to exercise reconnects; the
+replay keeps going meanwhile, so the client has to resync what it missed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("DISCORD_TOKEN", "offline")
+os.environ.setdefault("OPENROUTER_API_KEY", "offline")
+
+import aiohttp
+from aiohttp import web
+
+from services.candle_cache import timeframe_ms
+from services.kline_feed import stream_name
+
+BINANCE_STREAM_URL = "wss://stream.binance.com:9443/stream"
+
+
+def kline_message(symbol, interval, row, closed=False, event_ms=None):
+    """A combined-stream kline message for a [timestamp, open, high, low, close, volume] row"""
+    step = timeframe_ms(interval)
+    market = symbol.replace('/', '').upper()
+    return {
+        "stream": stream_name(symbol, interval),
+        "data": {
+            "e": "kline",
+            "E": event_ms if event_ms is not None else row[0] + step - 1,
+            "s": market,
+            "k": {"t": row[0], "T": row[0] + step - 1, "s": market, "i": interval,
+                  "o": repr(row[1]), "h": repr(row[2]), "l": repr(row[3]), "c": repr(row[4]),
+                  "v": repr(row[5]), "x": closed},
+        },
+    }
+
+
+def load_recording(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_recording(path, entries):
+    with open(path, "w") as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + "\n")
+
+
+def shift_to_now(entries, now_ms=None):
+    """Move every stream's kline times so its first candle is the current one"""
+    now_ms = now_ms or int(time.time() * 1000)
+    offsets = {}
+    shifted = []
+    for entry in entries:
+        message = json.loads(json.dumps(entry['message']))
+        kline = message.get('data', {}).get('k')
+        if kline is not None:
+            step = timeframe_ms(kline['i'])
+            offset = offsets.setdefault(message['stream'], now_ms // step * step - kline['t'])
+            kline['t'] += offset
+            kline['T'] += offset
+            message['data']['E'] += offset
+        shifted.append({"at": entry['at'], "message": message})
+    return shifted
+
+
+def replay_app(entries, speed=1.0, drop_after=None):
+    """
+    aiohttp app serving /stream. The recording plays on one timeline that starts
+    with the first connection, like a live stream: a client that reconnects
+    picks up at the current point and misses what was sent while it was away.
+    """
+    app = web.Application()
+    app['started'] = None
+
+    def elapsed():
+        return (time.monotonic() - app['started']) * speed
+
+    async def stream(request):
+        ws = web.WebSocketResponse(heartbeat=30)
+        await ws.prepare(request)
+        if app['started'] is None:
+            app['started'] = time.monotonic()
+        subscribed = set()
+
+        async def control():
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                command = json.loads(msg.data)
+                if command.get("method") == "SUBSCRIBE":
+                    subscribed.update(command["params"])
+                elif command.get("method") == "UNSUBSCRIBE":
+                    subscribed.difference_update(command["params"])
+                await ws.send_str(json.dumps({"result": None, "id": command.get("id")}))
+
+        reader = asyncio.create_task(control())
+        sent = 0
+        now = elapsed()
+        try:
+            for entry in (entry for entry in entries if entry['at'] >= now):
+                wait = (entry['at'] - elapsed()) / speed
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                if ws.closed:
+                    break
+                if entry['message'].get('stream') not in subscribed:
+                    continue
+                await ws.send_str(json.dumps(entry['message']))
+                sent += 1
+                if drop_after is not None and sent >= drop_after:
+                    break
+            else:
+                # Recording done: stay connected like an idle stream
+                await reader
+        except ConnectionResetError:
+            pass
+        finally:
+            reader.cancel()
+            await ws.close()
+        return ws
+
+    app.router.add_get("/stream", stream)
+    return app
+
+
+async def record(path, pairs, seconds, url=BINANCE_STREAM_URL):
+    streams = [stream_name(*pair.split(":")) for pair in pairs]
+    entries = []
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect(url, heartbeat=30) as ws:
+            await ws.send_str(json.dumps({"method": "SUBSCRIBE", "params": streams, "id": 1}))
+            start = time.monotonic()
+            while time.monotonic() - start < seconds:
+                try:
+                    msg = await ws.receive(timeout=seconds - (time.monotonic() - start))
+                except asyncio.TimeoutError:
+                    break
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    break
+                message = json.loads(msg.data)
+                if "stream" in message:
+                    entries.append({"at": round(time.monotonic() - start, 3), "message": message})
+    save_recording(path, entries)
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay Binance kline streams")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rec = commands.add_parser("record", help="record live kline streams to a file")
+    rec.add_argument("path")
+    rec.add_argument("pairs", nargs="+", help="SYMBOL:INTERVAL, e.g. BTC/USDT:15m")
+    rec.add_argument("--seconds", type=float, default=300)
+    serve = commands.add_parser("serve", help="replay a recording over a local WebSocket")
+    serve.add_argument("path")
+    serve.add_argument("--host", default="localhost")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier")
+    serve.add_argument("--drop-after", type=int, help="close each connection after this many messages")
+    serve.add_argument("--no-shift", action="store_true", help="keep the recorded kline times")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        pairs = [f"{symbol.upper()}:{interval}" for symbol, interval in (pair.split(":") for pair in args.pairs)]
+        entries = asyncio.run(record(args.path, pairs, args.seconds))
+        print(f"recorded {len(entries)} messages to {args.path}")
+        return
+    entries = load_recording(args.path)
+    if not args.no_shift:
+        entries = shift_to_now(entries)
+    print(f"replaying {len(entries)} messages on ws://{args.host}:{args.port}/stream")
+    web.run_app(replay_app(entries, args.speed, args.drop_after), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Local stand-in for the OpenRouter chat completions API.
+
+    python -m tools.openrouter_stub --port 8090 --latency 0.5 --fail-rate 0.2
+
+Serves POST /api/v1/chat/completions like OpenRouter: a JSON completion, or
+an SSE stream of content deltas when the request has "stream": true. Point
+the bot at it with OPENROUTER_BASE_URL=http://localhost:8090/api/v1.
+--fail-rate answers that share of requests with a 429 or 503, to exercise
+the client's retries and circuit breaker. Benchmarks script the exact
+answers instead by queueing them on app['script']: an HTTP status, "hang"
+(never answer, so the read timeout fires) or "cut" (drop the connection
+after the first deltas of a stream).
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from aiohttp import web
+
+ANSWER = "📈 **BTC/USDT** • Bias: Long above 64,200, target 66,000, stop 63,400 (stub answer)"
+
+
+def completion(model, content):
+    return {
+        "id": "gen-stub",
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": 0},
+    }
+
+
+def sse_chunk(content):
+    return f"data: {json.dumps({'choices': [{'index': 0, 'delta': {'content': content}}]})}\n\n".encode()
+
+
+def stub_app(answer=ANSWER, latency=0.0, fail_rate=0.0, seed=None, hang_s=3600.0):
+    """aiohttp app answering chat completions; app['stats']['requests'] counts the POSTs it got"""
+    app = web.Application()
+    app['script'] = deque()
+    app['stats'] = {"requests": 0}
+    rng = random.Random(seed)
+
+    async def chat_completions(request):
+        payload = await request.json()
+        app['stats']['requests'] += 1
+        if app['script']:
+            action = app['script'].popleft()
+        else:
+            action = rng.choice((429, 503)) if rng.random() < fail_rate else 200
+        if latency:
+            await asyncio.sleep(latency)
+        if action == "hang":
+            await asyncio.sleep(hang_s)
+        if isinstance(action, int) and action != 200:
+            headers = {"Retry-After": "0"} if action == 429 else {}
+            return web.json_response({"error": {"code": action, "message": f"stub error {action}"}},
+                                     status=action, headers=headers)
+        if not payload.get("stream"):
+            return web.json_response(completion(payload.get("model"), answer))
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await response.write(b": OPENROUTER PROCESSING\n\n")
+        words = answer.split(" ")
+        for i, word in enumerate(words):
+            await response.write(sse_chunk(word if i == 0 else " " + word))
+            if action == "cut" and i == 1:
+                request.transport.close()
+                return response
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    app.router.add_post("/api/v1/chat/completions", chat_completions)
+    return app
+
+
+async def _cancel_handlers():
+    # A "hang" handler outlives the runner's shutdown timeout; end it before the loop stops
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@contextmanager
+def running(app, host="127.0.0.1"):
+    """Serve `app` on a free port from a background thread, yields its OPENROUTER_BASE_URL"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name="openrouter-stub", daemon=True)
+    thread.start()
+    runner = web.AppRunner(app, shutdown_timeout=1.0)
+    asyncio.run_coroutine_threadsafe(runner.setup(), loop).result()
+    asyncio.run_coroutine_threadsafe(web.TCPSite(runner, host, 0).start(), loop).result()
+    port = runner.addresses[0][1]
+    try:
+        yield f"http://{host}:{port}/api/v1"
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        asyncio.run_coroutine_threadsafe(_cancel_handlers(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the OpenRouter API")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before every answer")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 429/503")
+    parser.add_argument("--answer", default=ANSWER)
+    args = parser.parse_args()
+    print(f"OpenRouter stub on http://{args.host}:{args.port}/api/v1")
+    web.run_app(stub_app(args.answer, args.latency, args.fail_rate), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
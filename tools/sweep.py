@@ -0,0 +1,191 @@
+"""
+Grid / random search over the !trendsignal strategy parameters.
+
+    python -m tools.sweep btc_15m.csv
+    python -m tools.sweep btc_15m.csv --param fast_ema=9,13,21 --param r_multiple=1.5,2,3 --random 200
+
+Runs offline on candles saved by tools.candles. The candles are placed in
+shared memory once, as one array per column, and every worker process builds
+its IndicatorFrame over views of them instead of receiving a pickled copy.
+Grid points that only differ in RSI thresholds or r_multiple share one
+indicator frame, and each worker keeps its IndicatorFrame memo across tasks
+(the MEMO_LIMIT most recently used results), so EMAs/Supertrends shared by
+neighbouring points are computed once per worker. Results go to a CSV sorted
+by the chosen metric.
+"""
+import argparse
+import csv
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+os.environ.setdefault("DISCORD_TOKEN", "offline")
+os.environ.setdefault("OPENROUTER_API_KEY", "offline")
+
+import numpy as np
+
+from services.backtest import simulate_trades, strategy_frame, strategy_signals, summarize_trades
+from services.candle_columns import OHLCV
+from services.indicator_frame import IndicatorFrame
+from tools.candles import load_candles
+
+DEFAULT_GRID = {
+    'fast_ema': [9, 21],
+    'slow_ema': [34, 55],
+    'rsi_length': [14],
+    'rsi_long_threshold': [50, 55],
+    'rsi_short_threshold': [45, 50],
+    'supertrend_period': [7, 10],
+    'supertrend_multiplier': [2.0, 3.0],
+    'atr_length': [14],
+    'atr_sma_length': [14],
+    'r_multiple': [1.5, 2.0, 3.0],
+    'htf_interval': ['4H'],
+    'htf_ema_length': [50],
+}
+# Parameters that don't change the indicator columns
+SIGNAL_PARAMS = ('rsi_long_threshold', 'rsi_short_threshold')
+TRADE_PARAMS = ('r_multiple',)
+METRICS = ('trades', 'win_rate', 'expectancy_pct', 'expectancy_r', 'profit_factor',
+           'total_return_pct', 'max_drawdown_pct', 'avg_bars_held', 'skipped')
+LOWER_IS_BETTER = ('max_drawdown_pct',)
+# Indicator results a worker keeps; a group reads about 10, and groups come ordered so neighbours share most
+MEMO_LIMIT = 64
+
+# Worker state, set up once per process by _attach
+_shm = None
+_frame = None
+
+
+def _shared_columns(buffer, n):
+    """Timestamps then one contiguous float64 array per OHLCV column, as views of `buffer`"""
+    timestamp = np.ndarray((n,), dtype=np.int64, buffer=buffer)
+    block = np.ndarray((len(OHLCV), n), dtype=np.float64, buffer=buffer, offset=timestamp.nbytes)
+    return dict(zip(OHLCV, block), timestamp=timestamp)
+
+
+def _attach(name, n):
+    global _shm, _frame
+    # Pool workers share the parent's resource tracker, which unlinks the block once the parent is done
+    _shm = shared_memory.SharedMemory(name=name)
+    _frame = IndicatorFrame.from_columns(_shared_columns(_shm.buf, n), max_memo=MEMO_LIMIT)
+
+
+def _run_group(task):
+    indicator_params, points = task
+    df = strategy_frame(_frame, **indicator_params)
+    signals = {}
+    results = []
+    for point in points:
+        thresholds = (point['rsi_long_threshold'], point['rsi_short_threshold'])
+        if thresholds not in signals:
+            signals[thresholds] = strategy_signals(df, *thresholds)
+        trades, skipped, _ = simulate_trades(df, signals[thresholds], point['r_multiple'])
+        results.append({**indicator_params, **point, **summarize_trades(trades), 'skipped': skipped})
+    return results
+
+
+def grid_points(grid, samples=None, seed=0):
+    """Every combination of the grid (fast_ema < slow_ema), or a random sample of them"""
+    names = list(grid)
+    points = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    points = [p for p in points if p['fast_ema'] < p['slow_ema']]
+    if samples is not None and samples < len(points):
+        points = random.Random(seed).sample(points, samples)
+    return points
+
+
+def group_points(points):
+    """Group points by their indicator parameters, ordered so heavy indicators repeat back to back"""
+    groups = {}
+    for point in points:
+        indicator_params = tuple((k, v) for k, v in point.items() if k not in SIGNAL_PARAMS + TRADE_PARAMS)
+        rest = {k: point[k] for k in SIGNAL_PARAMS + TRADE_PARAMS}
+        groups.setdefault(indicator_params, []).append(rest)
+
+    def order(key):
+        params = dict(key)
+        return (params['htf_interval'], params['htf_ema_length'], params['supertrend_period'],
+                params['supertrend_multiplier'], params['atr_length'], params['fast_ema'], params['slow_ema'])
+    return [(dict(key), groups[key]) for key in sorted(groups, key=order)]
+
+
+def run_sweep(candles, points, workers=None):
+    """Backtest every point over `candles` ((n, 6) array) on a process pool, returns result rows"""
+    workers = workers or os.cpu_count() or 1
+    tasks = group_points(points)
+    candles = np.asarray(candles, dtype=np.float64)
+    n = len(candles)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, n * (1 + len(OHLCV)) * 8))
+    try:
+        columns = _shared_columns(shm.buf, n)
+        columns['timestamp'][:] = candles[:, 0]
+        for i, name in enumerate(OHLCV, start=1):
+            columns[name][:] = candles[:, i]
+        del columns
+        # Contiguous chunks keep related groups on one worker, where the frame memo is warm
+        chunksize = max(1, len(tasks) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(shm.name, n)) as pool:
+            return [row for rows in pool.map(_run_group, tasks, chunksize=chunksize) for row in rows]
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def sort_results(results, metric):
+    return sorted(results, key=lambda r: r[metric], reverse=metric not in LOWER_IS_BETTER)
+
+
+def write_report(path, results):
+    fields = list(DEFAULT_GRID) + list(METRICS)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def _parse_param(text):
+    name, _, values = text.partition("=")
+    if name not in DEFAULT_GRID or not values:
+        raise argparse.ArgumentTypeError(f"expected one of {', '.join(DEFAULT_GRID)} as name=v1,v2,...")
+    cast = type(DEFAULT_GRID[name][0])
+    return name, [cast(v) for v in values.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweep for the !trendsignal strategy")
+    parser.add_argument("candles", help="CSV written by tools.candles")
+    parser.add_argument("--param", type=_parse_param, action="append", default=[],
+                        help="override a grid axis, e.g. fast_ema=9,13,21")
+    parser.add_argument("--random", type=int, help="sample this many grid points instead of the full grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--sort", default="expectancy_r", choices=METRICS)
+    parser.add_argument("--min-trades", type=int, default=10, help="minimum trades to be listed in the top results")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--out", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    grid = {**DEFAULT_GRID, **dict(args.param)}
+    candles = load_candles(args.candles)
+    points = grid_points(grid, args.random, args.seed)
+
+    start = time.perf_counter()
+    results = sort_results(run_sweep(candles, points, args.workers), args.sort)
+    elapsed = time.perf_counter() - start
+    write_report(args.out, results)
+    print(f"{len(points)} points over {len(candles)} candles in {elapsed:.1f}s "
+          f"on {args.workers or os.cpu_count()} workers -> {args.out}")
+
+    varied = [name for name, values in grid.items() if len(values) > 1]
+    print(" ".join(f"{name:>12}" for name in varied + [args.sort, 'trades', 'win_rate', 'max_drawdown_pct']))
+    for row in [r for r in results if r['trades'] >= args.min_trades][:args.top]:
+        values = [row[name] for name in varied + [args.sort, 'trades', 'win_rate', 'max_drawdown_pct']]
+        print(" ".join(f"{v:>12.4g}" if isinstance(v, float) else f"{v:>12}" for v in values))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import time
+from services.metrics import timed
+from utils.formatter import split_discord_message
+
+async def stream_to_discord(ctx, stream, edit_interval=1.0, placeholder="⏳ Analyzing..."):
+    """
+    Post a placeholder and keep editing it with the latest text from `stream`.
+
+    Edits are throttled to one per edit_interval seconds (Discord allows about
+    5 edits per 5s per channel); the last value from the stream always lands,
+    split over follow-up messages if it is longer than Discord's 2000 chars.
+    """
+    message = await ctx.send(placeholder)
+    latest = shown = placeholder
+    last_edit = 0.0
+
+    async for latest in stream:
+        if latest != shown and time.monotonic() - last_edit >= edit_interval:
+            with timed('discord_send'):
+                await message.edit(content=latest)
+            shown, last_edit = latest, time.monotonic()
+
+    # One extra edit right after a throttled one still stays well inside the limit
+    chunks = split_discord_message(latest)
+    if chunks[0] != shown:
+        with timed('discord_send'):
+            await message.edit(content=chunks[0])
+    for chunk in chunks[1:]:
+        await ctx.send(chunk)
+    return message
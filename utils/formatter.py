@@ -35,4 +35,23 @@ def format_discord_signal(asset, ai_response, technical_data):
 
 ⚠️ **RISK DISCLAIMER:** This is not financial advice. Always do your own research and trade responsibly.
 """
-    return discord_message
\ No newline at end of file
+    return discord_message
+def format_partial_signal(asset, ai_response, limit=1900):
+    # Shown while the AI answer is still streaming in
+    header = f"🤖 **{asset.upper()}** • *AI analysis in progress...*\n\n"
+    body = ai_response
+    if len(header) + len(body) > limit:
+        body = body[:limit - len(header)] + "…"
+    return header + body
+
+def split_discord_message(message, limit=2000):
+    # Discord rejects messages over 2000 chars; split on line breaks where possible
+    chunks = []
+    while len(message) > limit:
+        cut = message.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(message[:cut])
+        message = message[cut:].lstrip("\n")
+    chunks.append(message)
+    return chunks
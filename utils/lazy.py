@@ -0,0 +1,35 @@
+import importlib
+
+class LazyImport:
+    """
+    Stands in for a module, or one of its attributes, until it is first
+    called or has an attribute read; the import happens then.
+    """
+
+    def __init__(self, module, name=None):
+        self._module = module
+        self._name = name
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            module = importlib.import_module(self._module)
+            self._target = module if self._name is None else getattr(module, self._name)
+        return self._target
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+    def __repr__(self):
+        target = self._module if self._name is None else f"{self._module}.{self._name}"
+        return f"<lazy {target}{'' if self._target is None else ' (loaded)'}>"
+
+def lazy_import(module, *names):
+    """A LazyImport of `module`, or one per attribute name (a tuple if several)"""
+    if not names:
+        return LazyImport(module)
+    proxies = tuple(LazyImport(module, name) for name in names)
+    return proxies[0] if len(proxies) == 1 else proxies
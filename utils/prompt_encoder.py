@@ -0,0 +1,102 @@
+import math
+import re
+import numpy as np
+
+# Roughly how BPE tokenizers split text: words, 1-3 digit chunks, single symbols
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+
+# Significant digits kept per column; prices keep enough to quote exact levels
+_PRECISION = {
+    'volume': 4,
+    'RSI': 3, 'rsi': 3,
+    'MACD': 4, 'MACD_signal': 4, 'MACD_histogram': 4,
+    'macd': 4, 'macd_signal': 4, 'macd_histogram': 4,
+}
+_DEFAULT_PRECISION = 6
+
+def count_tokens(text):
+    """Approximate LLM token count of `text` (within ~10-15% of common BPE tokenizers)"""
+    return len(_TOKEN_PATTERN.findall(text))
+
+def _fmt(value, digits=_DEFAULT_PRECISION):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return format(float(value), f".{digits}g")
+
+def _fmt_time(ts):
+    return ts.strftime("%m-%d %H:%M")
+
+def find_swing_points(df, k=3, limit=8):
+    """Confirmed swing highs/lows: bars whose high/low is the extreme of the k bars on each side"""
+    if len(df) < 2 * k + 1:
+        return []
+    high = df['high'].to_numpy()
+    low = df['low'].to_numpy()
+    window = 2 * k + 1
+    high_max = np.lib.stride_tricks.sliding_window_view(high, window).max(axis=1)
+    low_min = np.lib.stride_tricks.sliding_window_view(low, window).min(axis=1)
+    centre = np.arange(k, len(df) - k)
+    swings = [(i, 'H', high[i]) for i in centre[high[centre] == high_max]]
+    swings += [(i, 'L', low[i]) for i in centre[low[centre] == low_min]]
+    swings.sort()
+    return [(df.index[i], kind, price) for i, kind, price in swings[-limit:]]
+
+def _summary_lines(df):
+    lines = []
+    if {'close', 'high', 'low'} <= set(df.columns):
+        close = df['close']
+        lines.append(f"close: last={_fmt(close.iloc[-1])} mean={_fmt(close.mean())} "
+                     f"change={(close.iloc[-1] / close.iloc[0] - 1) * 100:+.2f}%")
+        lines.append(f"range: high={_fmt(df['high'].max())} low={_fmt(df['low'].min())}")
+    if 'volume' in df.columns:
+        volume = df['volume']
+        lines.append(f"volume: last={_fmt(volume.iloc[-1], 4)} mean={_fmt(volume.mean(), 4)} "
+                     f"avg20={_fmt(volume.iloc[-20:].mean(), 4)}")
+    for column in ('RSI', 'rsi'):
+        if column in df.columns and df[column].notna().any():
+            rsi = df[column].dropna()
+            lines.append(f"{column}: last={_fmt(rsi.iloc[-1], 3)} min={_fmt(rsi.min(), 3)} "
+                         f"max={_fmt(rsi.max(), 3)} mean={_fmt(rsi.mean(), 3)}")
+    return lines
+
+def _bar_lines(df):
+    columns = list(df.columns)
+    digits = [_PRECISION.get(column, _DEFAULT_PRECISION) for column in columns]
+    lines = ["time," + ",".join(columns)]
+    for ts, values in zip(df.index, df.itertuples(index=False, name=None)):
+        lines.append(_fmt_time(ts) + "," + ",".join(_fmt(v, d) for v, d in zip(values, digits)))
+    return lines
+
+def encode_market_data(df, token_budget=1500, max_bars=60, min_bars=5, swing_k=3):
+    """
+    Compact text form of an indicator frame for LLM prompts.
+
+    Summary statistics cover the whole frame, swing points are the last confirmed
+    highs/lows, and the most recent bars are written as tight CSV. The number of
+    bars is cut until the estimate from count_tokens() fits `token_budget`.
+    """
+    if df.empty:
+        return "NO DATA"
+
+    header = [
+        f"SUMMARY ({len(df)} bars, {_fmt_time(df.index[0])} -> {_fmt_time(df.index[-1])} UTC, last bar still open):",
+        *_summary_lines(df),
+        "",
+        f"SWING POINTS (last confirmed, {swing_k} bars each side):",
+        "time,type,price",
+        *(f"{_fmt_time(ts)},{kind},{_fmt(price)}" for ts, kind, price in find_swing_points(df, swing_k)),
+        "",
+    ]
+    header_text = "\n".join(header)
+    remaining = token_budget - count_tokens(header_text)
+
+    bars = min(max_bars, len(df))
+    while True:
+        recent = _bar_lines(df.iloc[-bars:])
+        body = f"RECENT {bars} BARS (oldest first):\n" + "\n".join(recent)
+        used = count_tokens(body)
+        if used <= remaining or bars <= min_bars:
+            return header_text + "\n" + body
+        # Shrink in proportion to the overshoot, at least one bar per pass
+        per_bar = used / (bars + 1)
+        bars = max(min_bars, min(bars - 1, int(remaining / per_bar) - 1))